@@ -0,0 +1,58 @@
+"""
+Compara el lector rápido de EXIF (read_metadata) con la lectura mediante PIL (read_metadata_pil).
+
+Uso:
+    python benchmarks/bench_metadata.py CARPETA [--repeticiones N]
+
+Ninguna de las dos funciones usa la caché de metadatos, así que se mide la lectura real de los archivos.
+"""
+import argparse
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from fotodesc import core as fotodesc
+
+
+def medir(funcion, rutas, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for ruta in rutas:
+            funcion(ruta)
+        total = time.perf_counter() - inicio
+        mejor = total if mejor is None else min(mejor, total)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("carpeta")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    rutas = [os.path.join(args.carpeta, f) for f in sorted(os.listdir(args.carpeta))
+             if f.lower().endswith(fotodesc.IMAGE_EXTENSIONS)]
+    if not rutas:
+        print("No se encontraron imágenes en " + args.carpeta)
+        return 1
+
+    distintos = sum(1 for r in rutas if fotodesc.read_metadata(r) != fotodesc.read_metadata_pil(r))
+    t_pil = medir(fotodesc.read_metadata_pil, rutas, args.repeticiones)
+    t_rapido = medir(fotodesc.read_metadata, rutas, args.repeticiones)
+
+    print(f"Imágenes: {len(rutas)}")
+    print(f"PIL (read_metadata_pil): {t_pil:.3f} s ({t_pil / len(rutas) * 1000:.3f} ms/imagen)")
+    print(f"Cabeceras (read_metadata): {t_rapido:.3f} s ({t_rapido / len(rutas) * 1000:.3f} ms/imagen)")
+    if t_rapido > 0:
+        print(f"Aceleración: x{t_pil / t_rapido:.1f}")
+    if distintos:
+        print(f"AVISO: {distintos} imágenes devuelven metadatos distintos entre ambos lectores")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
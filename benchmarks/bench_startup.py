@@ -0,0 +1,74 @@
+"""
+Mide el tiempo de arranque de FotoDesc en procesos nuevos (como al abrirla desde el menú contextual).
+
+Uso:
+    python benchmarks/bench_startup.py [--repeticiones N]
+
+Se mide la importación de fotodesc.core, la ayuda del modo por lotes (python -m fotodesc --help) y, si
+wxPython está instalado, el tiempo hasta que la ventana principal atiende eventos (FOTODESC_MEDIR_ARRANQUE).
+También se comprueba que importar fotodesc.core no carga PIL, requests ni NumPy.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ("PIL", "pillow_heif", "requests", "numpy", "urllib.request")
+
+
+def ejecutar(argumentos, entorno=None):
+    """Ejecuta Python en un proceso nuevo y devuelve (segundos, salida de error)."""
+    inicio = time.perf_counter()
+    proceso = subprocess.run([sys.executable] + argumentos, cwd=RAIZ, env=entorno,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    total = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip() or f"código de salida {proceso.returncode}")
+    return total, proceso.stderr
+
+
+def resumen(nombre, tiempos):
+    print(f"{nombre}: mínimo {min(tiempos) * 1000:.0f} ms, mediana {statistics.median(tiempos) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    codigo = ("import sys, json, fotodesc.core; "
+              f"print(json.dumps([m for m in {MODULOS_PESADOS!r} if m in sys.modules]), file=sys.stderr)")
+    cargados = json.loads(ejecutar(["-c", codigo])[1])
+    if cargados:
+        print("AVISO: importar fotodesc.core carga " + ", ".join(cargados))
+
+    resumen("Intérprete vacío", [ejecutar(["-c", "pass"])[0] for _ in range(args.repeticiones)])
+    resumen("import fotodesc.core", [ejecutar(["-c", "import fotodesc.core"])[0] for _ in range(args.repeticiones)])
+    resumen("python -m fotodesc --help", [ejecutar(["-m", "fotodesc", "--help"])[0] for _ in range(args.repeticiones)])
+
+    try:
+        ejecutar(["-c", "import wx"])
+    except RuntimeError:
+        print("wxPython no está instalado: no se mide el arranque de la ventana.")
+        return 0
+    entorno = dict(os.environ, FOTODESC_MEDIR_ARRANQUE="salir")
+    totales, ventana = [], []
+    for _ in range(args.repeticiones):
+        total, salida = ejecutar(["fotodesc_1.0.py"], entorno)
+        medida = re.search(r"ventana lista en (\d+) ms", salida)
+        totales.append(total)
+        if medida:
+            ventana.append(int(medida.group(1)) / 1000)
+    resumen("Proceso completo hasta cerrar la ventana", totales)
+    if ventana:
+        resumen("Desde la carga de la interfaz hasta la ventana lista", ventana)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+"""
+Batería de benchmarks reproducible de FotoDesc, sin conexión: corpus sintético y servidores locales
+en lugar de la API de OpenAI y de Nominatim.
+
+Uso:
+    python benchmarks/bench_suite.py [--imagenes N] [--repeticiones N] [--salida resultados.json]
+                                     [--base resultados_anteriores.json] [--solo NOMBRE,NOMBRE...]
+
+Mide las operaciones que más se repiten en la aplicación: lectura de metadatos (sin caché, desde la caché
+en disco y desde memoria), carga de carpetas (búsqueda, lectura en paralelo e índice de búsqueda, lo que
+hace la ventana al añadir una carpeta), vistas previas, escritura de descripciones, preparación de imágenes
+para la API, descripciones y direcciones por lotes contra los servidores locales, búsqueda y exportación.
+
+El corpus se genera una vez (benchmarks/corpus.py) y se reutiliza; la configuración de la aplicación
+se sustituye por una carpeta temporal, así que no se tocan las cachés del usuario.
+Con --salida se guardan los resultados en JSON. Con --base se comparan con unos resultados anteriores:
+si alguna prueba es más lenta que lo que permite benchmarks/umbrales.json, el programa termina con código 1.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import corpus
+import servidores_stub
+
+BENCHMARKS = []
+
+
+def benchmark(nombre):
+    """
+    Registra una prueba. La función recibe el contexto, prepara lo que no se mide y devuelve
+    (trabajo, elementos): trabajo es la función que se cronometra y elementos, cuántas imágenes procesa.
+    """
+    def registrar(funcion):
+        BENCHMARKS.append((nombre, funcion))
+        return funcion
+    return registrar
+
+
+class Contexto:
+    def __init__(self, core, gui, raiz_corpus, rutas, copia, temporal):
+        self.core = core
+        self.gui = gui              # fotodesc.gui, o None si no está wxPython
+        self.raiz_corpus = raiz_corpus
+        self.rutas = rutas          # Corpus original (solo lectura)
+        self.copia = copia          # Copia del corpus para las pruebas que escriben
+        self.temporal = temporal
+        self.contador = 0
+
+    def ruta_temporal(self, nombre):
+        self.contador += 1
+        return os.path.join(self.temporal, f"{nombre}_{self.contador}")
+
+
+# ---------------- Pruebas ----------------
+@benchmark("get_metadata_sin_cache")
+def b_metadata_sin_cache(ctx):
+    core = ctx.core
+    core.metadata_cache = core.MetadataCache(ctx.ruta_temporal("metadatos.db"))
+    return lambda: [core.get_metadata(r) for r in ctx.rutas], len(ctx.rutas)
+
+
+@benchmark("get_metadata_cache_disco")
+def b_metadata_disco(ctx):
+    # Como al reiniciar la aplicación: la base en disco tiene todo y la memoria está vacía
+    core = ctx.core
+    db = ctx.ruta_temporal("metadatos.db")
+    core.metadata_cache = core.MetadataCache(db)
+    for ruta in ctx.rutas:
+        core.get_metadata(ruta)
+    core.metadata_cache = core.MetadataCache(db)
+    return lambda: [core.get_metadata(r) for r in ctx.rutas], len(ctx.rutas)
+
+
+@benchmark("get_metadata_cache_memoria")
+def b_metadata_memoria(ctx):
+    core = ctx.core
+    for ruta in ctx.rutas:
+        core.get_metadata(ruta)
+    return lambda: [core.get_metadata(r) for r in ctx.rutas], len(ctx.rutas)
+
+
+@benchmark("carga_carpeta")
+def b_carga_carpeta(ctx):
+    core = ctx.core
+    core.metadata_cache = core.MetadataCache(ctx.ruta_temporal("metadatos.db"))
+
+    def trabajo():
+        encontradas = []
+        core.FolderScanner(ctx.raiz_corpus, True, on_batch=lambda lote, total: encontradas.extend(lote),
+                           on_done=lambda total, cancelada: None).run()
+        indice = core.SearchIndex()
+        for bloque in core.extract_metadata_parallel(encontradas):
+            indice.index_paths([ruta for ruta, _ in bloque])
+        if ctx.gui is not None:
+            modelo = ctx.gui.ImageListModel(core.ImageAddresses())
+            modelo.add_paths(encontradas)
+            for fila in range(min(len(modelo), 40)):  # Las filas visibles de la primera pantalla
+                modelo.get_columns(fila)
+        return encontradas
+    return trabajo, len(ctx.rutas)
+
+
+@benchmark("vista_previa_sin_cache")
+def b_vista_previa(ctx):
+    cache = ctx.core.ThumbnailCache(ctx.ruta_temporal("miniaturas"))
+    return lambda: [cache.get(r, 300) for r in ctx.rutas], len(ctx.rutas)
+
+
+@benchmark("vista_previa_cache")
+def b_vista_previa_cache(ctx):
+    cache = ctx.core.ThumbnailCache(ctx.ruta_temporal("miniaturas"))
+    for ruta in ctx.rutas:
+        cache.get(ruta, 300)
+    return lambda: [cache.get(r, 300) for r in ctx.rutas], len(ctx.rutas)
+
+
+@benchmark("update_image_description")
+def b_update_description(ctx):
+    texto = f"Descripción de prueba {ctx.contador}"
+    ctx.contador += 1
+    return lambda: [ctx.core.update_image_description(r, texto) for r in ctx.copia], len(ctx.copia)
+
+
+@benchmark("imagen_a_data_url")
+def b_data_url(ctx):
+    rutas = ctx.rutas[:40]
+    return lambda: [ctx.core.imagen_a_data_url(r, "high") for r in rutas], len(rutas)
+
+
+def describir(ctx, batch_size):
+    core = ctx.core
+    rutas = ctx.copia[:40]
+
+    def trabajo():
+        resumen = {}
+        describer = core.BatchDescriber("clave-de-prueba", rutas, core.PROMPT_DESCRIPCION,
+                                        on_result=lambda *args: None, on_done=resumen.update,
+                                        concurrency=4, limiter=core.RateLimiter(), force_refresh=True,
+                                        batch_size=batch_size)
+        describer.run()
+        if resumen["errors"]:
+            raise RuntimeError("Errores al describir: " + resumen["errors"][0][1])
+    return trabajo, len(rutas)
+
+
+@benchmark("describir_lote_stub")
+def b_describir(ctx):
+    return describir(ctx, 1)
+
+
+@benchmark("describir_agrupado_stub")
+def b_describir_agrupado(ctx):
+    # Cinco imágenes por petición: mismas imágenes, la quinta parte de las peticiones
+    return describir(ctx, 5)
+
+
+@benchmark("geocodificar_lote_stub")
+def b_geocodificar(ctx):
+    core = ctx.core
+    core.geocode_cache = core.GeocodeCache(ctx.ruta_temporal("direcciones.db"))
+    for ruta in ctx.rutas:
+        core.get_metadata(ruta)
+
+    def trabajo():
+        resumen = {}
+        core.BatchGeocoder(ctx.rutas, on_result=lambda *args: None, on_done=resumen.update,
+                           requests_per_second=1000).run()
+        if resumen["errors"]:
+            raise RuntimeError("Errores al geocodificar: " + resumen["errors"][0][1])
+    return trabajo, len(ctx.rutas)
+
+
+@benchmark("busqueda")
+def b_busqueda(ctx):
+    core = ctx.core
+    for ruta in ctx.rutas:
+        core.get_metadata(ruta)
+
+    def trabajo():
+        indice = core.SearchIndex()
+        indice.index_paths(ctx.rutas)
+        indice.search(text="prueba")
+        indice.search(date_from="01/01/2018", date_to="31/12/2020")
+        indice.search(near=(40.4168, -3.7038, 5000))
+    return trabajo, len(ctx.rutas)
+
+
+@benchmark("exportar_geojson")
+def b_exportar(ctx):
+    core = ctx.core
+    for ruta in ctx.rutas:
+        core.get_metadata(ruta)
+    destino = ctx.ruta_temporal("catalogo.geojson")
+    direcciones = core.ImageAddresses()
+    return lambda: core.exportar_catalogo(core.iter_catalogo(ctx.rutas, direcciones), destino, "geojson"), \
+        len(ctx.rutas)
+
+
+# ---------------- Ejecución y comparación ----------------
+def medir(funcion, ctx, repeticiones):
+    tiempos = []
+    elementos = 0
+    for _ in range(repeticiones):
+        trabajo, elementos = funcion(ctx)
+        inicio = time.perf_counter()
+        trabajo()
+        tiempos.append(time.perf_counter() - inicio)
+    mediana = statistics.median(tiempos)
+    return {"seconds": mediana, "min": min(tiempos), "max": max(tiempos), "runs": len(tiempos),
+            "items": elementos, "ms_per_item": mediana * 1000 / elementos if elementos else None}
+
+
+def comparar(resultados, base, umbrales):
+    """
+    Devuelve las pruebas cuyo mínimo supera el de la base en más de lo permitido (máximo cociente). Las
+    diferencias de menos de min_delta_ms no cuentan: en las pruebas de pocos milisegundos son ruido.
+    """
+    regresiones = []
+    margen = umbrales.get("min_delta_ms", 5) / 1000
+    for nombre, actual in resultados.items():
+        anterior = base.get("results", {}).get(nombre)
+        if not anterior or not anterior.get("min"):
+            continue
+        limite = umbrales.get("benchmarks", {}).get(nombre, umbrales.get("default", 1.25))
+        cociente = actual["min"] / anterior["min"]
+        actual["ratio_vs_base"] = round(cociente, 3)
+        if cociente > limite and actual["min"] - anterior["min"] > margen:
+            regresiones.append({"benchmark": nombre, "ratio": round(cociente, 3), "max_ratio": limite})
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagenes", type=int, default=200, help="imágenes del corpus sintético")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--tamanos", default="pequena,mediana,grande")
+    parser.add_argument("--corpus", help="carpeta donde generar o reutilizar el corpus "
+                                         "(por defecto, una carpeta en el directorio temporal del sistema)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--solo", help="pruebas que se ejecutan, separadas por comas")
+    parser.add_argument("--latencia-api", type=float, default=50, help="milisegundos por respuesta de la API")
+    parser.add_argument("--latencia-nominatim", type=float, default=5, help="milisegundos por dirección")
+    parser.add_argument("--salida", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--base", help="resultados anteriores (JSON) con los que comparar")
+    parser.add_argument("--umbrales", default=os.path.join(RAIZ, "benchmarks", "umbrales.json"))
+    args = parser.parse_args()
+
+    nombres = [nombre for nombre, _ in BENCHMARKS]
+    elegidas = args.solo.split(",") if args.solo else nombres
+    desconocidas = [n for n in elegidas if n not in nombres]
+    if desconocidas:
+        parser.error("pruebas desconocidas: " + ", ".join(desconocidas) + ". Disponibles: " + ", ".join(nombres))
+
+    tamanos = [t for t in args.tamanos.split(",") if t]
+    raiz_corpus = args.corpus or os.path.join(tempfile.gettempdir(),
+                                              f"fotodesc_corpus_{args.imagenes}_{args.semilla}_{'_'.join(tamanos)}")
+    print(f"Preparando el corpus en {raiz_corpus}...", file=sys.stderr)
+    manifiesto = corpus.generar_corpus(raiz_corpus, args.imagenes, args.semilla, tamanos)
+
+    temporal = tempfile.mkdtemp(prefix="fotodesc_bench_")
+    api = servidores_stub.iniciar_openai(args.latencia_api / 1000)
+    nominatim = servidores_stub.iniciar_nominatim(args.latencia_nominatim / 1000)
+    # La aplicación lee estas variables al importarse: se definen antes de cargar fotodesc.core
+    os.environ["FOTODESC_API_URL"] = api.url + "/v1/chat/completions"
+    os.environ["FOTODESC_NOMINATIM_URL"] = nominatim.url + "/reverse"
+    os.environ["XDG_CONFIG_HOME"] = os.environ["APPDATA"] = os.path.join(temporal, "config")
+    from fotodesc import core
+    try:
+        from fotodesc import gui
+    except ImportError:
+        gui = None  # Sin wxPython no se mide el modelo del listado
+
+    try:
+        copia = os.path.join(temporal, "copia")
+        shutil.copytree(raiz_corpus, copia)
+        ctx = Contexto(core, gui, raiz_corpus, [os.path.join(raiz_corpus, r) for r in manifiesto["files"]],
+                       [os.path.join(copia, r) for r in manifiesto["files"]], temporal)
+        resultados = {}
+        for nombre, funcion in BENCHMARKS:
+            if nombre not in elegidas:
+                continue
+            resultado = medir(funcion, ctx, args.repeticiones)
+            resultados[nombre] = resultado
+            print(f"{nombre:28s} mediana {resultado['seconds'] * 1000:9.1f} ms   mínimo {resultado['min'] * 1000:9.1f} ms"
+                  f"   {resultado['ms_per_item']:7.2f} ms/imagen", file=sys.stderr)
+    finally:
+        api.shutdown()
+        nominatim.shutdown()
+        shutil.rmtree(temporal, ignore_errors=True)
+
+    informe = {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "gui_model": gui is not None,
+        "corpus": dict(manifiesto["params"], **manifiesto["summary"]),
+        "stubs": {"api_latency_ms": args.latencia_api, "nominatim_latency_ms": args.latencia_nominatim,
+                  "api_requests": api.peticiones, "nominatim_requests": nominatim.peticiones},
+        "results": resultados,
+    }
+    codigo = 0
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.umbrales, encoding="utf-8") as f:
+            umbrales = json.load(f)
+        regresiones = comparar(resultados, base, umbrales)
+        informe["regressions"] = regresiones
+        for r in regresiones:
+            print(f"REGRESIÓN: {r['benchmark']} es {r['ratio']:.2f} veces más lento que la base "
+                  f"(máximo permitido {r['max_ratio']:.2f})", file=sys.stderr)
+        if regresiones:
+            codigo = 1
+        else:
+            print("Sin regresiones respecto a " + args.base, file=sys.stderr)
+    texto = json.dumps(informe, indent=1, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Genera un corpus sintético de fotos para los benchmarks, siempre igual para la misma semilla.
+
+Uso:
+    python benchmarks/corpus.py DESTINO [--imagenes N] [--semilla S] [--tamanos pequena,mediana,grande]
+
+Las imágenes son JPEG, PNG y, si pillow-heif está instalado, HEIC, de varios tamaños. Unas tienen EXIF
+(fecha, descripción, miniatura incrustada) y GPS y otras no, y se reparten entre una carpeta plana
+y un árbol de subcarpetas por año y mes. En DESTINO/corpus.json queda la descripción del corpus;
+si ya existe uno con los mismos parámetros, se reutiliza.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+
+import piexif
+from PIL import Image
+
+TAMANOS = {"pequena": (640, 480), "mediana": (1920, 1440), "grande": (4000, 3000)}
+PESOS = {"pequena": 5, "mediana": 4, "grande": 1}  # Proporción de cada tamaño en el corpus
+# Lugares alrededor de los que se reparten las coordenadas, para que la geocodificación agrupe
+LUGARES = [(40.4168, -3.7038), (41.3874, 2.1686), (37.3891, -5.9845), (48.8566, 2.3522), (64.1466, -21.9426)]
+VERSION = 1
+
+
+def heif_disponible():
+    try:
+        import pillow_heif
+    except ImportError:
+        return False
+    pillow_heif.register_heif_opener()
+    return True
+
+
+def pixeles(rng, tamano):
+    """
+    Imagen RGB con degradado y ruido suavizado: se comprime más o menos como una foto, no como un color liso,
+    y se genera rápido también en los tamaños grandes.
+    """
+    ancho, alto = tamano
+    ruido = Image.effect_noise((ancho // 4, alto // 4), rng.randint(20, 60)).resize((ancho, alto), Image.BILINEAR)
+    degradado = Image.linear_gradient("L").resize((ancho, alto)).rotate(rng.choice((0, 90, 180, 270)))
+    return Image.merge("RGB", (ruido, degradado, Image.eval(degradado, lambda v: 255 - v)))
+
+
+def exif_sintetico(rng, indice, con_gps, con_miniatura, img):
+    exif = {"0th": {}, "Exif": {}, "GPS": {}, "Interop": {}, "1st": {}, "thumbnail": None}
+    if rng.random() < 0.5:
+        exif["0th"][piexif.ImageIFD.ImageDescription] = f"Foto de prueba {indice}".encode("utf-8")
+    fecha = f"20{rng.randint(15, 24):02d}:{rng.randint(1, 12):02d}:{rng.randint(1, 28):02d} " \
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+    exif["Exif"][piexif.ExifIFD.DateTimeOriginal] = fecha.encode("ascii")
+    exif["0th"][piexif.ImageIFD.Make] = b"FotoDesc"
+    if con_gps:
+        lat, lon = rng.choice(LUGARES)
+        lat += rng.uniform(-0.01, 0.01)
+        lon += rng.uniform(-0.01, 0.01)
+        exif["GPS"][piexif.GPSIFD.GPSLatitudeRef] = b"N" if lat >= 0 else b"S"
+        exif["GPS"][piexif.GPSIFD.GPSLatitude] = dms(lat)
+        exif["GPS"][piexif.GPSIFD.GPSLongitudeRef] = b"E" if lon >= 0 else b"W"
+        exif["GPS"][piexif.GPSIFD.GPSLongitude] = dms(lon)
+    if con_miniatura:
+        miniatura = img.copy()
+        miniatura.thumbnail((160, 160))
+        buffer = io.BytesIO()
+        miniatura.save(buffer, "JPEG", quality=75)
+        exif["thumbnail"] = buffer.getvalue()
+        exif["1st"][piexif.ImageIFD.JPEGInterchangeFormat] = 0
+        exif["1st"][piexif.ImageIFD.JPEGInterchangeFormatLength] = 0
+    return piexif.dump(exif)
+
+
+def dms(dec):
+    dec = abs(dec)
+    grados = int(dec)
+    minutos = int((dec - grados) * 60)
+    segundos = (dec - grados - minutos / 60) * 3600
+    return ((grados, 1), (minutos, 1), (int(segundos * 100), 100))
+
+
+def generar_corpus(destino, imagenes=200, semilla=1, tamanos=("pequena", "mediana", "grande")):
+    """Crea el corpus (o reutiliza el que ya hay con los mismos parámetros) y devuelve su descripción."""
+    formatos = ["jpg"] * 7 + ["png"] * 2 + (["heic"] if heif_disponible() else ["jpg"])
+    parametros = {"version": VERSION, "images": imagenes, "seed": semilla, "sizes": list(tamanos),
+                  "formats": sorted(set(formatos))}
+    ruta_manifiesto = os.path.join(destino, "corpus.json")
+    try:
+        with open(ruta_manifiesto, encoding="utf-8") as f:
+            manifiesto = json.load(f)
+        if manifiesto.get("params") == parametros and all(os.path.exists(os.path.join(destino, r))
+                                                          for r in manifiesto["files"]):
+            return manifiesto
+    except (OSError, ValueError, KeyError):
+        pass
+
+    rng = random.Random(semilla)
+    archivos = []
+    resumen = {"with_exif": 0, "with_gps": 0, "flat": 0, "nested": 0, "bytes": 0}
+    for indice in range(imagenes):
+        formato = rng.choice(formatos)
+        tamano = TAMANOS[rng.choices(tamanos, [PESOS[t] for t in tamanos])[0]]
+        if rng.random() < 0.5:
+            carpeta = "plana"
+            resumen["flat"] += 1
+        else:
+            carpeta = os.path.join("anidada", f"20{rng.randint(15, 24)}", f"{rng.randint(1, 12):02d}")
+            resumen["nested"] += 1
+        os.makedirs(os.path.join(destino, carpeta), exist_ok=True)
+        relativa = os.path.join(carpeta, f"foto_{indice:05d}.{formato}")
+        img = pixeles(rng, tamano)
+        opciones = {}
+        if rng.random() < 0.7:
+            con_gps = rng.random() < 0.6
+            opciones["exif"] = exif_sintetico(rng, indice, con_gps, formato == "jpg" and rng.random() < 0.5, img)
+            resumen["with_exif"] += 1
+            resumen["with_gps"] += con_gps
+        ruta = os.path.join(destino, relativa)
+        if formato == "jpg":
+            img.save(ruta, "JPEG", quality=rng.randint(80, 95), **opciones)
+        elif formato == "png":
+            img.save(ruta, "PNG", compress_level=1, **opciones)
+        else:
+            img.save(ruta, "HEIF", quality=80, **opciones)
+        resumen["bytes"] += os.path.getsize(ruta)
+        archivos.append(relativa)
+
+    manifiesto = {"params": parametros, "summary": resumen, "files": archivos}
+    with open(ruta_manifiesto, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=1)
+    return manifiesto
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("destino")
+    parser.add_argument("--imagenes", type=int, default=200)
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--tamanos", default="pequena,mediana,grande",
+                        help="tamaños separados por comas: " + ", ".join(TAMANOS))
+    args = parser.parse_args()
+    tamanos = [t for t in args.tamanos.split(",") if t]
+    if not tamanos or any(t not in TAMANOS for t in tamanos):
+        parser.error("tamaños válidos: " + ", ".join(TAMANOS))
+    manifiesto = generar_corpus(args.destino, args.imagenes, args.semilla, tamanos)
+    print(json.dumps(dict(manifiesto["params"], **manifiesto["summary"])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Servidores HTTP locales que sustituyen a la API de OpenAI y a Nominatim en los benchmarks.
+
+Uso:
+    python benchmarks/servidores_stub.py [--latencia-api MS] [--latencia-nominatim MS]
+
+Al ejecutarlo solo, escribe las variables de entorno que hay que definir (FOTODESC_API_URL y
+FOTODESC_NOMINATIM_URL) para que la aplicación o el modo por lotes usen estos servidores, y sigue
+atendiendo peticiones hasta que se pulse Ctrl+C. Las respuestas tienen el mismo formato que las reales.
+"""
+import argparse
+import http.server
+import json
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+class ServidorStub(http.server.ThreadingHTTPServer):
+    """Servidor en un puerto libre de 127.0.0.1, en un hilo aparte; cuenta las peticiones atendidas."""
+    daemon_threads = True
+
+    def __init__(self, manejador, latencia=0.0, max_imagenes=0, omitir=0, latencia_fragmento=0.0):
+        super(ServidorStub, self).__init__(("127.0.0.1", 0), manejador)
+        self.latencia = latencia
+        self.max_imagenes = max_imagenes  # Más imágenes en una petición se rechazan con 413 (0: sin límite)
+        self.omitir = omitir              # En las respuestas por lotes falta una de cada omitir imágenes
+        self.latencia_fragmento = latencia_fragmento  # Pausa entre palabras de las respuestas en streaming
+        self.peticiones = 0
+        self.bytes_recibidos = 0
+        self.streams_cortados = 0         # Respuestas en streaming que el cliente dejó a medias
+        self.errores = []                 # (código, Retry-After o None) con que se responde, en orden, antes que nada
+        self.contenido = None             # Si no es None, texto con que se responde en lugar de las descripciones
+        self.imagenes = []                # Imágenes de cada petición recibida, en orden
+        self.atasco = 0                   # Palabras tras las que el streaming deja de enviar texto (0: nunca)
+        self.error_stream = None          # Mensaje de un evento de error que se envía tras la primera palabra
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def contar(self, recibidos, imagenes=0):
+        """Cuenta la petición y devuelve el error programado que toca responder, o None."""
+        with self.lock:
+            self.peticiones += 1
+            self.bytes_recibidos += recibidos
+            self.imagenes.append(imagenes)
+            return self.errores.pop(0) if self.errores else None
+
+    def handle_error(self, request, client_address):
+        # Un cliente que corta una respuesta en streaming (al cancelar) no es un error del servidor
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super(ServidorStub, self).handle_error(request, client_address)
+
+    def contar_corte(self):
+        with self.lock:
+            self.streams_cortados += 1
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class ManejadorBase(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Conexiones persistentes, como con una requests.Session
+    # Cabeceras y cuerpo en un solo envío y sin Nagle: si no, el ACK retardado añade ~40 ms por respuesta
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def responder(self, datos, codigo=200, retry_after=None):
+        cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        if retry_after is not None:
+            self.send_header("Retry-After", str(retry_after))
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def enviar_trozo(self, datos):
+        # Transfer-Encoding: chunked, vaciando el buffer para que cada evento salga en cuanto se genera
+        self.wfile.write(f"{len(datos):X}\r\n".encode("ascii") + datos + b"\r\n")
+        self.wfile.flush()
+
+
+class ManejadorOpenAI(ManejadorBase):
+    """
+    Responde a /v1/chat/completions con una descripción fija tras la latencia configurada. Si la petición
+    tiene varias imágenes y pide response_format json_schema, responde con una descripción por imagen;
+    con stream=True la envía palabra a palabra como eventos SSE, igual que la API.
+    """
+    TEXTO_STREAM = ("Descripción de prueba generada localmente y enviada palabra a palabra, con eventos "
+                    "server-sent events, igual que la API cuando se pide la respuesta en streaming.")
+
+    def do_POST(self):
+        longitud = int(self.headers.get("Content-Length", 0))
+        cuerpo = json.loads(self.rfile.read(longitud))
+        partes = cuerpo["messages"][0]["content"]
+        imagenes = sum(1 for parte in partes if parte.get("type") == "image_url")
+        error = self.server.contar(longitud, imagenes)
+        time.sleep(self.server.latencia)
+        if error is not None:
+            codigo, retry_after = error
+            self.responder({"error": {"message": f"Error de prueba {codigo}", "type": "server_error"}},
+                           codigo, retry_after)
+            return
+        if self.server.max_imagenes and imagenes > self.server.max_imagenes:
+            self.responder({"error": {"message": "Demasiadas imágenes", "type": "invalid_request_error"}}, 413)
+            return
+        if cuerpo.get("stream"):
+            self.responder_stream(cuerpo.get("model"))
+            return
+        contenido = "Descripción de prueba generada localmente."
+        if self.server.contenido is not None:
+            contenido = self.server.contenido
+        elif cuerpo.get("response_format", {}).get("type") == "json_schema":
+            omitir = self.server.omitir
+            contenido = json.dumps({"descriptions": [
+                {"index": i, "description": f"Descripción de prueba de la imagen {i}."}
+                for i in range(1, imagenes + 1) if not omitir or i % omitir]}, ensure_ascii=False)
+        self.responder({
+            "model": cuerpo.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": contenido}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 8 * imagenes},
+        })
+
+    def responder_stream(self, modelo):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        palabras = re.findall(r"\S+\s*", self.TEXTO_STREAM)
+        try:
+            for i, palabra in enumerate(palabras + [None]):
+                if i and i == self.server.atasco:
+                    # Conexión abierta sin texto, solo comentarios SSE, hasta que el cliente la corte
+                    while True:
+                        time.sleep(0.2)
+                        self.enviar_trozo(b": esperando\n\n")
+                if i == 1 and self.server.error_stream is not None:
+                    error = {"error": {"message": self.server.error_stream, "type": "server_error"}}
+                    self.enviar_trozo(f"data: {json.dumps(error, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    break
+                delta = {} if palabra is None else {"content": palabra}
+                if i == 0:
+                    delta["role"] = "assistant"
+                evento = {"object": "chat.completion.chunk", "model": modelo,
+                          "choices": [{"index": 0, "delta": delta, "finish_reason": None if palabra else "stop"}]}
+                self.enviar_trozo(f"data: {json.dumps(evento, ensure_ascii=False)}\n\n".encode("utf-8"))
+                time.sleep(self.server.latencia_fragmento)
+            self.enviar_trozo(b"data: [DONE]\n\n")
+            self.enviar_trozo(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.contar_corte()
+            self.close_connection = True
+
+
+class ManejadorNominatim(ManejadorBase):
+    """Responde a /reverse con una dirección construida a partir de las coordenadas pedidas."""
+    def do_GET(self):
+        error = self.server.contar(0)
+        consulta = parse_qs(urlparse(self.path).query)
+        lat = float(consulta.get("lat", ["0"])[0])
+        lon = float(consulta.get("lon", ["0"])[0])
+        time.sleep(self.server.latencia)
+        if error is not None:
+            self.responder({"error": f"Error de prueba {error[0]}"}, error[0], error[1])
+            return
+        self.responder({"lat": str(lat), "lon": str(lon),
+                        "display_name": f"Calle de prueba, {lat:.3f}, {lon:.3f}, España"})
+
+
+def iniciar_openai(latencia=0.0, max_imagenes=0, omitir=0, latencia_fragmento=0.0):
+    """Arranca el sustituto de la API de OpenAI; la URL para FOTODESC_API_URL es servidor.url + la ruta."""
+    return ServidorStub(ManejadorOpenAI, latencia, max_imagenes, omitir, latencia_fragmento)
+
+
+def iniciar_nominatim(latencia=0.0):
+    return ServidorStub(ManejadorNominatim, latencia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latencia-api", type=float, default=200, help="milisegundos por descripción")
+    parser.add_argument("--latencia-nominatim", type=float, default=20, help="milisegundos por dirección")
+    parser.add_argument("--max-imagenes", type=int, default=0,
+                        help="rechazar con 413 las peticiones con más imágenes (0: sin límite)")
+    parser.add_argument("--omitir", type=int, default=0,
+                        help="en las respuestas con varias imágenes, dejar sin describir una de cada N")
+    parser.add_argument("--latencia-fragmento", type=float, default=40,
+                        help="milisegundos entre palabras de las respuestas en streaming")
+    args = parser.parse_args()
+    openai = iniciar_openai(args.latencia_api / 1000, args.max_imagenes, args.omitir, args.latencia_fragmento / 1000)
+    nominatim = iniciar_nominatim(args.latencia_nominatim / 1000)
+    print(f"FOTODESC_API_URL={openai.url}/v1/chat/completions")
+    print(f"FOTODESC_NOMINATIM_URL={nominatim.url}/reverse")
+    sys.stdout.flush()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Peticiones atendidas: API {openai.peticiones}, Nominatim {nominatim.peticiones}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
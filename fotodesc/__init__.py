@@ -0,0 +1 @@
+"""FotoDesc: gestión de metadatos de imágenes (descripción, coordenadas, dirección, fecha y hora)."""
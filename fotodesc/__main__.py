@@ -0,0 +1,5 @@
+import sys
+
+from fotodesc.cli import main
+
+sys.exit(main())
@@ -0,0 +1,433 @@
+"""
+Modo por lotes desde la línea de órdenes, sin interfaz gráfica (no importa wx).
+
+Uso:
+    python -m fotodesc scan RUTAS... [-r] [--hilos N] [--procesos] [--json]
+    python -m fotodesc describe RUTAS... [--api-key CLAVE] [--concurrencia N] [--rpm N] [--tpm N]
+                                [--por-peticion N] [--progresivo] [--json]
+    python -m fotodesc geocode RUTAS... [--proveedor nominatim|offline|fallback] [--json]
+    python -m fotodesc export RUTAS... [--formato csv|jsonl|geojson] [-o ARCHIVO]
+    python -m fotodesc import CATALOGO [RUTAS...] [-r] [--json]
+    python -m fotodesc geotag RUTAS... --track ARCHIVO.gpx [--zona=+H:MM] [--desfase=+H:MM:SS] [--simular]
+
+RUTAS puede mezclar archivos, carpetas y patrones glob (por ejemplo "viajes/**/*.jpg" con -r).
+Con --json el progreso se escribe como una línea JSON por evento, para que lo lean otros programas; con
+describe --progresivo también llega cada fragmento de la descripción mientras la API la genera.
+Con --diagnostico ARCHIVO (antes de la orden) se guardan en ese JSON las latencias y bytes de cada operación.
+Ctrl+C cancela el trabajo en curso de forma ordenada.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import threading
+
+from fotodesc.core import (
+    IMAGE_EXTENSIONS, LOTE_MAX_IMAGENES, PROMPT_DESCRIPCION, BatchDescriber, BatchGeocoder, DescriptionImporter,
+    FolderScanner, GeotagWriter, ImageAddresses, RateLimiter, TrackIndex, construir_indice_offline,
+    descripciones_de_catalogo, emparejar_track, exportar_catalogo, extract_metadata_parallel, formato_catalogo,
+    geocode_cache, get_config_dir, instrumentacion, leer_catalogo, parse_desplazamiento, registro_catalogo,
+    reverse_geocoder,
+)
+
+
+class Salida:
+    """
+    Escribe el progreso: con json_lines=True, una línea JSON por evento; si no, mensajes legibles.
+    Se puede llamar desde varios hilos, ya que los trabajos por lotes avisan desde sus hilos de trabajo.
+    """
+    def __init__(self, json_lines=False, stream=None):
+        self.json_lines = json_lines
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def evento(self, tipo, texto=None, **datos):
+        with self.lock:
+            if self.json_lines:
+                self.stream.write(json.dumps(dict(event=tipo, **datos), ensure_ascii=False) + "\n")
+            elif texto:
+                self.stream.write(texto + "\n")
+            self.stream.flush()
+
+
+def expandir_rutas(entradas, recursive=False):
+    """
+    Convierte la lista de archivos, carpetas y patrones glob en rutas absolutas de imágenes, sin repetir.
+    Las carpetas se recorren con FolderScanner (con sus subcarpetas si recursive es True).
+    """
+    rutas = []
+    vistas = set()
+    for entrada in entradas:
+        if any(c in entrada for c in "*?["):
+            candidatas = [r for r in sorted(glob.glob(entrada, recursive=recursive))
+                          if os.path.isfile(r) and r.lower().endswith(IMAGE_EXTENSIONS)]
+        elif os.path.isdir(entrada):
+            candidatas = []
+            FolderScanner(entrada, recursive, on_batch=lambda lote, total: candidatas.extend(lote),
+                          on_done=lambda total, cancelada: None).run()
+        elif os.path.isfile(entrada):
+            candidatas = [entrada]
+        else:
+            print("No existe: " + entrada, file=sys.stderr)
+            continue
+        for ruta in candidatas:
+            ruta = os.path.abspath(ruta)
+            if ruta not in vistas:
+                vistas.add(ruta)
+                rutas.append(ruta)
+    return rutas
+
+
+def en_orden(rutas, bloques):
+    """Reordena los bloques de extract_metadata_parallel para devolver (ruta, metadatos) en el orden de rutas."""
+    pendientes = {}
+    siguiente = 0
+    for bloque in bloques:
+        pendientes.update(bloque)
+        while siguiente < len(rutas) and rutas[siguiente] in pendientes:
+            yield rutas[siguiente], pendientes.pop(rutas[siguiente])
+            siguiente += 1
+    # Las rutas que dejaron de existir durante la lectura no llegan en ningún bloque
+    for ruta in rutas[siguiente:]:
+        if ruta in pendientes:
+            yield ruta, pendientes.pop(ruta)
+
+
+def leer_metadatos(rutas, args):
+    """Lee los metadatos de todas las rutas en paralelo, en el orden de entrada."""
+    bloques = extract_metadata_parallel(rutas, workers=args.hilos, use_processes=args.procesos)
+    return en_orden(rutas, bloques)
+
+
+def registro(ruta, metadatos, direcciones):
+    return registro_catalogo(ruta, metadatos, direcciones.get_for(ruta, metadatos[1]))
+
+
+def ejecutar(trabajo):
+    """Arranca un trabajo por lotes (BatchDescriber, BatchGeocoder) y espera a que termine; Ctrl+C lo cancela."""
+    trabajo.start()
+    while trabajo.is_alive():
+        try:
+            trabajo.join(0.2)
+        except KeyboardInterrupt:
+            trabajo.cancel()
+
+
+def codigo_salida(resumen):
+    if resumen.get("cancelled"):
+        return 130
+    return 1 if resumen.get("errors") else 0
+
+
+def buscar_imagenes(args):
+    rutas = expandir_rutas(args.rutas, args.recursivo)
+    if not rutas:
+        print("No se encontraron imágenes.", file=sys.stderr)
+    return rutas
+
+
+# ---------------- Órdenes ----------------
+def cmd_scan(args, salida):
+    rutas = buscar_imagenes(args)
+    if not rutas:
+        return 1
+    direcciones = ImageAddresses()
+    leidas = 0
+    for ruta, metadatos in leer_metadatos(rutas, args):
+        leidas += 1
+        datos = registro(ruta, metadatos, direcciones)
+        coords = "" if datos["latitude"] is None else f"{datos['latitude']:.6f}, {datos['longitude']:.6f}"
+        salida.evento("image", "\t".join([ruta, datos["date"], datos["time"], coords, datos["description"]]),
+                      **datos)
+    salida.evento("done", None, total=len(rutas), read=leidas)
+    return 0
+
+
+def cmd_describe(args, salida):
+    api_key = args.api_key or os.environ.get("OPENAI_API_KEY", "")
+    if not api_key:
+        print("Falta la API Key: use --api-key o la variable de entorno OPENAI_API_KEY.", file=sys.stderr)
+        return 2
+    rutas = buscar_imagenes(args)
+    if rutas and args.solo_sin_descripcion:
+        rutas = [ruta for ruta, metadatos in leer_metadatos(rutas, args) if not metadatos[0]]
+    if not rutas:
+        return 1
+    hechas = [0]
+    resumen = {}
+
+    def on_result(ruta, descripcion, error):
+        hechas[0] += 1
+        prefijo = f"[{hechas[0]}/{len(rutas)}] {ruta}: "
+        salida.evento("result", prefijo + ("ERROR " + error if error else descripcion),
+                      path=ruta, description=descripcion, error=error)
+
+    def on_partial(ruta, fragmento, texto):
+        salida.evento("partial", None, path=ruta, text=fragmento)
+
+    describer = BatchDescriber(api_key, rutas, args.prompt, on_result=on_result, on_done=resumen.update,
+                               detail=args.detalle, concurrency=args.concurrencia,
+                               limiter=RateLimiter(args.rpm, args.tpm), max_tokens=args.max_tokens,
+                               force_refresh=args.forzar, batch_size=args.por_peticion,
+                               on_partial=on_partial if args.progresivo else None)
+    ejecutar(describer)
+    salida.evento("done", f"Descripciones obtenidas: {resumen['ok']} de {resumen['total']}"
+                          f"{' (cancelado)' if resumen['cancelled'] else ''}.",
+                  total=resumen["total"], ok=resumen["ok"], cancelled=resumen["cancelled"],
+                  errors=[{"path": ruta, "error": error} for ruta, error in resumen["errors"]])
+    return codigo_salida(resumen)
+
+
+def cmd_geocode(args, salida):
+    ruta_indice = args.indice or os.path.join(get_config_dir(), "geonames.idx")
+    if args.nomenclator:
+        try:
+            lugares = construir_indice_offline(args.nomenclator, ruta_indice)
+        except Exception as e:
+            print("Error al crear el índice sin conexión: " + str(e), file=sys.stderr)
+            return 2
+        salida.evento("index", f"Índice de direcciones sin conexión listo: {lugares} lugares.",
+                      path=ruta_indice, places=lugares)
+    try:
+        reverse_geocoder.configure(args.proveedor, ruta_indice)
+    except (OSError, ValueError) as e:
+        print("Error al abrir el índice sin conexión: " + str(e), file=sys.stderr)
+        return 2
+    if args.proveedor != "nominatim" and reverse_geocoder.offline is None:
+        print("No hay índice sin conexión: créelo con --nomenclator ARCHIVO_GEONAMES.", file=sys.stderr)
+        return 2
+    geocode_cache.set_precision(args.precision, args.radio)
+    rutas = buscar_imagenes(args)
+    if not rutas:
+        return 1
+    # Se precargan en paralelo los metadatos, que BatchGeocoder lee después desde la caché
+    for _ in leer_metadatos(rutas, args):
+        pass
+    direcciones = ImageAddresses()
+    resumen = {}
+
+    def on_result(rutas_grupo, direccion):
+        for ruta in rutas_grupo:
+            direcciones[ruta] = direccion
+        salida.evento("result", "\n".join(f"{ruta}: {direccion}" for ruta in rutas_grupo),
+                      paths=rutas_grupo, address=direccion)
+
+    def on_progress(hechos, total):
+        salida.evento("progress", None, done=hechos, total=total)
+
+    geocoder = BatchGeocoder(rutas, on_result=on_result, on_done=resumen.update, on_progress=on_progress,
+                             cell_m=max(2 * args.radio, 10))
+    ejecutar(geocoder)
+    salida.evento("done", f"Direcciones obtenidas para {resumen['found']} de {resumen['images']} imágenes "
+                          f"con coordenadas. Consultas a Nominatim: {resumen['requests']}"
+                          f"{' (cancelado)' if resumen['cancelled'] else ''}.",
+                  images=resumen["images"], groups=resumen["groups"], requests=resumen["requests"],
+                  found=resumen["found"], cancelled=resumen["cancelled"],
+                  errors=[{"path": ruta, "error": error} for ruta, error in resumen["errors"]])
+    return codigo_salida(resumen)
+
+
+def cmd_export(args, salida):
+    if args.formato:
+        formato = args.formato
+    else:
+        try:
+            formato = "csv" if args.salida == "-" else formato_catalogo(args.salida)
+        except ValueError as e:
+            print(str(e) + ". Indique el formato con --formato.", file=sys.stderr)
+            return 2
+    rutas = buscar_imagenes(args)
+    if not rutas:
+        return 1
+    direcciones = ImageAddresses()
+    # Los registros se generan a medida que se escriben: la memoria no crece con el número de imágenes
+    registros = (registro(ruta, metadatos, direcciones) for ruta, metadatos in leer_metadatos(rutas, args))
+    if args.salida == "-":
+        salida.stream = sys.stderr  # Los datos van a la salida estándar y el progreso, aparte
+        exportadas = exportar_catalogo(registros, sys.stdout, formato)
+    else:
+        exportadas = exportar_catalogo(registros, args.salida, formato)
+    salida.evento("done", f"Imágenes exportadas: {exportadas}.", total=len(rutas), exported=exportadas,
+                  output=args.salida, format=formato)
+    return 0
+
+
+def cmd_import(args, salida):
+    rutas = None
+    if args.rutas:
+        rutas = buscar_imagenes(args)
+        if not rutas:
+            return 1
+    try:
+        pares, sin_emparejar = descripciones_de_catalogo(leer_catalogo(args.catalogo), rutas)
+    except (OSError, ValueError, csv.Error) as e:
+        print("Error al leer el catálogo: " + str(e), file=sys.stderr)
+        return 2
+    if sin_emparejar:
+        salida.evento("unmatched", f"Registros sin imagen correspondiente: {sin_emparejar}.", count=sin_emparejar)
+    if not pares:
+        print("El catálogo no tiene descripciones para estas imágenes.", file=sys.stderr)
+        return 1
+    resumen = {}
+
+    def on_progress(hechas, total):
+        salida.evento("progress", None, done=hechas, total=total)
+
+    ejecutar(DescriptionImporter(pares, on_done=resumen.update, on_progress=on_progress, workers=args.hilos))
+    for ruta, error in resumen["errors"]:
+        salida.evento("error", f"{ruta}: ERROR {error}", path=ruta, error=error)
+    salida.evento("done", f"Descripciones importadas: {len(resumen['paths'])}; ya estaban al día: "
+                          f"{resumen['unchanged']}{' (cancelado)' if resumen['cancelled'] else ''}.",
+                  total=resumen["total"], written=len(resumen["paths"]), unchanged=resumen["unchanged"],
+                  unmatched=sin_emparejar, cancelled=resumen["cancelled"],
+                  errors=[{"path": ruta, "error": error} for ruta, error in resumen["errors"]])
+    return codigo_salida(resumen)
+
+
+def cmd_geotag(args, salida):
+    try:
+        zona = None if args.zona is None else parse_desplazamiento(args.zona)
+        desfase = parse_desplazamiento(args.desfase) if args.desfase else None
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    try:
+        track = TrackIndex.from_files(args.track)
+    except (OSError, ValueError) as e:
+        print("Error al leer el track: " + str(e), file=sys.stderr)
+        return 2
+    if not len(track):
+        print("Los tracks no tienen puntos con hora.", file=sys.stderr)
+        return 2
+    rutas = buscar_imagenes(args)
+    if not rutas:
+        return 1
+    # Se precargan en paralelo los metadatos, que emparejar_track lee después desde la caché
+    for _ in leer_metadatos(rutas, args):
+        pass
+    posiciones, resumen = emparejar_track(rutas, track, zona, desfase, args.sobrescribir,
+                                          args.max_hueco, args.tolerancia)
+    for ruta in rutas:
+        if ruta in posiciones:
+            lat, lon = posiciones[ruta]
+            salida.evento("match", f"{ruta}: {lat:.6f}, {lon:.6f}", path=ruta, latitude=lat, longitude=lon)
+    salida.evento("matched", f"Con posición en el track: {resumen['matched']} de {resumen['total']} "
+                             f"(sin fecha: {resumen['no_date']}, fuera del track: {resumen['no_match']}, "
+                             f"ya con coordenadas: {resumen['has_gps']}).", **resumen)
+    if args.simular or not posiciones:
+        return 0
+    escritura = {}
+    ejecutar(GeotagWriter(posiciones, on_done=escritura.update, workers=args.hilos))
+    direcciones = ImageAddresses()
+    for ruta in escritura["paths"]:
+        if ruta in direcciones:
+            direcciones[ruta] = ""  # Era la dirección de las coordenadas anteriores
+    for ruta, error in escritura["errors"]:
+        salida.evento("error", f"{ruta}: ERROR {error}", path=ruta, error=error)
+    salida.evento("done", f"Coordenadas guardadas en {len(escritura['paths'])} imágenes"
+                          f"{' (cancelado)' if escritura['cancelled'] else ''}.",
+                  written=len(escritura["paths"]), cancelled=escritura["cancelled"],
+                  errors=[{"path": ruta, "error": error} for ruta, error in escritura["errors"]])
+    return codigo_salida(escritura)
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="fotodesc", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--diagnostico", metavar="ARCHIVO",
+                        help="medir las operaciones (metadatos, EXIF, API...) y guardar el resumen en este JSON")
+    comunes = argparse.ArgumentParser(add_help=False)
+    comunes.add_argument("rutas", nargs="+", help="archivos, carpetas o patrones glob")
+    comunes.add_argument("-r", "--recursivo", action="store_true",
+                         help="incluir las subcarpetas (y ** en los patrones glob)")
+    comunes.add_argument("--json", action="store_true", help="escribir el progreso como líneas JSON")
+    comunes.add_argument("--hilos", type=int, default=0,
+                         help="trabajadores para leer los metadatos (0: según los núcleos)")
+    comunes.add_argument("--procesos", action="store_true",
+                         help="leer los metadatos con procesos en lugar de hilos")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    scan = ordenes.add_parser("scan", parents=[comunes], help="mostrar los metadatos de las imágenes")
+    scan.set_defaults(funcion=cmd_scan)
+
+    describe = ordenes.add_parser("describe", parents=[comunes],
+                                  help="obtener descripciones automáticas y guardarlas en el EXIF")
+    describe.add_argument("--api-key", default="", help="API Key de OpenAI (por defecto, OPENAI_API_KEY)")
+    describe.add_argument("--prompt", default=PROMPT_DESCRIPCION)
+    describe.add_argument("--detalle", choices=("low", "high"), default="high")
+    describe.add_argument("--max-tokens", type=int, default=300)
+    describe.add_argument("--concurrencia", type=int, default=4, help="peticiones simultáneas a la API")
+    describe.add_argument("--rpm", type=int, default=60, help="peticiones por minuto (0: sin límite)")
+    describe.add_argument("--tpm", type=int, default=0, help="tokens por minuto (0: sin límite)")
+    describe.add_argument("--por-peticion", type=int, default=1, choices=range(1, LOTE_MAX_IMAGENES + 1),
+                          metavar="N", help=f"imágenes por petición, de 1 a {LOTE_MAX_IMAGENES} "
+                                            "(con más de una, la respuesta se pide en JSON)")
+    describe.add_argument("--progresivo", action="store_true",
+                          help="pedir las respuestas en streaming y emitir un evento partial por fragmento "
+                               "(solo con --json y una imagen por petición)")
+    describe.add_argument("--forzar", action="store_true", help="no usar la caché de descripciones")
+    describe.add_argument("--solo-sin-descripcion", action="store_true",
+                          help="describir solo las imágenes que aún no tienen descripción")
+    describe.set_defaults(funcion=cmd_describe)
+
+    geocode = ordenes.add_parser("geocode", parents=[comunes],
+                                 help="obtener la dirección de las imágenes con coordenadas")
+    geocode.add_argument("--proveedor", choices=("nominatim", "offline", "fallback"), default="nominatim")
+    geocode.add_argument("--indice", help="índice sin conexión (por defecto, el de la aplicación)")
+    geocode.add_argument("--nomenclator", help="crear antes el índice sin conexión desde un archivo de GeoNames")
+    geocode.add_argument("--precision", type=int, default=3, help="decimales de la rejilla de la caché")
+    geocode.add_argument("--radio", type=int, default=50, help="radio en metros para reutilizar direcciones")
+    geocode.set_defaults(funcion=cmd_geocode)
+
+    export = ordenes.add_parser("export", parents=[comunes],
+                                help="exportar los metadatos a CSV, JSON Lines o GeoJSON")
+    export.add_argument("--formato", choices=("csv", "jsonl", "geojson"),
+                        help="formato del catálogo (por defecto, según la extensión de --salida; si no, csv)")
+    export.add_argument("-o", "--salida", default="-", help="archivo de destino (- para la salida estándar)")
+    export.set_defaults(funcion=cmd_export)
+
+    importar = ordenes.add_parser("import", help="guardar en el EXIF las descripciones de un catálogo exportado")
+    importar.add_argument("catalogo", help="archivo .csv, .jsonl o .geojson creado con export")
+    importar.add_argument("rutas", nargs="*",
+                          help="imágenes a las que aplicarlo (por defecto, las rutas del catálogo); "
+                               "si la ruta no coincide se empareja por nombre de archivo")
+    importar.add_argument("-r", "--recursivo", action="store_true", help="incluir las subcarpetas")
+    importar.add_argument("--json", action="store_true", help="escribir el progreso como líneas JSON")
+    importar.add_argument("--hilos", type=int, default=0, help="hilos de escritura (0: según los núcleos)")
+    importar.set_defaults(funcion=cmd_import)
+
+    geotag = ordenes.add_parser("geotag", parents=[comunes],
+                                help="poner coordenadas a las imágenes según la hora, con tracks GPX o KML")
+    geotag.add_argument("--track", action="append", required=True, help="archivo GPX o KML (se puede repetir)")
+    geotag.add_argument("--zona", help="diferencia del reloj de la cámara con UTC, por ejemplo --zona=+2:00 "
+                                       "(por defecto, la zona horaria de este equipo)")
+    geotag.add_argument("--desfase", help="lo que hay que sumar a la hora de la cámara para que sea la correcta, "
+                                          "por ejemplo --desfase=-0:01:30")
+    geotag.add_argument("--max-hueco", type=int, default=600,
+                        help="segundos máximos entre dos puntos del track para interpolar")
+    geotag.add_argument("--tolerancia", type=int, default=120,
+                        help="segundos máximos hasta el punto más cercano cuando no se interpola")
+    geotag.add_argument("--sobrescribir", action="store_true", help="cambiar también las que ya tienen coordenadas")
+    geotag.add_argument("--simular", action="store_true", help="mostrar las posiciones sin guardarlas")
+    geotag.set_defaults(funcion=cmd_geotag)
+    return parser
+
+
+def main(argv=None):
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if args.orden == "describe" and args.progresivo and (not args.json or args.por_peticion > 1):
+        # Los fragmentos solo se emiten como eventos JSON, y los lotes no se piden en streaming
+        parser.error("--progresivo requiere --json y --por-peticion 1")
+    salida = Salida(args.json)
+    if args.diagnostico:
+        instrumentacion.activar()
+    try:
+        return args.funcion(args, salida)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if args.diagnostico:
+            instrumentacion.volcar(args.diagnostico)
@@ -0,0 +1,3367 @@
+import os
+import piexif
+import json
+import csv
+import base64
+import io
+import sqlite3
+import threading
+import tempfile
+import shutil
+import zlib
+import time
+import math
+import bisect
+import datetime
+import random
+import queue
+import hashlib
+import mmap
+import struct
+import sys
+import functools
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# ---------------- Importaciones diferidas ----------------
+# PIL, pillow-heif, requests, urllib.request y NumPy tardan en importarse; se cargan la primera vez que se usan
+# para que la ventana aparezca cuanto antes (los JPEG se listan sin llegar a cargar PIL).
+@functools.lru_cache(maxsize=None)
+def pil_image():
+    """Devuelve el módulo PIL.Image, tras registrar el opener para HEIF/HEIC si pillow-heif está instalado."""
+    from PIL import Image
+    try:
+        import pillow_heif
+        pillow_heif.register_heif_opener()
+    except ImportError:
+        pass
+    return Image
+
+@functools.lru_cache(maxsize=None)
+def numpy_module():
+    """NumPy es opcional: si está instalado se usa para agrupar coordenadas y emparejar tracks de forma vectorizada."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+# ---------------- Instrumentación de rendimiento ----------------
+class Medida:
+    """Mide una operación dentro de un bloque with; con bytes() se suman los bytes enviados y recibidos."""
+    __slots__ = ("instrumentacion", "nombre", "inicio", "enviados", "recibidos")
+
+    def __init__(self, instrumentacion, nombre):
+        self.instrumentacion = instrumentacion
+        self.nombre = nombre
+        self.enviados = 0
+        self.recibidos = 0
+
+    def bytes(self, enviados=0, recibidos=0):
+        self.enviados += enviados
+        self.recibidos += recibidos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self.instrumentacion.registrar(self.nombre, time.perf_counter() - self.inicio,
+                                       self.enviados, self.recibidos, tipo is not None)
+        return False
+
+class MedidaNula:
+    """Lo que devuelve medir() con la instrumentación desactivada: no mide nada."""
+    __slots__ = ()
+
+    def bytes(self, enviados=0, recibidos=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        return False
+
+MEDIDA_NULA = MedidaNula()
+# Hasta Python 3.11 cProfile solo mide el hilo que lo activa; desde 3.12 mide todos los hilos a la vez
+PERFIL_POR_HILO = sys.version_info < (3, 12)
+
+class Instrumentacion:
+    """
+    Contadores, histogramas de latencia y bytes enviados y recibidos de las operaciones costosas: lectura de
+    metadatos, filas del listado, vistas previas, escritura de EXIF y peticiones a la API y a Nominatim.
+    Desactivada (por defecto), medir() devuelve siempre el mismo contexto vacío, así que medir una operación
+    solo cuesta una llamada. Con iniciar_perfil() se capturan además un perfil de cProfile y las reservas
+    de memoria (tracemalloc) hasta que se llama a detener_perfil().
+    Hasta Python 3.11 cada hilo activa y quita su propio cProfile en punto_de_control(), que llaman medir()
+    y los bucles de los hilos de fondo (vistas previas, precarga de metadatos y vigilancia de carpetas).
+    """
+    LIMITES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)  # Cubetas del histograma
+
+    def __init__(self):
+        self.activa = False
+        self.lock = threading.Lock()
+        self.operaciones = {}  # nombre -> estadísticas acumuladas (ver registrar)
+        self.desde = time.time()
+        self.perfiles = None   # cProfile.Profile de cada hilo medido mientras se captura un perfil
+        self.captura = 0       # Número de la captura en curso o de la última
+        self.hilo = threading.local()  # cProfile del hilo actual y número de su captura (PERFIL_POR_HILO)
+        self.hilos_perfilados = 0      # Hilos que aún tienen activado un cProfile
+
+    def activar(self, activa=True):
+        self.activa = activa
+
+    def medir(self, nombre):
+        """Contexto que mide la operación nombre: with instrumentacion.medir("exif.escritura"): ..."""
+        if self.perfiles is not None or self.hilos_perfilados:
+            self.punto_de_control()
+        if not self.activa:
+            return MEDIDA_NULA
+        return Medida(self, nombre)
+
+    def contar(self, nombre):
+        """Cuenta una operación sin medir su duración (por ejemplo, un acierto de caché)."""
+        if self.activa:
+            self.registrar(nombre, None)
+
+    def registrar(self, nombre, segundos, enviados=0, recibidos=0, error=False):
+        with self.lock:
+            op = self.operaciones.get(nombre)
+            if op is None:
+                op = self.operaciones[nombre] = {
+                    "count": 0, "errors": 0, "timed": 0, "total": 0.0, "min": None, "max": 0.0,
+                    "sent": 0, "received": 0, "histogram": [0] * (len(self.LIMITES_MS) + 1)}
+            op["count"] += 1
+            op["errors"] += error
+            op["sent"] += enviados
+            op["received"] += recibidos
+            if segundos is not None:
+                op["timed"] += 1
+                op["total"] += segundos
+                op["min"] = segundos if op["min"] is None else min(op["min"], segundos)
+                op["max"] = max(op["max"], segundos)
+                op["histogram"][bisect.bisect_left(self.LIMITES_MS, segundos * 1000)] += 1
+
+    def reiniciar(self):
+        with self.lock:
+            self.operaciones = {}
+            self.desde = time.time()
+
+    def percentil(self, op, fraccion):
+        """Percentil estimado con el histograma: límite de la cubeta en la que cae, como mucho el máximo."""
+        objetivo = fraccion * op["timed"]
+        acumulado = 0
+        for cubeta, cantidad in enumerate(op["histogram"]):
+            acumulado += cantidad
+            if acumulado >= objetivo and cubeta < len(self.LIMITES_MS):
+                return min(self.LIMITES_MS[cubeta], op["max"] * 1000)
+        return op["max"] * 1000
+
+    def resumen(self):
+        """Diccionario nombre -> estadísticas en milisegundos y bytes, ordenado por tiempo total."""
+        with self.lock:
+            operaciones = {nombre: dict(op, histogram=list(op["histogram"]))
+                           for nombre, op in self.operaciones.items()}
+        etiquetas = [f"<={limite}" for limite in self.LIMITES_MS] + [f">{self.LIMITES_MS[-1]}"]
+        resumen = {}
+        for nombre, op in sorted(operaciones.items(), key=lambda item: -item[1]["total"]):
+            datos = {"count": op["count"], "errors": op["errors"],
+                     "bytes_sent": op["sent"], "bytes_received": op["received"]}
+            if op["timed"]:
+                datos.update({
+                    "total_ms": round(op["total"] * 1000, 3),
+                    "mean_ms": round(op["total"] * 1000 / op["timed"], 3),
+                    "min_ms": round(op["min"] * 1000, 3),
+                    "p50_ms": round(self.percentil(op, 0.5), 3),
+                    "p95_ms": round(self.percentil(op, 0.95), 3),
+                    "p99_ms": round(self.percentil(op, 0.99), 3),
+                    "max_ms": round(op["max"] * 1000, 3),
+                    "histogram_ms": {e: n for e, n in zip(etiquetas, op["histogram"]) if n},
+                })
+            resumen[nombre] = datos
+        return resumen
+
+    def volcar(self, destino):
+        """Guarda el resumen en un archivo JSON, junto con los datos del equipo y de la sesión."""
+        import platform
+        datos = {
+            "since": datetime.datetime.fromtimestamp(self.desde).isoformat(timespec="seconds"),
+            "until": datetime.datetime.now().isoformat(timespec="seconds"),
+            "enabled": self.activa,
+            "profiling": self.perfilando(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "operations": self.resumen(),
+        }
+        atomic_write(destino, [json.dumps(datos, ensure_ascii=False, indent=1).encode("utf-8")])
+
+    def perfilando(self):
+        return self.perfiles is not None
+
+    def iniciar_perfil(self):
+        """
+        Empieza a capturar un perfil de CPU y de memoria. Hasta Python 3.11 se miden el hilo que llama, los hilos
+        que se creen mientras dura la captura y los hilos de fondo a partir de su siguiente tarea; desde 3.12,
+        todos los hilos.
+        """
+        import cProfile
+        import tracemalloc
+        with self.lock:
+            if self.perfiles is not None:
+                return
+            self.perfiles = []
+            self.captura += 1
+        tracemalloc.start(10)
+        if PERFIL_POR_HILO:
+            threading.setprofile(self._perfilar_hilo)
+            self.punto_de_control()
+        else:
+            perfil = cProfile.Profile()
+            self.perfiles.append(perfil)
+            perfil.enable()
+
+    def _perfilar_hilo(self, frame, event, arg):
+        # Se ejecuta con el primer evento de cada hilo nuevo y deja en su lugar un cProfile para ese hilo
+        sys.setprofile(None)
+        self.punto_de_control()
+
+    def punto_de_control(self):
+        """
+        Con PERFIL_POR_HILO, ajusta el cProfile del hilo que llama: si hay una captura en curso y el hilo aún no
+        se mide, lo activa; si la captura ya terminó, lo quita, para que el hilo deje de pagar su coste.
+        """
+        if not PERFIL_POR_HILO:
+            return
+        perfil = getattr(self.hilo, "perfil", None)
+        if perfil is not None:
+            if self.perfiles is not None and self.hilo.captura == self.captura:
+                return
+            perfil.disable()
+            # Si el perfil ya se volcó desde otro hilo, disable() no quita la función de perfil de este
+            sys.setprofile(None)
+            self.hilo.perfil = None
+            with self.lock:
+                self.hilos_perfilados -= 1
+        if self.perfiles is not None:
+            import cProfile
+            perfil = cProfile.Profile()
+            with self.lock:
+                if self.perfiles is None:
+                    return
+                self.perfiles.append(perfil)
+                self.hilos_perfilados += 1
+                self.hilo.perfil = perfil
+                self.hilo.captura = self.captura
+            perfil.enable()
+
+    def detener_perfil(self, carpeta):
+        """
+        Termina la captura y guarda en la carpeta el perfil (.prof, para pstats o snakeviz) y un resumen de texto
+        con las funciones más costosas y las líneas que más memoria reservaron. Devuelve las rutas guardadas.
+        Con PERFIL_POR_HILO, los demás hilos dejan de medirse en su siguiente punto de control.
+        """
+        import pstats
+        import tracemalloc
+        with self.lock:
+            perfiles, self.perfiles = self.perfiles, None
+        if perfiles is None:
+            return []
+        if PERFIL_POR_HILO:
+            threading.setprofile(None)
+            self.punto_de_control()
+        else:
+            perfiles[0].disable()
+        memoria = None
+        if tracemalloc.is_tracing():
+            actual, pico = tracemalloc.get_traced_memory()
+            memoria = (actual, pico, tracemalloc.take_snapshot().statistics("lineno")[:30])
+            tracemalloc.stop()
+        os.makedirs(carpeta, exist_ok=True)
+        base = os.path.join(carpeta, "perfil-" + time.strftime("%Y%m%d-%H%M%S"))
+        # Los hilos que no llegaron a ejecutar nada dejan un perfil vacío, que pstats no admite
+        perfiles = [perfil for perfil in perfiles if perfil.getstats()]
+        estadisticas = pstats.Stats()
+        if perfiles:
+            estadisticas.add(*perfiles)
+        estadisticas.dump_stats(base + ".prof")
+        texto = io.StringIO()
+        texto.write(f"Hilos medidos: {len(perfiles)}\n\n")
+        estadisticas.stream = texto
+        estadisticas.sort_stats("cumulative").print_stats(40)
+        if memoria is not None:
+            actual, pico, lineas = memoria
+            texto.write(f"\nMemoria reservada al terminar: {actual / 1024:.0f} KiB; pico: {pico / 1024:.0f} KiB\n")
+            for linea in lineas:
+                texto.write(f"{linea}\n")
+        atomic_write(base + ".txt", [texto.getvalue().encode("utf-8")])
+        return [base + ".prof", base + ".txt"]
+
+instrumentacion = Instrumentacion()
+
+# ---------------- Funciones Comunes ----------------
+def decimal_to_dms_rational(dec):
+    dec = abs(dec)
+    degrees = int(dec)
+    minutes = int((dec - degrees) * 60)
+    seconds = (dec - degrees - minutes / 60) * 3600
+    return ((degrees, 1), (minutes, 1), (int(seconds * 100), 100))
+
+def dms_to_decimal(dms, ref):
+    try:
+        degrees = dms[0][0] / dms[0][1]
+        minutes = dms[1][0] / dms[1][1]
+        seconds = dms[2][0] / dms[2][1]
+        dec = degrees + minutes / 60 + seconds / 3600
+        if ref in ['S', 'W']:
+            dec = -dec
+        return dec
+    except Exception:
+        return None
+
+# ---------------- Preparación de imágenes para la API ----------------
+OPENAI_MODEL = "gpt-4o-mini"  # Verifica en la documentación oficial el nombre correcto del modelo
+# Se puede apuntar a un servidor local de pruebas con la variable de entorno FOTODESC_API_URL
+OPENAI_API_URL = os.environ.get("FOTODESC_API_URL", "https://api.openai.com/v1/chat/completions")
+PROMPT_DESCRIPCION = "Describe la imagen de manera detallada."
+# Tamaño máximo del JPEG enviado según el nivel de detalle
+API_MAX_BYTES = {"low": 256 * 1024, "high": 1536 * 1024}
+
+def dimensiones_para_api(width, height, detail):
+    """
+    Calcula el tamaño al que la API reduce la imagen de todas formas: con detail="low" cabe en 512x512;
+    con "high" (o "auto") cabe en 2048x2048 y su lado menor no pasa de 768 píxeles.
+    """
+    if detail == "low":
+        scale = min(1.0, 512 / max(width, height))
+    else:
+        scale = min(1.0, 2048 / max(width, height))
+        lado_menor = min(width, height) * scale
+        if lado_menor > 768:
+            scale *= 768 / lado_menor
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def tamano_jpeg(datos):
+    """(ancho, alto) de un JPEG en memoria leyendo solo sus cabeceras hasta el marcador SOF, o None."""
+    pos = 2
+    while pos + 9 <= len(datos):
+        if datos[pos] != 0xFF:
+            return None
+        code = datos[pos + 1]
+        if code == 0xFF:  # Byte de relleno
+            pos += 1
+        elif code == 0x01 or 0xD0 <= code <= 0xD7:
+            pos += 2
+        elif code in (0xDA, 0xD9):  # Datos comprimidos o fin de imagen sin haber encontrado SOF
+            return None
+        elif 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            alto, ancho = struct.unpack(">HH", datos[pos + 5:pos + 9])
+            return ancho, alto
+        else:
+            pos += 2 + struct.unpack(">H", datos[pos + 2:pos + 4])[0]
+    return None
+
+def preparar_imagen_para_api(ruta_imagen, detail="high"):
+    """
+    Reduce la imagen a la resolución efectiva de la API y la vuelve a codificar como JPEG sin metadatos,
+    bajando la calidad si hace falta para no superar API_MAX_BYTES. Devuelve un io.BytesIO.
+    """
+    Image = pil_image()
+    from PIL import ImageOps
+    img = Image.open(ruta_imagen)
+    target = dimensiones_para_api(img.width, img.height, detail)
+    if img.format == "JPEG":
+        img.draft("RGB", target)
+    # Se aplica la orientación EXIF porque los metadatos no se envían
+    img = ImageOps.exif_transpose(img)
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        fondo = Image.new("RGB", img.size, (255, 255, 255))
+        fondo.paste(img, mask=img.getchannel("A"))
+        img = fondo
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    target = dimensiones_para_api(img.width, img.height, detail)
+    if img.size != target:
+        img = img.resize(target, Image.LANCZOS)
+    max_bytes = API_MAX_BYTES.get(detail, API_MAX_BYTES["high"])
+    for quality in (85, 75, 65, 50, 35):
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=quality, optimize=True)
+        if buffer.tell() <= max_bytes:
+            break
+    return buffer
+
+def imagen_a_data_url(ruta_imagen, detail="high"):
+    """Convierte una imagen (ya reducida para la API) en un Data URL en Base64."""
+    buffer = preparar_imagen_para_api(ruta_imagen, detail)
+    encoded = base64.b64encode(buffer.getbuffer()).decode("ascii")
+    return f"data:image/jpeg;base64,{encoded}"
+
+def ensamblar_cuerpo(payload, jpeg_buffers):
+    """
+    Serializa payload, en el que la imagen i aparece como el marcador "@@IMAGEN{i}@@", como bytearray.
+    Cada imagen se codifica en Base64 por bloques directamente dentro del buffer, sin crear la cadena
+    del Data URL ni serializarla otra vez con json.
+    """
+    trozos = []
+    resto = json.dumps(payload).encode("utf-8")
+    for i in range(len(jpeg_buffers)):
+        antes, resto = resto.split(f"@@IMAGEN{i}@@".encode("ascii"), 1)
+        trozos.append(antes + b"data:image/jpeg;base64,")
+    imagenes = [jpeg_buffer.getbuffer() for jpeg_buffer in jpeg_buffers]
+    body = bytearray(sum(map(len, trozos)) + sum(4 * ((len(imagen) + 2) // 3) for imagen in imagenes) + len(resto))
+    pos = 0
+    bloque = 3 * 64 * 1024  # Múltiplo de 3 para que los bloques Base64 no lleven relleno intermedio
+    for trozo, imagen in zip(trozos, imagenes):
+        body[pos:pos + len(trozo)] = trozo
+        pos += len(trozo)
+        for i in range(0, len(imagen), bloque):
+            encoded = base64.b64encode(imagen[i:i + bloque])
+            body[pos:pos + len(encoded)] = encoded
+            pos += len(encoded)
+        imagen.release()
+    body[pos:] = resto
+    return body
+
+def construir_cuerpo_peticion(prompt, jpeg_buffer, detail="high", max_tokens=300, model=OPENAI_MODEL, stream=False):
+    """
+    Construye el cuerpo JSON de la petición de una imagen como bytearray (ver ensamblar_cuerpo).
+    Con stream=True la respuesta llega por partes, como eventos SSE.
+    """
+    payload = {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": "@@IMAGEN0@@", "detail": detail}}
+                ]
+            }
+        ],
+        "max_tokens": max_tokens
+    }
+    if stream:
+        payload["stream"] = True
+    return ensamblar_cuerpo(payload, [jpeg_buffer])
+
+# Varias imágenes por petición: el prompt y la latencia de cada llamada se reparten entre todas
+LOTE_MAX_BYTES = 8 * 1024 * 1024  # Tamaño máximo de las imágenes (en Base64) de una petición
+LOTE_MAX_IMAGENES = 10
+ESQUEMA_LOTE = {
+    "name": "descripciones",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "descriptions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"index": {"type": "integer"}, "description": {"type": "string"}},
+                    "required": ["index", "description"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["descriptions"],
+        "additionalProperties": False,
+    },
+}
+
+def construir_cuerpo_lote(prompt, jpeg_buffers, detail="high", max_tokens=300, model=OPENAI_MODEL):
+    """
+    Cuerpo de una petición con varias imágenes numeradas desde 1, en la que se pide una respuesta JSON
+    con el esquema ESQUEMA_LOTE. max_tokens es por imagen.
+    """
+    cantidad = len(jpeg_buffers)
+    contenido = [{"type": "text", "text": (
+        f"{prompt}\n\nSe adjuntan {cantidad} imágenes, cada una precedida de su número (de 1 a {cantidad}). "
+        "Describe cada imagen por separado, sin mezclar el contenido de unas con otras, y responde solo con "
+        "el JSON del esquema: una entrada por imagen, con su número en \"index\" y su descripción "
+        "en \"description\".")}]
+    for i in range(cantidad):
+        contenido.append({"type": "text", "text": f"Imagen {i + 1}:"})
+        contenido.append({"type": "image_url", "image_url": {"url": f"@@IMAGEN{i}@@", "detail": detail}})
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": contenido}],
+        "max_tokens": (max_tokens + 20) * cantidad,  # Unos tokens más por imagen para la estructura del JSON
+        "response_format": {"type": "json_schema", "json_schema": ESQUEMA_LOTE},
+    }
+    return ensamblar_cuerpo(payload, jpeg_buffers)
+
+def interpretar_respuesta_lote(contenido, cantidad):
+    """
+    Devuelve {posición desde 0: descripción} con las entradas válidas de la respuesta a construir_cuerpo_lote
+    (pueden faltar algunas). Lanza ValueError si la respuesta no es JSON con el esquema pedido.
+    """
+    datos = json.loads(contenido)
+    entradas = datos.get("descriptions") if isinstance(datos, dict) else None
+    if not isinstance(entradas, list):
+        raise ValueError("La respuesta no sigue el esquema de descripciones")
+    descripciones = {}
+    for entrada in entradas:
+        try:
+            indice = int(entrada["index"]) - 1
+            texto = entrada["description"].strip()
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        if 0 <= indice < cantidad and texto and indice not in descripciones:
+            descripciones[indice] = texto
+    return descripciones
+
+def agrupar_por_tamano(preparadas, max_bytes=LOTE_MAX_BYTES, max_imagenes=LOTE_MAX_IMAGENES):
+    """Reparte una lista de (ruta, JPEG) en lotes consecutivos de como mucho max_imagenes y max_bytes en Base64."""
+    lotes, lote, ocupado = [], [], 0
+    for ruta, jpeg_buffer in preparadas:
+        tamano = 4 * ((jpeg_buffer.getbuffer().nbytes + 2) // 3)
+        if lote and (len(lote) >= max_imagenes or ocupado + tamano > max_bytes):
+            lotes.append(lote)
+            lote, ocupado = [], 0
+        lote.append((ruta, jpeg_buffer))
+        ocupado += tamano
+    if lote:
+        lotes.append(lote)
+    return lotes
+
+class APIError(Exception):
+    """Error HTTP de la API; guarda el código y, si lo hay, el tiempo de espera indicado por Retry-After."""
+    def __init__(self, code, error_info, retry_after=None):
+        super(APIError, self).__init__("Error en la petición: {} - {}".format(code, error_info))
+        self.code = code
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_http_error(cls, e):
+        """Crea el error a partir de un urllib.error.HTTPError, con el cuerpo y el Retry-After de la respuesta."""
+        error_info = e.read().decode("utf-8")
+        try:
+            retry_after = float(e.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            retry_after = None
+        return cls(e.code, error_info, retry_after)
+
+class APIStreamError(APIError):
+    """Error que la API envía como evento a mitad de una respuesta en streaming, o evento que no se entiende."""
+    def __init__(self, message):
+        Exception.__init__(self, "Error en la respuesta: " + message)
+        self.code = None
+        self.retry_after = None
+
+# ---------------- Caché de descripciones automáticas ----------------
+# Bloques PNG que solo contienen metadatos y no afectan al contenido de la imagen
+PNG_METADATA_CHUNKS = (b"eXIf", b"tEXt", b"iTXt", b"zTXt", b"tIME")
+
+def hash_contenido_imagen(ruta_imagen):
+    """
+    Calcula un hash SHA-256 del contenido de la imagen sin sus metadatos, para que la misma foto
+    tenga la misma huella aunque cambie su EXIF (por ejemplo, al guardar la descripción) o esté copiada
+    en otra carpeta. En JPEG se ignoran los segmentos APPn y COM; en PNG, los bloques de metadatos.
+    """
+    h = hashlib.sha256()
+    with open(ruta_imagen, "rb") as f:
+        cabecera = f.read(8)
+        if cabecera.startswith(JPEG_SOI):
+            f.seek(2)
+            while True:
+                marker = f.read(2)
+                if len(marker) < 2 or marker[0] != 0xFF:
+                    break
+                code = marker[1]
+                if code == 0xDA or code == 0xD9:
+                    h.update(marker)
+                    break
+                if code == 0x01 or 0xD0 <= code <= 0xD7:
+                    h.update(marker)
+                    continue
+                length_bytes = f.read(2)
+                segment = f.read(int.from_bytes(length_bytes, "big") - 2)
+                if not (0xE0 <= code <= 0xEF or code == 0xFE):
+                    h.update(marker + length_bytes + segment)
+        elif cabecera == PNG_SIGNATURE:
+            h.update(cabecera)
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    break
+                length = int.from_bytes(header[:4], "big")
+                if header[4:8] in PNG_METADATA_CHUNKS:
+                    f.seek(length + 4, 1)
+                else:
+                    h.update(header)
+                    h.update(f.read(length + 4))
+            return h.hexdigest()
+        else:
+            h.update(cabecera)
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+def clave_descripcion(ruta_imagen, prompt, detail="high", model=OPENAI_MODEL):
+    """Clave de la caché: hash del contenido de la imagen, el prompt, el modelo y el nivel de detalle."""
+    partes = "\0".join((hash_contenido_imagen(ruta_imagen), prompt, model, detail))
+    return hashlib.sha256(partes.encode("utf-8")).hexdigest()
+
+class DescriptionCache:
+    """
+    Caché persistente (SQLite) de descripciones automáticas, direccionada por contenido.
+    Se limita por número de entradas (se descartan las usadas hace más tiempo) y por antigüedad.
+    """
+    def __init__(self, db_path=None, max_entries=50000, max_age_days=365):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def _connect(self):
+        if self.conn is None:
+            try:
+                if self.db_path is None:
+                    self.db_path = os.path.join(get_config_dir(), "descripciones.db")
+                self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS descriptions ("
+                    "key TEXT PRIMARY KEY, description TEXT, created REAL, last_used REAL)")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS descriptions_last_used ON descriptions (last_used)")
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn = False
+        return self.conn or None
+
+    def get(self, key):
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            now = time.time()
+            row = conn.execute("SELECT description, created FROM descriptions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.max_age:
+                conn.execute("DELETE FROM descriptions WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE descriptions SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            return row[0]
+
+    def put(self, key, description):
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            now = time.time()
+            try:
+                conn.execute("INSERT OR REPLACE INTO descriptions VALUES (?, ?, ?, ?)",
+                             (key, description, now, now))
+                self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM descriptions WHERE created < ?", (now - self.max_age,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM descriptions").fetchone()
+        if count > self.max_entries:
+            conn.execute("DELETE FROM descriptions WHERE key IN ("
+                         "SELECT key FROM descriptions ORDER BY last_used LIMIT ?)", (count - self.max_entries,))
+
+description_cache = DescriptionCache()
+
+def descripcion_en_cache(ruta_imagen, prompt, detail="high"):
+    """Devuelve la descripción guardada para esta imagen y prompt, o None si no la hay."""
+    try:
+        return description_cache.get(clave_descripcion(ruta_imagen, prompt, detail))
+    except OSError:
+        return None
+
+def enviar_peticion_api(api_key, data, operacion="api.descripcion"):
+    """
+    Envía el cuerpo a la API de OpenAI y devuelve el texto de la respuesta ("" si no trae ninguno).
+    Los errores HTTP se lanzan como APIError, con el Retry-After si lo hay, para poder reintentarlos.
+    """
+    import urllib.request
+    import urllib.error
+    url_api = OPENAI_API_URL
+    req = urllib.request.Request(url_api, data=data)
+    req.add_header("Content-Type", "application/json")
+    req.add_header("Authorization", "Bearer " + api_key)
+    
+    try:
+        with instrumentacion.medir(operacion) as medida, urllib.request.urlopen(req, timeout=120) as response:
+            cuerpo = response.read()
+            medida.bytes(len(data), len(cuerpo))
+            respuesta = cuerpo.decode("utf-8")
+            datos = json.loads(respuesta)
+            return datos.get("choices", [{}])[0].get("message", {}).get("content") or ""
+    except urllib.error.HTTPError as e:
+        raise APIError.from_http_error(e)
+    except Exception as ex:
+        raise Exception("Se produjo un error: " + str(ex))
+
+SIN_CONTENIDO = "No se encontró contenido en la respuesta."
+
+def describir_imagen(api_key, ruta_imagen, prompt, detail="high", max_tokens=300, force_refresh=False,
+                     jpeg_buffer=None, clave=None):
+    """
+    Envía una imagen y un prompt a la API de OpenAI para obtener una descripción.
+    Antes se consulta la caché de descripciones; con force_refresh=True se pide siempre a la API
+    (y el resultado sustituye al guardado). jpeg_buffer es la imagen ya preparada y clave la de la caché
+    (clave_descripcion), si ya se tienen: así no se vuelve a leer la imagen. Si la respuesta llega
+    sin texto se lanza una excepción, para no guardar una descripción vacía.
+    """
+    if clave is None:
+        clave = clave_descripcion(ruta_imagen, prompt, detail)
+    if not force_refresh:
+        guardada = description_cache.get(clave)
+        if guardada is not None:
+            instrumentacion.contar("api.cache")
+            return guardada
+    if jpeg_buffer is None:
+        with instrumentacion.medir("api.preparacion"):
+            jpeg_buffer = preparar_imagen_para_api(ruta_imagen, detail)
+    data = construir_cuerpo_peticion(prompt, jpeg_buffer, detail, max_tokens)
+    del jpeg_buffer
+    contenido = enviar_peticion_api(api_key, data)
+    if not contenido.strip():
+        raise Exception(SIN_CONTENIDO)
+    description_cache.put(clave, contenido)
+    return contenido
+
+def eventos_sse(lineas):
+    """
+    Generador con el campo data de cada evento de un flujo server-sent events, a partir de sus líneas en bytes.
+    Las líneas data de un mismo evento se unen con saltos de línea; los comentarios y el resto de campos se ignoran.
+    """
+    datos = []
+    for linea in lineas:
+        linea = linea.decode("utf-8").rstrip("\r\n")
+        if not linea:
+            if datos:
+                yield "\n".join(datos)
+                datos = []
+        elif linea.startswith("data:"):
+            datos.append(linea[6:] if linea.startswith("data: ") else linea[5:])
+    if datos:
+        yield "\n".join(datos)
+
+def cortar_conexion(response):
+    """Cierra la conexión de una respuesta HTTP aunque haya otro hilo bloqueado leyéndola."""
+    import socket
+    try:
+        sock = socket.socket(fileno=response.fileno())
+    except (OSError, ValueError):
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    finally:
+        sock.detach()  # El socket sigue siendo de la respuesta, que lo cerrará
+
+def describir_imagen_stream(api_key, ruta_imagen, prompt, on_text, detail="high", max_tokens=300,
+                            force_refresh=False, cancel_event=None, jpeg_buffer=None, clave=None):
+    """
+    Como describir_imagen, pero pide la respuesta en streaming (stream=True) y llama a on_text(fragmento, texto)
+    con cada trozo que llega y el texto acumulado, para ir mostrándolo mientras se genera. La descripción
+    completa se guarda en la caché al terminar. Si se activa cancel_event se corta la conexión, aunque el
+    servidor no esté enviando nada, y se devuelve None. Un evento de error lanza APIStreamError.
+    jpeg_buffer y clave son, como en describir_imagen, la imagen preparada y la clave de la caché si ya se tienen.
+    """
+    if clave is None:
+        clave = clave_descripcion(ruta_imagen, prompt, detail)
+    if not force_refresh:
+        guardada = description_cache.get(clave)
+        if guardada is not None:
+            instrumentacion.contar("api.cache")
+            on_text(guardada, guardada)
+            return guardada
+    import urllib.request
+    import urllib.error
+    if jpeg_buffer is None:
+        with instrumentacion.medir("api.preparacion"):
+            jpeg_buffer = preparar_imagen_para_api(ruta_imagen, detail)
+    data = construir_cuerpo_peticion(prompt, jpeg_buffer, detail, max_tokens, stream=True)
+    del jpeg_buffer
+    req = urllib.request.Request(OPENAI_API_URL, data=data)
+    req.add_header("Content-Type", "application/json")
+    req.add_header("Accept", "text/event-stream")
+    req.add_header("Authorization", "Bearer " + api_key)
+    partes = []
+    completa = False  # Si llegó [DONE]: sin él, la respuesta se cortó a medias
+    inicio = time.perf_counter()
+    terminada = threading.Event()
+
+    def vigilar(response):
+        # Un hilo aparte, porque el que lee puede estar bloqueado esperando datos que no llegan
+        while not terminada.wait(0.1):
+            if cancel_event.is_set():
+                cortar_conexion(response)
+                return
+
+    def lineas(response, medida):
+        for linea in response:
+            medida.bytes(recibidos=len(linea))
+            yield linea
+
+    try:
+        with instrumentacion.medir("api.descripcion_stream") as medida, \
+                urllib.request.urlopen(req, timeout=120) as response:
+            medida.bytes(len(data))
+            if cancel_event is not None:
+                threading.Thread(target=vigilar, args=(response,), daemon=True).start()
+            for evento in eventos_sse(lineas(response, medida)):
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                if evento == "[DONE]":
+                    completa = True
+                    break
+                try:
+                    datos = json.loads(evento)
+                except ValueError:
+                    raise APIStreamError("evento no válido: " + evento[:200])
+                if "error" in datos:
+                    error = datos["error"]
+                    if isinstance(error, dict):
+                        error = error.get("message") or json.dumps(error, ensure_ascii=False)
+                    raise APIStreamError(str(error))
+                fragmento = (datos.get("choices") or [{}])[0].get("delta", {}).get("content")
+                if fragmento:
+                    if not partes and instrumentacion.activa:
+                        instrumentacion.registrar("api.primer_texto", time.perf_counter() - inicio)
+                    partes.append(fragmento)
+                    on_text(fragmento, "".join(partes))
+    except urllib.error.HTTPError as e:
+        raise APIError.from_http_error(e)
+    except APIError:
+        raise
+    except Exception as ex:
+        if cancel_event is not None and cancel_event.is_set():
+            return None  # La lectura falló porque se cortó la conexión al cancelar
+        raise Exception("Se produjo un error: " + str(ex))
+    finally:
+        terminada.set()
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+    if not completa:
+        raise Exception("La respuesta se cortó antes de terminar")
+    contenido = "".join(partes).strip()
+    if not contenido:
+        raise Exception(SIN_CONTENIDO)
+    description_cache.put(clave, contenido)
+    return contenido
+
+def describir_lote(api_key, rutas, prompt, jpeg_buffers, detail="high", max_tokens=300, claves=None):
+    """
+    Describe varias imágenes ya preparadas con una sola petición y devuelve {ruta: descripción} con las que
+    vienen en la respuesta, que también se guardan en la caché de descripciones (con claves[ruta], si se
+    tiene, o calculando la clave). Lanza APIError si la API responde con error y ValueError si la respuesta
+    no sigue el esquema.
+    """
+    data = construir_cuerpo_lote(prompt, jpeg_buffers, detail, max_tokens)
+    contenido = enviar_peticion_api(api_key, data, "api.descripcion_lote")
+    del data
+    descripciones = {}
+    for indice, descripcion in interpretar_respuesta_lote(contenido, len(rutas)).items():
+        descripciones[rutas[indice]] = descripcion
+        try:
+            clave = (claves or {}).get(rutas[indice]) or clave_descripcion(rutas[indice], prompt, detail)
+            description_cache.put(clave, descripcion)
+        except OSError:
+            pass
+    return descripciones
+
+# ---------------- Descripción automática por lotes ----------------
+def estimar_tokens(ruta_imagen, prompt, detail="high", max_tokens=300, tamano=None):
+    """
+    Estima los tokens que consumirá una petición (imagen + prompt + respuesta máxima) para el limitador.
+    tamano es (ancho, alto) si ya se conoce, por ejemplo el de la imagen preparada (tamano_jpeg); si no,
+    solo se leen las dimensiones de la imagen, no sus píxeles.
+    """
+    try:
+        if tamano is None:
+            with pil_image().open(ruta_imagen) as img:
+                tamano = img.size
+        width, height = tamano
+    except Exception:
+        width, height = 2048, 2048
+    if detail == "low":
+        tokens_imagen = 85
+    else:
+        w, h = dimensiones_para_api(width, height, detail)
+        tokens_imagen = 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+    return tokens_imagen + len(prompt) // 4 + max_tokens
+
+class RateLimiter:
+    """
+    Limitador de cubo de fichas para peticiones por minuto y tokens por minuto.
+    Un límite 0 significa sin límite. burst es el número de peticiones que se pueden hacer seguidas
+    (por defecto, las de un minuto); con burst=1 las peticiones quedan espaciadas de forma uniforme.
+    Es seguro usarlo desde varios hilos.
+    """
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0, burst=None):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self.burst = burst or requests_per_minute
+        self.lock = threading.Lock()
+        self.request_allowance = float(self.burst)
+        self.token_allowance = float(tokens_per_minute)
+        self.last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last
+        self.last = now
+        if self.rpm:
+            self.request_allowance = min(self.burst, self.request_allowance + elapsed * self.rpm / 60)
+        if self.tpm:
+            self.token_allowance = min(self.tpm, self.token_allowance + elapsed * self.tpm / 60)
+
+    def acquire(self, tokens=0, cancel_event=None):
+        """Espera hasta que haya cupo para una petición de tokens estimados. Devuelve False si se cancela."""
+        if self.tpm:
+            tokens = min(tokens, self.tpm)  # Una petición mayor que el límite nunca cabría
+        while True:
+            with self.lock:
+                self._refill()
+                wait_requests = 0 if not self.rpm or self.request_allowance >= 1 else \
+                    (1 - self.request_allowance) * 60 / self.rpm
+                wait_tokens = 0 if not self.tpm or self.token_allowance >= tokens else \
+                    (tokens - self.token_allowance) * 60 / self.tpm
+                wait_time = max(wait_requests, wait_tokens)
+                if wait_time <= 0:
+                    if self.rpm:
+                        self.request_allowance -= 1
+                    if self.tpm:
+                        self.token_allowance -= tokens
+                    return True
+            if cancel_event is not None:
+                if cancel_event.wait(min(wait_time, 0.5)):
+                    return False
+            else:
+                time.sleep(min(wait_time, 0.5))
+
+def llamar_con_reintentos(funcion, max_retries=5, base_delay=1.0, max_delay=60.0, cancel_event=None):
+    """
+    Llama a funcion() y, si el servicio responde 429 o 5xx, reintenta con espera exponencial y aleatoria
+    (respetando Retry-After si viene en la respuesta). Vale para la API de descripciones y para Nominatim.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return funcion()
+        except (APIError, GeocodingError) as e:
+            if attempt == max_retries or e.code is None or not (e.code == 429 or e.code >= 500):
+                raise
+            delay = e.retry_after if e.retry_after is not None else \
+                min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    raise
+            else:
+                time.sleep(delay)
+
+class BatchDescriber(threading.Thread):
+    """
+    Obtiene descripciones automáticas de varias imágenes en paralelo (como máximo concurrency a la vez),
+    respetando el limitador y reintentando los errores 429/5xx. Cada descripción se guarda en el EXIF
+    en cuanto llega. Se llama a on_result(ruta, descripción, error) por imagen y a on_done(resumen) al final,
+    siempre desde hilos de trabajo.
+    Con batch_size > 1 se envían hasta batch_size imágenes por petición (ver describe_group); el número
+    de imágenes de cada lote se ajusta según el tamaño de las imágenes y los fallos de los lotes anteriores.
+    Con on_partial (solo si batch_size es 1) las respuestas llegan en streaming y se llama a
+    on_partial(ruta, fragmento, texto) a medida que se genera cada descripción; el EXIF se escribe al final.
+    """
+    def __init__(self, api_key, file_paths, prompt, on_result, on_done, detail="high",
+                 concurrency=4, limiter=None, max_tokens=300, force_refresh=False, batch_size=1, on_partial=None):
+        super(BatchDescriber, self).__init__(daemon=True)
+        self.api_key = api_key
+        self.file_paths = list(file_paths)
+        self.prompt = prompt
+        self.on_result = on_result
+        self.on_done = on_done
+        self.detail = detail
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter or RateLimiter()
+        self.max_tokens = max_tokens
+        self.force_refresh = force_refresh
+        self.batch_size = max(1, batch_size)
+        self.on_partial = on_partial
+        self.batch_limit = self.batch_size  # Imágenes por petición en este momento
+        self.keys = {}  # Ruta -> clave de la caché, para no volver a leer la imagen al guardar la descripción
+        self.lock = threading.Lock()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def finish(self, file_path, description=None, error=None):
+        """
+        Guarda la descripción en el EXIF y avisa con on_result. Devuelve el resultado para el resumen.
+        Una descripción vacía cuenta como error: nunca se escribe en la imagen.
+        """
+        self.keys.pop(file_path, None)
+        if error is None and not (description or "").strip():
+            error = SIN_CONTENIDO
+        if error is None:
+            try:
+                update_image_description(file_path, description)
+            except Exception as e:
+                error = str(e)
+        self.on_result(file_path, None if error else description, error)
+        return {"path": file_path, "error": error}
+
+    def describe_one(self, file_path):
+        if self.cancel_event.is_set():
+            return
+        try:
+            # La imagen se lee una vez para la clave de la caché y otra para prepararla, no más
+            key = clave_descripcion(file_path, self.prompt, self.detail)
+            # Las descripciones que ya están en la caché no consumen cupo del limitador
+            description = None if self.force_refresh else description_cache.get(key)
+            if description is None:
+                with instrumentacion.medir("api.preparacion"):
+                    jpeg_buffer = preparar_imagen_para_api(file_path, self.detail)
+                tokens = estimar_tokens(file_path, self.prompt, self.detail, self.max_tokens,
+                                        tamano_jpeg(jpeg_buffer.getbuffer()))
+                if not self.limiter.acquire(tokens, self.cancel_event):
+                    return
+                if self.on_partial is not None:
+                    description = llamar_con_reintentos(
+                        lambda: describir_imagen_stream(
+                            self.api_key, file_path, self.prompt,
+                            lambda fragment, text: self.on_partial(file_path, fragment, text),
+                            self.detail, self.max_tokens, force_refresh=True, cancel_event=self.cancel_event,
+                            jpeg_buffer=jpeg_buffer, clave=key),
+                        cancel_event=self.cancel_event)
+                    if description is None:
+                        return  # Cancelada a mitad de la respuesta: no se escribe nada
+                else:
+                    description = llamar_con_reintentos(
+                        lambda: describir_imagen(self.api_key, file_path, self.prompt, self.detail,
+                                                 self.max_tokens, force_refresh=True, jpeg_buffer=jpeg_buffer,
+                                                 clave=key),
+                        cancel_event=self.cancel_event)
+        except Exception as e:
+            return self.finish(file_path, error=str(e))
+        return self.finish(file_path, description)
+
+    def describe_chunk(self, file_paths):
+        """Con batch_size > 1: describe un bloque de rutas con las menos peticiones posibles."""
+        results = []
+        prepared = []
+        for file_path in file_paths:
+            if self.cancel_event.is_set():
+                return results
+            try:
+                key = clave_descripcion(file_path, self.prompt, self.detail)
+                description = None if self.force_refresh else description_cache.get(key)
+                if description is None:
+                    self.keys[file_path] = key
+                    with instrumentacion.medir("api.preparacion"):
+                        prepared.append((file_path, preparar_imagen_para_api(file_path, self.detail)))
+                    continue
+            except Exception as e:
+                results.append(self.finish(file_path, error=str(e)))
+                continue
+            results.append(self.finish(file_path, description))
+        for group in agrupar_por_tamano(prepared, LOTE_MAX_BYTES, self.batch_limit):
+            results.extend(self.describe_group(group))
+        return results
+
+    def describe_group(self, group):
+        """
+        Pide en una sola petición las descripciones de un lote de (ruta, JPEG preparado). Si la API rechaza
+        el lote (400 o 413), la respuesta no sigue el esquema o faltan imágenes, las que faltan se vuelven
+        a pedir en lotes más pequeños; una imagen sola se pide como siempre, sin esquema.
+        """
+        if self.cancel_event.is_set():
+            return []
+        file_paths = [file_path for file_path, _ in group]
+        tokens = sum(estimar_tokens(file_path, self.prompt, self.detail, self.max_tokens,
+                                    tamano_jpeg(jpeg_buffer.getbuffer()))
+                     for file_path, jpeg_buffer in group)
+        if not self.limiter.acquire(tokens, self.cancel_event):
+            return []
+        if len(group) == 1:
+            file_path, jpeg_buffer = group[0]
+            try:
+                description = llamar_con_reintentos(
+                    lambda: describir_imagen(self.api_key, file_path, self.prompt, self.detail, self.max_tokens,
+                                             force_refresh=True, jpeg_buffer=jpeg_buffer,
+                                             clave=self.keys.get(file_path)),
+                    cancel_event=self.cancel_event)
+            except Exception as e:
+                return [self.finish(file_path, error=str(e))]
+            return [self.finish(file_path, description)]
+        try:
+            descriptions = llamar_con_reintentos(
+                lambda: describir_lote(self.api_key, file_paths, self.prompt, [b for _, b in group],
+                                       self.detail, self.max_tokens, self.keys),
+                cancel_event=self.cancel_event)
+        except ValueError:
+            descriptions = {}
+        except APIError as e:
+            if e.code not in (400, 413):
+                return [self.finish(file_path, error=str(e)) for file_path in file_paths]
+            descriptions = {}
+        except Exception as e:
+            return [self.finish(file_path, error=str(e)) for file_path in file_paths]
+        results = [self.finish(file_path, descriptions[file_path])
+                   for file_path in file_paths if file_path in descriptions]
+        missing = [item for item in group if item[0] not in descriptions]
+        self.adapt(len(group), not missing)
+        if missing and not self.cancel_event.is_set():
+            # Si no llegó ninguna se parte el lote por la mitad; si no, se repiten solo las que faltan
+            mitad = len(missing) // 2 if len(missing) == len(group) else len(missing)
+            for part in (missing[:mitad], missing[mitad:]):
+                if part:
+                    results.extend(self.describe_group(part))
+        return results
+
+    def adapt(self, size, ok):
+        # Como en el control de congestión: cada fallo reduce el lote a la mitad y cada acierto lo aumenta en uno
+        with self.lock:
+            if not ok:
+                self.batch_limit = max(1, min(self.batch_limit, size) // 2)
+            elif size >= self.batch_limit:
+                self.batch_limit = min(self.batch_size, self.batch_limit + 1)
+
+    def run(self):
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                if self.batch_size > 1:
+                    chunks = [self.file_paths[i:i + self.batch_size]
+                              for i in range(0, len(self.file_paths), self.batch_size)]
+                    for chunk_results in executor.map(self.describe_chunk, chunks):
+                        results.extend(chunk_results)
+                else:
+                    for result in executor.map(self.describe_one, self.file_paths):
+                        if result is not None:
+                            results.append(result)
+        finally:
+            errors = [(r["path"], r["error"]) for r in results if r["error"]]
+            self.on_done({
+                "total": len(self.file_paths),
+                "ok": len(results) - len(errors),
+                "errors": errors,
+                "cancelled": self.cancel_event.is_set(),
+            })
+
+def update_image_description(file_path, description):
+    """Actualiza la descripción en el EXIF de la imagen."""
+    try:
+        exif_dict = load_exif_dict(file_path)
+        exif_dict["0th"][piexif.ImageIFD.ImageDescription] = description.encode("utf-8")
+        write_exif(file_path, exif_dict)
+        metadata_cache.invalidate(file_path)
+    except Exception as e:
+        raise Exception("Error al actualizar la descripción: " + str(e))
+
+def metadata_from_exif_dict(exif_dict):
+    """
+    Convierte un diccionario EXIF (con el formato de piexif) en la tupla de metadatos:
+    (descripción, (lat, lon) o None, fecha, hora).
+    Se extrae la fecha desde DateTimeOriginal (formato "YYYY:MM:DD HH:MM:SS") y se convierte a "DD/MM/AAAA".
+    """
+    desc = exif_dict["0th"].get(piexif.ImageIFD.ImageDescription, b"").decode("utf-8", errors="ignore")
+    if not desc:
+        desc = ""
+    gps = None
+    if piexif.GPSIFD.GPSLatitude in exif_dict.get("GPS", {}):
+        lat_tuple = exif_dict["GPS"].get(piexif.GPSIFD.GPSLatitude)
+        lat_ref = exif_dict["GPS"].get(piexif.GPSIFD.GPSLatitudeRef, b'N').decode("utf-8")
+        lon_tuple = exif_dict["GPS"].get(piexif.GPSIFD.GPSLongitude)
+        lon_ref = exif_dict["GPS"].get(piexif.GPSIFD.GPSLongitudeRef, b'E').decode("utf-8")
+        if lat_tuple and lon_tuple:
+            lat = dms_to_decimal(lat_tuple, lat_ref)
+            lon = dms_to_decimal(lon_tuple, lon_ref)
+            gps = (lat, lon)
+    fecha = ""
+    hora = ""
+    if "Exif" in exif_dict and piexif.ExifIFD.DateTimeOriginal in exif_dict["Exif"]:
+        dt_str = exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal].decode("utf-8")
+        parts = dt_str.split(" ")
+        if len(parts) == 2:
+            y, m, d = parts[0].split(":")
+            fecha = f"{d}/{m}/{y}"
+            hora = parts[1]
+    return desc, gps, fecha, hora
+
+# ---------------- Geocodificación inversa y caché de direcciones ----------------
+# Se puede apuntar a un servidor local de pruebas con la variable de entorno FOTODESC_NOMINATIM_URL
+NOMINATIM_URL = os.environ.get("FOTODESC_NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+NOMINATIM_HEADERS = {"User-Agent": "wxPythonApp Fotodesc (contacto@tudominio.com)"}
+EARTH_RADIUS_M = 6371008.8
+
+class GeocodingError(Exception):
+    """Error al pedir una dirección al servicio de geocodificación; guarda el código HTTP si lo hay."""
+    def __init__(self, message, code=None, retry_after=None):
+        super(GeocodingError, self).__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+def obtener_direccion(lat, lon, session=None):
+    """
+    Pide a Nominatim la dirección de unas coordenadas. Devuelve "" si no hay dirección y
+    lanza GeocodingError si el servicio responde con error. Se puede reutilizar una requests.Session.
+    """
+    params = {"format": "json", "lat": lat, "lon": lon, "zoom": 18, "addressdetails": 1}
+    import requests
+    http = session or requests
+    with instrumentacion.medir("geocodificacion.nominatim") as medida:
+        response = http.get(NOMINATIM_URL, params=params, headers=NOMINATIM_HEADERS, timeout=10)
+        medida.bytes(len(response.request.url), len(response.content))
+    if response.status_code != 200:
+        try:
+            retry_after = float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            retry_after = None
+        raise GeocodingError("Error al obtener la dirección. Código: " + str(response.status_code),
+                             response.status_code, retry_after)
+    return response.json().get("display_name", "")
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distancia en metros entre dos puntos sobre la esfera terrestre."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+class GeocodeCache:
+    """
+    Caché persistente (SQLite) de geocodificación inversa con índice de rejilla: cada dirección se guarda
+    en la celda que resulta de cuantizar sus coordenadas a precision decimales. Una consulta revisa las
+    celdas vecinas que alcanza el radio y devuelve la dirección más cercana dentro de radius_m metros.
+    La longitud da la vuelta en el antimeridiano, y cerca de los polos, donde el radio abarca demasiadas
+    celdas, se revisa la franja de latitud entera. También guarda la dirección asignada a cada imagen, para
+    que sobreviva a reinicios y renombrados.
+    """
+    MAX_CELLS = 1024  # Celdas que se revisan una a una como mucho; si el radio abarca más, se lee la franja
+
+    def __init__(self, db_path=None, precision=3, radius_m=50):
+        self.db_path = db_path
+        self.precision = precision
+        self.radius_m = radius_m
+        self.cells = {}        # (celda_lat, celda_lon) -> [(lat, lon, dirección), ...]
+        self.empty = set()     # Celdas consultadas que no tienen ninguna dirección
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def _connect(self):
+        if self.conn is None:
+            try:
+                if self.db_path is None:
+                    self.db_path = os.path.join(get_config_dir(), "direcciones.db")
+                self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS places ("
+                    "cell_lat INTEGER, cell_lon INTEGER, lat REAL, lon REAL, address TEXT)")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS places_cell ON places (cell_lat, cell_lon)")
+                self.conn.execute("CREATE TABLE IF NOT EXISTS image_addresses (path TEXT PRIMARY KEY, address TEXT)")
+                self.conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)")
+                self._reindex_if_needed(self.conn)
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn = False
+        return self.conn or None
+
+    def _reindex_if_needed(self, conn):
+        # Si ha cambiado la precisión, se recalculan las celdas de los puntos guardados
+        row = conn.execute("SELECT value FROM settings WHERE name = 'precision'").fetchone()
+        if row is not None and int(row[0]) != self.precision:
+            rows = conn.execute("SELECT rowid, lat, lon FROM places").fetchall()
+            conn.executemany("UPDATE places SET cell_lat = ?, cell_lon = ? WHERE rowid = ?",
+                             [self.cell(lat, lon) + (rowid,) for rowid, lat, lon in rows])
+        conn.execute("INSERT OR REPLACE INTO settings VALUES ('precision', ?)", (str(self.precision),))
+
+    def set_precision(self, precision, radius_m):
+        with self.lock:
+            self.radius_m = radius_m
+            if precision != self.precision:
+                self.precision = precision
+                self.cells = {}
+                self.empty = set()
+                conn = self._connect()
+                if conn is not None:
+                    self._reindex_if_needed(conn)
+                    conn.commit()
+
+    def cell(self, lat, lon):
+        factor = 10 ** self.precision
+        return math.floor(lat * factor), self.wrap(math.floor(lon * factor))
+
+    def wrap(self, cell_lon):
+        # Las celdas de longitud van de -180 a 180 grados: la siguiente a la última es la primera
+        half = 180 * 10 ** self.precision
+        return (cell_lon + half) % (2 * half) - half
+
+    def _points(self, cell):
+        points = self.cells.get(cell)
+        if points is None:
+            if cell in self.empty:
+                return ()
+            conn = self._connect()
+            points = [] if conn is None else conn.execute(
+                "SELECT lat, lon, address FROM places WHERE cell_lat = ? AND cell_lon = ?", cell).fetchall()
+            if not points:
+                # Las celdas vacías solo se apuntan, para no llenar self.cells con las que se consultan de paso
+                self.empty.add(cell)
+                return ()
+            self.cells[cell] = points
+        return points
+
+    def _band(self, first_lat, last_lat):
+        # Todas las direcciones de una franja de latitud, de una sola consulta y sin pasar por self.cells
+        conn = self._connect()
+        if conn is None:
+            return [point for (i, j), points in self.cells.items() if first_lat <= i <= last_lat for point in points]
+        return conn.execute("SELECT lat, lon, address FROM places WHERE cell_lat BETWEEN ? AND ?",
+                            (first_lat, last_lat)).fetchall()
+
+    def lookup(self, lat, lon):
+        """Devuelve la dirección guardada más cercana dentro del radio, o None."""
+        cell_size_m = 111320.0 / 10 ** self.precision
+        span_lat = math.ceil(self.radius_m / cell_size_m)
+        span_lon = math.ceil(self.radius_m / max(cell_size_m * math.cos(math.radians(lat)), 1e-6))
+        cell_lat, cell_lon = self.cell(lat, lon)
+        best, best_distance = None, self.radius_m
+        with self.lock:
+            if (2 * span_lon + 1) * (2 * span_lat + 1) > self.MAX_CELLS:
+                # Cerca de los polos el radio abarca demasiadas celdas de longitud: se lee la franja entera
+                candidates = self._band(cell_lat - span_lat, cell_lat + span_lat)
+            else:
+                candidates = [point for i in range(cell_lat - span_lat, cell_lat + span_lat + 1)
+                              for j in range(cell_lon - span_lon, cell_lon + span_lon + 1)
+                              for point in self._points((i, self.wrap(j)))]
+            for p_lat, p_lon, address in candidates:
+                distance = haversine_m(lat, lon, p_lat, p_lon)
+                if distance <= best_distance:
+                    best, best_distance = address, distance
+        return best
+
+    def store(self, lat, lon, address):
+        cell = self.cell(lat, lon)
+        with self.lock:
+            self.empty.discard(cell)
+            points = self._points(cell)
+            if points:
+                points.append((lat, lon, address))
+            else:
+                self.cells[cell] = [(lat, lon, address)]
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT INTO places VALUES (?, ?, ?, ?, ?)", cell + (lat, lon, address))
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def load_image_addresses(self):
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return {}
+            return dict(conn.execute("SELECT path, address FROM image_addresses").fetchall())
+
+    def set_image_address(self, file_path, address):
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                if address:
+                    conn.execute("INSERT OR REPLACE INTO image_addresses VALUES (?, ?)", (file_path, address))
+                else:
+                    conn.execute("DELETE FROM image_addresses WHERE path = ?", (file_path,))
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def rename_image(self, old_path, new_path):
+        with self.lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute("UPDATE OR REPLACE image_addresses SET path = ? WHERE path = ?", (new_path, old_path))
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+geocode_cache = GeocodeCache()
+
+def direccion_en_cache(lat, lon):
+    """Dirección servida desde la caché local si hay un punto guardado dentro del radio, o None."""
+    return geocode_cache.lookup(lat, lon)
+
+class ImageAddresses:
+    """
+    Direcciones asignadas a cada imagen, con interfaz de diccionario y guardadas en disco.
+    Si una imagen no tiene dirección propia (por ejemplo, porque se renombró fuera de la aplicación),
+    get_for() la busca en la caché de geocodificación a partir de sus coordenadas.
+    """
+    def __init__(self, cache=None):
+        self.cache = cache or geocode_cache
+        self.addresses = None
+
+    def _load(self):
+        if self.addresses is None:
+            self.addresses = self.cache.load_image_addresses()
+        return self.addresses
+
+    def get(self, file_path, default=None):
+        return self._load().get(file_path, default)
+
+    def __contains__(self, file_path):
+        return file_path in self._load()
+
+    def __setitem__(self, file_path, address):
+        if address:
+            self._load()[file_path] = address
+        else:
+            self._load().pop(file_path, None)
+        self.cache.set_image_address(file_path, address)
+
+    def get_for(self, file_path, gps):
+        address = self.get(file_path)
+        if address:
+            return address
+        if gps and gps[0] is not None and gps[1] is not None:
+            return self.cache.lookup(gps[0], gps[1]) or ""
+        return ""
+
+    def rename(self, old_path, new_path):
+        addresses = self._load()
+        if old_path in addresses:
+            addresses[new_path] = addresses.pop(old_path)
+            self.cache.rename_image(old_path, new_path)
+
+def agrupar_coordenadas(coords, cell_m=100.0):
+    """
+    Agrupa puntos (lat, lon) en celdas de una rejilla de unos cell_m metros de lado.
+    Devuelve una lista de (índice del representante, [índices del grupo]); el representante es
+    el punto más cercano al centro del grupo. Si NumPy está disponible, el cálculo es vectorizado.
+    """
+    if not coords:
+        return []
+    dlat = cell_m / 111320.0
+    np = numpy_module()
+    if np is not None:
+        arr = np.asarray(coords, dtype=np.float64)
+        rows = np.floor(arr[:, 0] / dlat)
+        # El ancho de la celda en longitud depende de la latitud de su franja
+        dlon = dlat / np.maximum(np.cos(np.radians((rows + 0.5) * dlat)), 1e-6)
+        cols = np.floor(arr[:, 1] / dlon)
+        _, inverse = np.unique(np.stack([rows, cols], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse)
+        c_lat = np.bincount(inverse, weights=arr[:, 0]) / counts
+        c_lon = np.bincount(inverse, weights=arr[:, 1]) / counts
+        d2 = (arr[:, 0] - c_lat[inverse]) ** 2 + \
+            ((arr[:, 1] - c_lon[inverse]) * np.cos(np.radians(arr[:, 0]))) ** 2
+        order = np.lexsort((d2, inverse))
+        return [(int(group[0]), group.tolist()) for group in np.split(order, np.cumsum(counts)[:-1])]
+    groups = {}
+    for i, (lat, lon) in enumerate(coords):
+        row = math.floor(lat / dlat)
+        dlon = dlat / max(math.cos(math.radians((row + 0.5) * dlat)), 1e-6)
+        groups.setdefault((row, math.floor(lon / dlon)), []).append(i)
+    result = []
+    for members in groups.values():
+        c_lat = sum(coords[i][0] for i in members) / len(members)
+        c_lon = sum(coords[i][1] for i in members) / len(members)
+        cos_lat = math.cos(math.radians(c_lat))
+        members.sort(key=lambda i: (coords[i][0] - c_lat) ** 2 + ((coords[i][1] - c_lon) * cos_lat) ** 2)
+        result.append((members[0], members))
+    return result
+
+class BatchGeocoder(threading.Thread):
+    """
+    Obtiene las direcciones de muchas imágenes: agrupa sus coordenadas, consulta solo un representante
+    por grupo (primero en la caché local y, si no está, en Nominatim con una requests.Session compartida
+    y como mucho una petición por segundo) y asigna el resultado a todas las imágenes del grupo.
+    on_result(rutas, dirección) se llama por grupo y on_done(resumen) al final, desde el hilo de trabajo.
+    """
+    def __init__(self, file_paths, on_result, on_done, on_progress=None, cell_m=100.0,
+                 requests_per_second=1.0):
+        super(BatchGeocoder, self).__init__(daemon=True)
+        self.file_paths = list(file_paths)
+        self.on_result = on_result
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.cell_m = cell_m
+        self.limiter = RateLimiter(requests_per_minute=requests_per_second * 60, burst=1)
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        summary = {"images": 0, "groups": 0, "requests": 0, "found": 0, "errors": [], "cancelled": False}
+        try:
+            paths, coords = [], []
+            for file_path in self.file_paths:
+                if self.cancel_event.is_set():
+                    break
+                gps = get_metadata(file_path)[1]
+                if gps and gps[0] is not None and gps[1] is not None:
+                    paths.append(file_path)
+                    coords.append(gps)
+            groups = agrupar_coordenadas(coords, self.cell_m)
+            summary["images"] = len(paths)
+            summary["groups"] = len(groups)
+            # requests solo hace falta si se va a consultar Nominatim: con el índice local basta sin él
+            session = None
+            if reverse_geocoder.needs_network():
+                import requests
+                session = requests.Session()
+            try:
+                for done, (representative, members) in enumerate(groups, 1):
+                    if self.cancel_event.is_set():
+                        break
+                    lat, lon = coords[representative]
+                    try:
+                        address = geocode_cache.lookup(lat, lon)
+                        if address is None:
+                            result = llamar_con_reintentos(lambda: self.query(lat, lon, session, summary),
+                                                           cancel_event=self.cancel_event)
+                            if result is None:
+                                break
+                            address, cacheable = result
+                            if address and cacheable:
+                                geocode_cache.store(lat, lon, address)
+                        if address:
+                            summary["found"] += len(members)
+                            self.on_result([paths[i] for i in members], address)
+                    except Exception as e:
+                        # Ninguna imagen del grupo tiene dirección: el error se anota en cada una
+                        summary["errors"].extend((paths[i], str(e)) for i in members)
+                    if self.on_progress is not None:
+                        self.on_progress(done, len(groups))
+            finally:
+                if session is not None:
+                    session.close()
+        finally:
+            summary["cancelled"] = self.cancel_event.is_set()
+            self.on_done(summary)
+
+    def query(self, lat, lon, session, summary):
+        """
+        Un intento de reverse_geocoder.reverse. Cada intento, también los reintentos tras un 429 o un 5xx,
+        espera su turno en el limitador para no pasar de una petición por segundo. None si se cancela.
+        """
+        if reverse_geocoder.needs_network():
+            if not self.limiter.acquire(cancel_event=self.cancel_event):
+                return None
+            summary["requests"] += 1
+        return reverse_geocoder.reverse(lat, lon, session)
+
+# ---------------- Geocodificación sin conexión (nomenclátor local) ----------------
+OFFLINE_INDEX_MAGIC = b"FDGEO1"
+# Cabecera: firma, orden de bytes (b"<" o b">"), relleno y número de lugares
+OFFLINE_INDEX_HEADER = struct.Struct("=6sc1xI")
+
+def latlon_a_xyz(lat, lon):
+    """Convierte coordenadas en grados a un vector unitario sobre la esfera."""
+    phi, lmb = math.radians(lat), math.radians(lon)
+    cos_phi = math.cos(phi)
+    return cos_phi * math.cos(lmb), cos_phi * math.sin(lmb), math.sin(phi)
+
+def leer_nomenclator(ruta_gazetteer):
+    """
+    Lee un volcado de GeoNames (cities500.txt, cities15000.txt, allCountries.txt...) y devuelve
+    una lista de (lat, lon, etiqueta). Si junto al archivo está admin1CodesASCII.txt, la etiqueta
+    incluye el nombre de la región: "Sevilla, Andalusia, ES".
+    """
+    regiones = {}
+    ruta_admin1 = os.path.join(os.path.dirname(ruta_gazetteer), "admin1CodesASCII.txt")
+    if os.path.exists(ruta_admin1):
+        with open(ruta_admin1, encoding="utf-8") as f:
+            for linea in f:
+                campos = linea.rstrip("\n").split("\t")
+                if len(campos) >= 2:
+                    regiones[campos[0]] = campos[1]
+    lugares = []
+    with open(ruta_gazetteer, encoding="utf-8") as f:
+        for linea in f:
+            campos = linea.rstrip("\n").split("\t")
+            if len(campos) < 11:
+                continue
+            try:
+                lat, lon = float(campos[4]), float(campos[5])
+            except ValueError:
+                continue
+            nombre, pais, admin1 = campos[1], campos[8], campos[10]
+            partes = [nombre]
+            region = regiones.get(f"{pais}.{admin1}")
+            if region and region != nombre:
+                partes.append(region)
+            if pais:
+                partes.append(pais)
+            lugares.append((lat, lon, ", ".join(partes)))
+    return lugares
+
+def construir_indice_offline(ruta_gazetteer, ruta_indice):
+    """
+    Construye un árbol k-d implícito (ordenado en un array, sin nodos) sobre los vectores unitarios
+    de los lugares del nomenclátor y lo guarda en un binario compacto que se abre con mmap:
+    cabecera, coordenadas float32 x/y/z, eje de corte de cada nodo, desplazamientos y etiquetas UTF-8.
+    Devuelve el número de lugares indexados.
+    """
+    lugares = leer_nomenclator(ruta_gazetteer)
+    puntos = [latlon_a_xyz(lat, lon) for lat, lon, _ in lugares]
+    orden = list(range(len(puntos)))
+    ejes = bytearray(len(puntos))
+    pendientes = [(0, len(orden))]
+    while pendientes:
+        lo, hi = pendientes.pop()
+        if hi - lo <= 0:
+            continue
+        # Se corta por el eje de mayor extensión y el nodo es la mediana del tramo
+        tramo = orden[lo:hi]
+        eje = max(range(3), key=lambda a: max(puntos[i][a] for i in tramo) - min(puntos[i][a] for i in tramo))
+        tramo.sort(key=lambda i: puntos[i][eje])
+        orden[lo:hi] = tramo
+        mid = (lo + hi) // 2
+        ejes[mid] = eje
+        pendientes.append((lo, mid))
+        pendientes.append((mid + 1, hi))
+    coords = array("f", (c for i in orden for c in puntos[i]))
+    etiquetas = [lugares[i][2].encode("utf-8") for i in orden]
+    desplazamientos = array("I", [0])
+    for etiqueta in etiquetas:
+        desplazamientos.append(desplazamientos[-1] + len(etiqueta))
+    orden_bytes = b"<" if sys.byteorder == "little" else b">"
+    relleno = b"\0" * (-len(ejes) % 4)
+    atomic_write(ruta_indice, [
+        OFFLINE_INDEX_HEADER.pack(OFFLINE_INDEX_MAGIC, orden_bytes, len(orden)),
+        coords.tobytes(), bytes(ejes), relleno, desplazamientos.tobytes(), b"".join(etiquetas)])
+    return len(orden)
+
+class OfflineGeocoder:
+    """
+    Geocodificador inverso sin conexión sobre un índice construido con construir_indice_offline.
+    El archivo se proyecta en memoria con mmap, así que abrirlo es inmediato y solo se leen
+    las páginas que visita cada búsqueda.
+    """
+    def __init__(self, ruta_indice):
+        with open(ruta_indice, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, orden_bytes, n = OFFLINE_INDEX_HEADER.unpack_from(self.mm, 0)
+        if magic != OFFLINE_INDEX_MAGIC:
+            raise ValueError("El archivo no es un índice de FotoDesc")
+        if orden_bytes != (b"<" if sys.byteorder == "little" else b">"):
+            raise ValueError("El índice se creó en un equipo con otro orden de bytes; vuelva a construirlo")
+        self.n = n
+        view = memoryview(self.mm)
+        pos = OFFLINE_INDEX_HEADER.size
+        self.coords = view[pos:pos + 12 * n].cast("f")
+        pos += 12 * n
+        self.ejes = view[pos:pos + n]
+        pos += n + (-n % 4)
+        self.desplazamientos = view[pos:pos + 4 * (n + 1)].cast("I")
+        pos += 4 * (n + 1)
+        self.etiquetas = view[pos:]
+
+    def nearest(self, lat, lon):
+        """Devuelve (etiqueta, distancia en metros) del lugar más cercano, o (None, None) si el índice está vacío."""
+        if self.n == 0:
+            return None, None
+        q = latlon_a_xyz(lat, lon)
+        coords, ejes = self.coords, self.ejes
+        best_d2, best = float("inf"), -1
+        pendientes = [(0, self.n, 0.0)]
+        while pendientes:
+            lo, hi, cota = pendientes.pop()
+            if lo >= hi or cota >= best_d2:
+                continue
+            mid = (lo + hi) // 2
+            base = 3 * mid
+            dx, dy, dz = q[0] - coords[base], q[1] - coords[base + 1], q[2] - coords[base + 2]
+            d2 = dx * dx + dy * dy + dz * dz
+            if d2 < best_d2:
+                best_d2, best = d2, mid
+            eje = ejes[mid]
+            diff = q[eje] - coords[base + eje]
+            if diff < 0:
+                cerca, lejos = (lo, mid), (mid + 1, hi)
+            else:
+                cerca, lejos = (mid + 1, hi), (lo, mid)
+            # La rama lejana solo se visita si el plano de corte está más cerca que el mejor punto
+            pendientes.append(lejos + (diff * diff,))
+            pendientes.append(cerca + (0.0,))
+        inicio, fin = self.desplazamientos[best], self.desplazamientos[best + 1]
+        etiqueta = bytes(self.etiquetas[inicio:fin]).decode("utf-8")
+        distancia = 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(best_d2) / 2))
+        return etiqueta, distancia
+
+    def address(self, lat, lon):
+        etiqueta, _ = self.nearest(lat, lon)
+        return etiqueta or ""
+
+class ReverseGeocoder:
+    """
+    Elige el proveedor de direcciones: "nominatim" (en línea), "offline" (solo el índice local)
+    o "fallback" (Nominatim y, si no hay conexión, el índice local).
+    reverse() devuelve (dirección, guardar_en_caché): las respuestas locales no se guardan en la caché
+    de geocodificación para no tapar después las direcciones más precisas de Nominatim.
+    Con "offline" nunca se consulta Nominatim: si no hay índice cargado, reverse() lanza GeocodingError.
+    """
+    def __init__(self, provider="nominatim", offline=None):
+        self.provider = provider
+        self.offline = offline
+
+    def configure(self, provider, ruta_indice=None):
+        self.provider = provider
+        self.offline = None
+        if ruta_indice and os.path.exists(ruta_indice):
+            self.offline = OfflineGeocoder(ruta_indice)
+
+    def needs_network(self):
+        return self.provider != "offline"
+
+    def reverse(self, lat, lon, session=None):
+        if self.provider == "offline":
+            if self.offline is None:
+                raise GeocodingError("No hay cargado ningún índice de direcciones sin conexión. "
+                                     "Cárguelo en Configuración > Direcciones sin conexión.")
+            return self.offline.address(lat, lon), False
+        import requests
+        try:
+            return obtener_direccion(lat, lon, session), True
+        except (requests.ConnectionError, requests.Timeout):
+            if self.provider == "fallback" and self.offline is not None:
+                return self.offline.address(lat, lon), False
+            raise
+
+reverse_geocoder = ReverseGeocoder()
+
+# ---------------- Lector rápido de EXIF (solo cabeceras) ----------------
+# Tamaño en bytes de cada tipo TIFF: BYTE, ASCII, SHORT, LONG, RATIONAL, SBYTE, UNDEFINED, SSHORT, SLONG, SRATIONAL
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8}
+JPEG_SOI = b"\xff\xd8"
+
+def read_jpeg_exif_bytes(file_path):
+    """
+    Recorre los marcadores JPEG hasta el primer SOS y devuelve el contenido del segmento APP1/EXIF
+    (empezando por b"Exif\\0\\0"), o None si no lo hay. Nunca se leen los datos de la imagen.
+    Lanza ValueError si el archivo no es JPEG.
+    """
+    with open(file_path, "rb") as f:
+        if f.read(2) != JPEG_SOI:
+            raise ValueError("No es un archivo JPEG")
+        while True:
+            byte = f.read(1)
+            if not byte:
+                return None
+            if byte != b"\xff":
+                continue
+            marker = f.read(1)
+            while marker == b"\xff":  # Bytes de relleno
+                marker = f.read(1)
+            if not marker:
+                return None
+            code = marker[0]
+            if code == 0xDA or code == 0xD9:  # SOS o EOI: empiezan los datos de imagen
+                return None
+            if code == 0x01 or 0xD0 <= code <= 0xD7:  # Marcadores sin longitud
+                continue
+            length_bytes = f.read(2)
+            if len(length_bytes) < 2:
+                return None
+            length = int.from_bytes(length_bytes, "big")
+            if code == 0xE1:
+                data = f.read(length - 2)
+                if data.startswith(b"Exif\x00\x00"):
+                    return data
+            else:
+                f.seek(length - 2, 1)
+
+def read_tiff_ifd(tiff, offset, endian, wanted):
+    """
+    Lee de un IFD del bloque TIFF solo las etiquetas indicadas en wanted.
+    Devuelve un diccionario etiqueta -> valor con los mismos tipos que usa piexif
+    (bytes para ASCII, tuplas (num, den) para RATIONAL, enteros para SHORT/LONG).
+    """
+    values = {}
+    if offset + 2 > len(tiff):
+        return values
+    count = int.from_bytes(tiff[offset:offset + 2], endian)
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(tiff):
+            break
+        tag = int.from_bytes(tiff[entry:entry + 2], endian)
+        if tag not in wanted:
+            continue
+        type_id = int.from_bytes(tiff[entry + 2:entry + 4], endian)
+        n = int.from_bytes(tiff[entry + 4:entry + 8], endian)
+        size = TIFF_TYPE_SIZES.get(type_id)
+        if size is None:
+            continue
+        if size * n <= 4:
+            start = entry + 8
+        else:
+            start = int.from_bytes(tiff[entry + 8:entry + 12], endian)
+        raw = tiff[start:start + size * n]
+        if type_id in (2, 7, 1):
+            values[tag] = raw.rstrip(b"\x00") if type_id == 2 else raw
+        elif type_id in (3, 4):
+            items = [int.from_bytes(raw[j:j + size], endian) for j in range(0, len(raw), size)]
+            values[tag] = items[0] if len(items) == 1 else tuple(items)
+        elif type_id in (5, 10):
+            signed = type_id == 10
+            values[tag] = tuple(
+                (int.from_bytes(raw[j:j + 4], endian, signed=signed),
+                 int.from_bytes(raw[j + 4:j + 8], endian, signed=signed))
+                for j in range(0, len(raw), 8))
+    return values
+
+def parse_exif_bytes(exif_bytes):
+    """
+    Analiza un segmento EXIF (b"Exif\\0\\0" + TIFF) y devuelve un diccionario al estilo de piexif
+    con únicamente las etiquetas que usa FotoDesc: descripción, GPS y DateTimeOriginal.
+    """
+    exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "Interop": {}, "1st": {}, "thumbnail": None}
+    tiff = exif_bytes[6:] if exif_bytes.startswith(b"Exif") else exif_bytes
+    if tiff[:2] == b"II":
+        endian = "little"
+    elif tiff[:2] == b"MM":
+        endian = "big"
+    else:
+        return exif_dict
+    ifd0_offset = int.from_bytes(tiff[4:8], endian)
+    exif_dict["0th"] = read_tiff_ifd(tiff, ifd0_offset, endian, (
+        piexif.ImageIFD.ImageDescription, piexif.ImageIFD.ExifTag, piexif.ImageIFD.GPSTag))
+    exif_offset = exif_dict["0th"].get(piexif.ImageIFD.ExifTag)
+    if isinstance(exif_offset, int):
+        exif_dict["Exif"] = read_tiff_ifd(tiff, exif_offset, endian, (piexif.ExifIFD.DateTimeOriginal,))
+    gps_offset = exif_dict["0th"].get(piexif.ImageIFD.GPSTag)
+    if isinstance(gps_offset, int):
+        exif_dict["GPS"] = read_tiff_ifd(tiff, gps_offset, endian, (
+            piexif.GPSIFD.GPSLatitudeRef, piexif.GPSIFD.GPSLatitude,
+            piexif.GPSIFD.GPSLongitudeRef, piexif.GPSIFD.GPSLongitude))
+    return exif_dict
+
+def read_metadata_pil(file_path):
+    """Lee los metadatos abriendo la imagen con PIL (válido para cualquier formato soportado)."""
+    try:
+        img = pil_image().open(file_path)
+        if "exif" in img.info:
+            exif_dict = piexif.load(img.info["exif"])
+        else:
+            exif_dict = {"0th": {}, "Exif": {}, "GPS": {}, "Interop": {}, "1st": {}, "thumbnail": None}
+        return metadata_from_exif_dict(exif_dict)
+    except Exception:
+        return "", None, "", ""
+
+def read_metadata(file_path):
+    """
+    Lee los metadatos directamente del archivo, sin pasar por la caché.
+    En JPEG solo se leen las cabeceras hasta el segmento EXIF; el resto de formatos se abren con PIL.
+    Retorna una tupla: (descripción, (lat, lon) o None, fecha, hora).
+    """
+    try:
+        exif_bytes = read_jpeg_exif_bytes(file_path)
+    except ValueError:
+        return read_metadata_pil(file_path)
+    except Exception:
+        return "", None, "", ""
+    try:
+        if exif_bytes is None:
+            return "", None, "", ""
+        return metadata_from_exif_dict(parse_exif_bytes(exif_bytes))
+    except Exception:
+        return "", None, "", ""
+
+# ---------------- Escritura de EXIF sin recodificar la imagen ----------------
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Formatos que PIL puede volver a guardar conservando el EXIF (HEIC/HEIF mediante pillow-heif)
+PIL_EXIF_FORMATS = ("HEIF", "WEBP", "TIFF")
+
+def empty_exif_dict():
+    return {"0th": {}, "Exif": {}, "GPS": {}, "Interop": {}, "1st": {}, "thumbnail": None}
+
+def load_exif_dict(file_path):
+    """
+    Carga el EXIF completo de la imagen en un diccionario de piexif, listo para modificarlo.
+    En JPEG se lee solo el segmento APP1; en el resto de formatos se usa PIL.
+    """
+    try:
+        exif_bytes = read_jpeg_exif_bytes(file_path)
+    except ValueError:
+        img = pil_image().open(file_path)
+        exif_bytes = img.info.get("exif")
+    if not exif_bytes:
+        return empty_exif_dict()
+    return piexif.load(exif_bytes)
+
+def copiar_propietario(origen, destino):
+    """Da a destino el propietario y el grupo de origen en lo posible (sin permisos, solo el grupo o nada)."""
+    if not hasattr(os, "chown"):
+        return
+    st = os.stat(origen)
+    for uid in (st.st_uid, -1):
+        try:
+            os.chown(destino, uid, st.st_gid)
+            return
+        except OSError:
+            pass
+
+class HardLinkError(OSError):
+    """El archivo tiene varios enlaces duros y atomic_write no lo reescribe."""
+
+def atomic_write(file_path, chunks):
+    """
+    Escribe los fragmentos en un archivo temporal de la misma carpeta, lo sincroniza con el disco
+    y lo renombra sobre el original, con sus permisos y, si se puede, su propietario. Si algo falla,
+    el archivo original queda intacto.
+    Si el original tiene enlaces duros, renombrar lo separaría de los demás nombres y copiar encima
+    dejaría de ser atómico: se lanza HardLinkError sin tocar nada.
+    """
+    if os.path.exists(file_path):
+        enlaces = os.stat(file_path).st_nlink
+        if enlaces > 1:
+            raise HardLinkError("El archivo tiene {} enlaces duros y no se modifica, para no separarlo de los "
+                                "demás: {}".format(enlaces, file_path))
+    directorio = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directorio, prefix="." + os.path.basename(file_path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, tmp_path)
+            copiar_propietario(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def splice_jpeg_exif(data, exif_bytes):
+    """
+    Devuelve los fragmentos de un JPEG con el segmento APP1/EXIF sustituido por exif_bytes.
+    Solo se recorren las cabeceras; los datos comprimidos (desde SOS) se copian tal cual.
+    """
+    if len(exif_bytes) + 2 > 0xFFFF:
+        raise ValueError("El bloque EXIF es demasiado grande para un segmento APP1")
+    view = memoryview(data)
+    segments = []
+    pos = 2
+    while True:
+        if pos + 4 > len(data) or data[pos] != 0xFF:
+            raise ValueError("Estructura JPEG no válida")
+        code = data[pos + 1]
+        if code == 0xFF:  # Byte de relleno
+            pos += 1
+            continue
+        if code == 0xDA or code == 0xD9:  # SOS o EOI: a partir de aquí se copia sin tocar
+            break
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            segments.append(view[pos:pos + 2])
+            pos += 2
+            continue
+        length = int.from_bytes(data[pos + 2:pos + 4], "big")
+        segment = view[pos:pos + 2 + length]
+        if not (code == 0xE1 and data[pos + 4:pos + 10] == b"Exif\x00\x00"):
+            segments.append(segment)
+        pos += 2 + length
+    app1 = b"\xff\xe1" + (len(exif_bytes) + 2).to_bytes(2, "big") + exif_bytes
+    # El APP1 va justo tras SOI, o tras APP0 (JFIF) si lo hay
+    insert_at = 1 if segments and bytes(segments[0][:2]) == b"\xff\xe0" else 0
+    segments.insert(insert_at, app1)
+    return [view[:2]] + segments + [view[pos:]]
+
+def splice_png_exif(data, exif_bytes):
+    """Devuelve los fragmentos de un PNG con el bloque eXIf sustituido (antes del primer IDAT)."""
+    tiff = exif_bytes[6:] if exif_bytes.startswith(b"Exif") else exif_bytes
+    chunk_type = b"eXIf"
+    exif_chunk = (len(tiff).to_bytes(4, "big") + chunk_type + tiff +
+                  zlib.crc32(chunk_type + tiff).to_bytes(4, "big"))
+    view = memoryview(data)
+    chunks = [view[:8]]
+    pos = 8
+    inserted = False
+    while pos + 8 <= len(data):
+        length = int.from_bytes(data[pos:pos + 4], "big")
+        ctype = data[pos + 4:pos + 8]
+        end = pos + 12 + length
+        if ctype == b"IDAT" and not inserted:
+            chunks.append(exif_chunk)
+            inserted = True
+        if ctype != b"eXIf":
+            chunks.append(view[pos:end])
+        pos = end
+    if not inserted:
+        raise ValueError("Estructura PNG no válida")
+    return chunks
+
+def write_exif(file_path, exif_dict):
+    """
+    Guarda el diccionario EXIF en la imagen según su formato, de forma atómica:
+    JPEG y PNG sin recodificar los píxeles; HEIC/WebP/TIFF volviendo a guardar con PIL
+    en su formato original. El resto de formatos (BMP, GIF...) no admite EXIF.
+    """
+    try:
+        exif_bytes = piexif.dump(exif_dict)
+        if len(exif_bytes) + 2 > 0xFFFF and exif_dict.get("thumbnail"):
+            # Si no cabe en un APP1 se descarta la miniatura incrustada
+            exif_dict = dict(exif_dict, thumbnail=None, **{"1st": {}})
+            exif_bytes = piexif.dump(exif_dict)
+    except Exception as e:
+        raise Exception("EXIF no válido: " + str(e))
+    with instrumentacion.medir("exif.escritura"):
+        with open(file_path, "rb") as f:
+            data = f.read()
+        if data.startswith(JPEG_SOI):
+            atomic_write(file_path, splice_jpeg_exif(data, exif_bytes))
+        elif data.startswith(PNG_SIGNATURE):
+            atomic_write(file_path, splice_png_exif(data, exif_bytes))
+        else:
+            img = pil_image().open(file_path)
+            img_format = img.format
+            if img_format not in PIL_EXIF_FORMATS:
+                raise Exception(f"El formato {img_format} no admite metadatos EXIF")
+            img.load()
+            buffer = io.BytesIO()
+            img.save(buffer, img_format, exif=exif_bytes)
+            atomic_write(file_path, [buffer.getbuffer()])
+
+def get_config_dir():
+    """Devuelve (y crea si no existe) la carpeta de configuración del usuario para FotoDesc."""
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    config_dir = os.path.join(base, "FotoDesc")
+    os.makedirs(config_dir, exist_ok=True)
+    return config_dir
+
+# ---------------- Caché de metadatos ----------------
+class MetadataCache:
+    """
+    Caché de metadatos con dos niveles: un diccionario en memoria y una base SQLite en disco.
+    Cada entrada se identifica por (ruta, tamaño, mtime_ns), de modo que un archivo que no ha
+    cambiado nunca se vuelve a leer, ni siquiera entre reinicios de la aplicación.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path
+        self.memory = {}       # ruta -> (tamaño, mtime_ns, metadatos)
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def _connect(self):
+        # La base se abre la primera vez que se necesita; si falla se trabaja solo en memoria.
+        if self.conn is None:
+            try:
+                if self.db_path is None:
+                    self.db_path = os.path.join(get_config_dir(), "metadatos.db")
+                self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS metadata ("
+                    "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                    "description TEXT, lat REAL, lon REAL, fecha TEXT, hora TEXT)")
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn = False
+        return self.conn or None
+
+    def get(self, file_path, size, mtime_ns):
+        with self.lock:
+            entry = self.memory.get(file_path)
+            if entry and entry[0] == size and entry[1] == mtime_ns:
+                return entry[2]
+            conn = self._connect()
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT description, lat, lon, fecha, hora FROM metadata "
+                "WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (file_path, size, mtime_ns)).fetchone()
+            if row is None:
+                return None
+            desc, lat, lon, fecha, hora = row
+            gps = (lat, lon) if lat is not None and lon is not None else None
+            metadata = (desc, gps, fecha, hora)
+            self.memory[file_path] = (size, mtime_ns, metadata)
+            return metadata
+
+    def put(self, file_path, size, mtime_ns, metadata):
+        self.put_many([(file_path, size, mtime_ns, metadata)])
+
+    def put_many(self, entries):
+        """Guarda varias entradas (ruta, tamaño, mtime_ns, metadatos) en una sola transacción."""
+        rows = []
+        with self.lock:
+            for file_path, size, mtime_ns, metadata in entries:
+                self.memory[file_path] = (size, mtime_ns, metadata)
+                desc, gps, fecha, hora = metadata
+                lat, lon = gps if gps else (None, None)
+                rows.append((file_path, size, mtime_ns, desc, lat, lon, fecha, hora))
+            conn = self._connect()
+            if conn is None or not rows:
+                return
+            try:
+                conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def invalidate(self, file_path):
+        with self.lock:
+            self.memory.pop(file_path, None)
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute("DELETE FROM metadata WHERE path = ?", (file_path,))
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+metadata_cache = MetadataCache()
+
+def get_metadata(file_path):
+    """
+    Devuelve los metadatos de la imagen usando la caché (memoria y disco).
+    Solo se lee el archivo si no hay entrada para su ruta, tamaño y fecha de modificación.
+    Retorna una tupla: (descripción, (lat, lon) o None, fecha, hora).
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return "", None, "", ""
+    metadata = metadata_cache.get(file_path, st.st_size, st.st_mtime_ns)
+    if metadata is None:
+        with instrumentacion.medir("metadatos.lectura"):
+            metadata = read_metadata(file_path)
+        metadata_cache.put(file_path, st.st_size, st.st_mtime_ns, metadata)
+    else:
+        instrumentacion.contar("metadatos.cache")
+    return metadata
+
+# ---------------- Lectura de metadatos en paralelo ----------------
+def default_metadata_workers(use_processes=False):
+    """Número de trabajadores por defecto: uno por núcleo con procesos; más hilos, ya que la lectura es de E/S."""
+    cpus = os.cpu_count() or 1
+    return cpus if use_processes else min(32, cpus + 4)
+
+def read_metadata_entries(file_paths, use_cache=False):
+    """
+    Lee los metadatos de un bloque de rutas y devuelve una lista de (ruta, tamaño, mtime_ns, metadatos, en_caché).
+    Se ejecuta dentro de los trabajadores del pool; con procesos no se consulta la caché (use_cache=False).
+    """
+    entries = []
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        metadata = metadata_cache.get(file_path, st.st_size, st.st_mtime_ns) if use_cache else None
+        if metadata is not None:
+            instrumentacion.contar("metadatos.cache")
+            entries.append((file_path, st.st_size, st.st_mtime_ns, metadata, True))
+        else:
+            with instrumentacion.medir("metadatos.lectura"):
+                metadata = read_metadata(file_path)
+            entries.append((file_path, st.st_size, st.st_mtime_ns, metadata, False))
+    return entries
+
+def extract_metadata_parallel(file_paths, workers=0, chunk_size=64, use_processes=False, cancel_event=None):
+    """
+    Generador que reparte la lectura de metadatos entre varios hilos (o procesos, con use_processes=True)
+    y devuelve los resultados por bloques: listas de (ruta, metadatos), en el orden en que terminan.
+    Los resultados nuevos se guardan en la caché de metadatos. workers=0 usa el valor por defecto.
+    """
+    file_paths = list(file_paths)
+    workers = workers or default_metadata_workers(use_processes)
+    if use_processes:
+        # Los procesos no comparten la caché: se filtran antes las rutas que ya están en ella
+        cached, pending = [], []
+        for file_path in file_paths:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            metadata = metadata_cache.get(file_path, st.st_size, st.st_mtime_ns)
+            if metadata is not None:
+                cached.append((file_path, metadata))
+            else:
+                pending.append(file_path)
+        for i in range(0, len(cached), chunk_size):
+            yield cached[i:i + chunk_size]
+        file_paths = pending
+        from concurrent.futures import ProcessPoolExecutor as executor_class
+    else:
+        executor_class = ThreadPoolExecutor
+    chunks = (file_paths[i:i + chunk_size] for i in range(0, len(file_paths), chunk_size))
+    with executor_class(max_workers=workers) as executor:
+        in_flight = set()
+        def submit_next():
+            chunk = next(chunks, None)
+            if chunk is not None:
+                in_flight.add(executor.submit(read_metadata_entries, chunk, not use_processes))
+        # Se mantienen pocos bloques en vuelo para no cargar en memoria toda la lista de resultados
+        for _ in range(workers * 2):
+            submit_next()
+        while in_flight:
+            if cancel_event is not None and cancel_event.is_set():
+                for future in in_flight:
+                    future.cancel()
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                entries = future.result()
+                metadata_cache.put_many([entry[:4] for entry in entries if not entry[4]])
+                submit_next()
+                yield [(entry[0], entry[3]) for entry in entries]
+
+class MetadataLoader(threading.Thread):
+    """
+    Hilo que precarga en la caché los metadatos de las rutas que se le van pasando con add(),
+    usando extract_metadata_parallel. Llama a on_progress(rutas_leídas, leídas, total) tras cada bloque,
+    desde el propio hilo de carga.
+    """
+    def __init__(self, on_progress, workers=0):
+        super(MetadataLoader, self).__init__(daemon=True)
+        self.on_progress = on_progress
+        self.workers = workers
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.done = 0
+        self.total = 0
+
+    def add(self, file_paths):
+        file_paths = list(file_paths)
+        self.total += len(file_paths)
+        self.queue.put(file_paths)
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.queue.put(None)
+
+    def run(self):
+        while not self.cancel_event.is_set():
+            file_paths = self.queue.get()
+            if file_paths is None:
+                break
+            instrumentacion.punto_de_control()
+            # Se agrupan los lotes que ya estén esperando para repartirlos mejor
+            while True:
+                try:
+                    more = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    self.cancel_event.set()
+                    break
+                file_paths.extend(more)
+            pending = len(file_paths)
+            for chunk in extract_metadata_parallel(file_paths, workers=self.workers,
+                                                   cancel_event=self.cancel_event):
+                pending -= len(chunk)
+                self.done += len(chunk)
+                self.on_progress([file_path for file_path, _ in chunk], self.done, self.total)
+            if pending and not self.cancel_event.is_set():
+                # Rutas que ya no existen: se cuentan como leídas para cerrar el progreso
+                self.done += pending
+                self.on_progress([], self.done, self.total)
+
+# ---------------- Edición de metadatos en bloque ----------------
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+def establecer_gps(exif_dict, lat, lon):
+    """Escribe en el diccionario EXIF las coordenadas decimales (lat, lon) con sus referencias N/S y E/W."""
+    exif_dict["GPS"][piexif.GPSIFD.GPSLatitudeRef] = (b'N' if lat >= 0 else b'S')
+    exif_dict["GPS"][piexif.GPSIFD.GPSLatitude] = decimal_to_dms_rational(lat)
+    exif_dict["GPS"][piexif.GPSIFD.GPSLongitudeRef] = (b'E' if lon >= 0 else b'W')
+    exif_dict["GPS"][piexif.GPSIFD.GPSLongitude] = decimal_to_dms_rational(lon)
+
+def parse_desplazamiento(texto):
+    """
+    Convierte un desplazamiento horario "+H:MM", "-H:MM:SS" o "+D H:MM:SS" (días y horas) en un timedelta.
+    Las horas pueden pasar de 24. Lanza ValueError si el texto no tiene ese formato.
+    """
+    texto = texto.strip()
+    signo = -1 if texto.startswith("-") else 1
+    cuerpo = texto.lstrip("+-").strip()
+    dias = 0
+    if " " in cuerpo:
+        dias_texto, cuerpo = cuerpo.split(None, 1)
+        if not dias_texto.isdigit():
+            raise ValueError("Desplazamiento no válido: " + texto)
+        dias = int(dias_texto)
+    partes = cuerpo.split(":")
+    if not 2 <= len(partes) <= 3 or not all(p.isdigit() for p in partes):
+        raise ValueError("Desplazamiento no válido: " + texto)
+    horas, minutos = int(partes[0]), int(partes[1])
+    segundos = int(partes[2]) if len(partes) == 3 else 0
+    if minutos >= 60 or segundos >= 60:
+        raise ValueError("Desplazamiento no válido: " + texto)
+    return signo * datetime.timedelta(days=dias, hours=horas, minutes=minutos, seconds=segundos)
+
+def aplicar_plantilla(plantilla, file_path, metadatos, numero=1):
+    """
+    Rellena una plantilla de descripción con los campos {nombre} (sin extensión), {archivo}, {carpeta},
+    {fecha}, {hora}, {descripcion} (la actual) y {n} (posición en la selección; admite formato, p. ej. {n:03d}).
+    Lanza ValueError si la plantilla usa otro campo o no es válida.
+    """
+    desc, gps, fecha, hora = metadatos
+    archivo = os.path.basename(file_path)
+    valores = {
+        "nombre": os.path.splitext(archivo)[0],
+        "archivo": archivo,
+        "carpeta": os.path.basename(os.path.dirname(file_path)),
+        "fecha": fecha,
+        "hora": hora,
+        "descripcion": desc,
+        "n": numero,
+    }
+    try:
+        return plantilla.format_map(valores)
+    except KeyError as e:
+        raise ValueError("Campo desconocido en la plantilla: {" + str(e.args[0]) + "}")
+    except (ValueError, IndexError, AttributeError) as e:
+        raise ValueError("Plantilla no válida: " + str(e))
+
+def editar_metadatos(file_path, description=None, date_time=None, shift=None, gps=None, numero=1):
+    """
+    Aplica a una imagen los cambios de una edición en bloque con una sola lectura y una sola escritura del EXIF:
+    description es una plantilla (ver aplicar_plantilla), date_time un datetime que sustituye a DateTimeOriginal,
+    shift un timedelta que se suma a la fecha (la fijada o la que ya tenía) y gps un par (lat, lon).
+    La plantilla se rellena con la fecha ya modificada.
+    """
+    exif_dict = load_exif_dict(file_path)
+    if date_time is not None or shift is not None:
+        if date_time is None:
+            actual = exif_dict["Exif"].get(piexif.ExifIFD.DateTimeOriginal, b"")
+            try:
+                date_time = datetime.datetime.strptime(
+                    actual.decode("ascii", errors="ignore").strip("\x00 "), EXIF_DATETIME_FORMAT)
+            except ValueError:
+                raise Exception("La imagen no tiene fecha que desplazar")
+        if shift is not None:
+            date_time += shift
+        exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal] = date_time.strftime(EXIF_DATETIME_FORMAT).encode("utf-8")
+    if gps is not None:
+        establecer_gps(exif_dict, gps[0], gps[1])
+    if description is not None:
+        texto = aplicar_plantilla(description, file_path, metadata_from_exif_dict(exif_dict), numero)
+        exif_dict["0th"][piexif.ImageIFD.ImageDescription] = texto.encode("utf-8")
+    write_exif(file_path, exif_dict)
+    metadata_cache.invalidate(file_path)
+
+class BulkEditor(threading.Thread):
+    """
+    Aplica los mismos cambios (ver editar_metadatos) a varias imágenes con un pool de hilos.
+    Cada imagen se lee y se escribe una sola vez. Se llama a on_progress(hechas, total) a medida que
+    terminan y a on_done(resumen) al final, desde hilos de trabajo; el resumen incluye en "paths" las
+    imágenes modificadas, para refrescarlas todas de una vez. Las subclases cambian apply().
+    """
+    def __init__(self, file_paths, on_done, on_progress=None, description=None, date_time=None,
+                 shift=None, gps=None, workers=0):
+        super(BulkEditor, self).__init__(daemon=True)
+        self.file_paths = list(file_paths)
+        self.on_done = on_done
+        self.on_progress = on_progress
+        self.changes = {"description": description, "date_time": date_time, "shift": shift, "gps": gps}
+        self.changes_gps = gps is not None  # Las direcciones guardadas de estas imágenes dejan de valer
+        # La escritura acaba en fsync: con más hilos que estos el disco no va más rápido
+        self.workers = workers or min(8, (os.cpu_count() or 1) + 2)
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.done = 0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def apply(self, numero, file_path):
+        """Modifica una imagen; devuelve False si no hacía falta escribirla."""
+        editar_metadatos(file_path, numero=numero, **self.changes)
+        return True
+
+    def edit_one(self, numero, file_path):
+        if self.cancel_event.is_set():
+            return
+        error = None
+        changed = False
+        try:
+            changed = self.apply(numero, file_path)
+        except Exception as e:
+            error = str(e)
+        with self.lock:
+            self.done += 1
+            done = self.done
+        if self.on_progress:
+            self.on_progress(done, len(self.file_paths))
+        return {"path": file_path, "error": error, "changed": changed}
+
+    def run(self):
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                numeros = range(1, len(self.file_paths) + 1)
+                for result in executor.map(self.edit_one, numeros, self.file_paths):
+                    if result is not None:
+                        results.append(result)
+        finally:
+            errors = [(r["path"], r["error"]) for r in results if r["error"]]
+            self.on_done({
+                "total": len(self.file_paths),
+                "ok": len(results) - len(errors),
+                "errors": errors,
+                "unchanged": sum(1 for r in results if not r["error"] and not r["changed"]),
+                "paths": [r["path"] for r in results if r["changed"]],
+                "cancelled": self.cancel_event.is_set(),
+            })
+
+# ---------------- Exportación e importación del catálogo ----------------
+EXPORT_FIELDS = ["path", "description", "latitude", "longitude", "date", "time", "address"]
+CATALOG_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".geojson": "geojson", ".json": "geojson"}
+
+def formato_catalogo(file_path):
+    """Formato del catálogo (csv, jsonl o geojson) según la extensión del archivo; ValueError si no se reconoce."""
+    formato = CATALOG_FORMATS.get(os.path.splitext(file_path)[1].lower())
+    if formato is None:
+        raise ValueError("Formato de catálogo no reconocido: " + os.path.basename(file_path))
+    return formato
+
+def registro_catalogo(file_path, metadatos, address):
+    """Registro de una imagen para exportar, con las claves de EXPORT_FIELDS."""
+    desc, gps, fecha, hora = metadatos
+    lat, lon = gps if gps else (None, None)
+    return {"path": file_path, "description": desc, "latitude": lat, "longitude": lon,
+            "date": fecha, "time": hora, "address": address}
+
+def iter_catalogo(file_paths, addresses, cancel_event=None):
+    """
+    Genera los registros de las imágenes de una en una, con los metadatos de la caché (get_metadata solo
+    abre la imagen si cambió desde la última lectura). La memoria no depende del tamaño del catálogo.
+    """
+    for file_path in file_paths:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        metadatos = get_metadata(file_path)
+        yield registro_catalogo(file_path, metadatos, addresses.get_for(file_path, metadatos[1]))
+
+def lineas_csv(registros):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, lineterminator="\n")
+    writer.writeheader()
+    for registro in registros:
+        writer.writerow(registro)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # La cabecera sola, si no había registros
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def lineas_jsonl(registros):
+    for registro in registros:
+        yield json.dumps(registro, ensure_ascii=False) + "\n"
+
+def lineas_geojson(registros):
+    """
+    FeatureCollection con un Feature por línea; las imágenes sin coordenadas llevan geometry nula.
+    Se escribe por partes, sin construir el documento completo en memoria.
+    """
+    yield '{"type": "FeatureCollection", "features": [\n'
+    separador = ""
+    for registro in registros:
+        propiedades = {k: v for k, v in registro.items() if k not in ("latitude", "longitude")}
+        geometria = None
+        if registro["latitude"] is not None and registro["longitude"] is not None:
+            geometria = {"type": "Point", "coordinates": [registro["longitude"], registro["latitude"]]}
+        feature = {"type": "Feature", "geometry": geometria, "properties": propiedades}
+        yield separador + json.dumps(feature, ensure_ascii=False)
+        separador = ",\n"
+    yield "\n]}\n"
+
+CATALOG_WRITERS = {"csv": lineas_csv, "jsonl": lineas_jsonl, "geojson": lineas_geojson}
+
+def exportar_catalogo(registros, destino, formato):
+    """
+    Escribe los registros en destino (un flujo de texto abierto o la ruta de un archivo) en el formato indicado
+    y devuelve cuántos se exportaron. Los archivos se escriben de forma atómica: si la exportación falla
+    o se cancela, no queda un catálogo a medias.
+    """
+    contador = [0]
+
+    def contar(registros):
+        for registro in registros:
+            contador[0] += 1
+            yield registro
+
+    lineas = CATALOG_WRITERS[formato](contar(registros))
+    if isinstance(destino, str):
+        atomic_write(destino, (linea.encode("utf-8") for linea in lineas))
+    else:
+        for linea in lineas:
+            destino.write(linea)
+    return contador[0]
+
+def leer_catalogo(file_path):
+    """
+    Genera los registros de un catálogo exportado (CSV, JSON Lines o GeoJSON, según la extensión).
+    CSV y JSON Lines se leen línea a línea; un GeoJSON es un único documento y se carga entero.
+    """
+    formato = formato_catalogo(file_path)
+    with open(file_path, encoding="utf-8-sig", newline="") as f:
+        if formato == "csv":
+            for registro in csv.DictReader(f):
+                yield registro
+        elif formato == "jsonl":
+            for numero, linea in enumerate(f, 1):
+                if linea.strip():
+                    try:
+                        yield json.loads(linea)
+                    except ValueError:
+                        raise ValueError(f"Línea {numero} no válida en {os.path.basename(file_path)}")
+        else:
+            for feature in json.load(f).get("features", []):
+                registro = dict(feature.get("properties") or {})
+                coordenadas = (feature.get("geometry") or {}).get("coordinates")
+                if coordenadas:
+                    registro["longitude"], registro["latitude"] = coordenadas[0], coordenadas[1]
+                yield registro
+
+def descripciones_de_catalogo(registros, file_paths=None):
+    """
+    Empareja los registros de un catálogo con imágenes y devuelve ([(ruta, descripción)], sin_emparejar).
+    Sin file_paths se usan las rutas del catálogo que existen. Con file_paths (las imágenes cargadas)
+    se empareja por ruta y, si no coincide, por nombre de archivo cuando ese nombre es único, de modo
+    que un catálogo exportado en otro equipo sigue sirviendo. Los registros sin descripción se ignoran.
+    """
+    por_ruta = None
+    por_nombre = {}
+    if file_paths is not None:
+        por_ruta = set(file_paths)
+        for file_path in file_paths:
+            nombre = os.path.basename(file_path)
+            por_nombre[nombre] = None if nombre in por_nombre else file_path
+    pares = {}
+    sin_emparejar = 0
+    for registro in registros:
+        ruta = registro.get("path") or ""
+        descripcion = registro.get("description")
+        if not ruta or descripcion is None or descripcion == "":
+            continue
+        if por_ruta is None:
+            destino = ruta if os.path.isfile(ruta) else None
+        elif ruta in por_ruta:
+            destino = ruta
+        else:
+            destino = por_nombre.get(os.path.basename(ruta.replace("\\", "/")))
+        if destino is None:
+            sin_emparejar += 1
+        else:
+            pares[destino] = descripcion
+    return list(pares.items()), sin_emparejar
+
+class DescriptionImporter(BulkEditor):
+    """
+    Escribe en el EXIF las descripciones de un catálogo ([(ruta, descripción)]) con el pool de BulkEditor.
+    Las imágenes que ya tienen esa descripción no se reescriben; el resumen las cuenta en "unchanged".
+    """
+    def __init__(self, pairs, on_done, on_progress=None, workers=0):
+        self.descriptions = dict(pairs)
+        super(DescriptionImporter, self).__init__(list(self.descriptions), on_done, on_progress, workers=workers)
+
+    def apply(self, numero, file_path):
+        description = self.descriptions[file_path]
+        if get_metadata(file_path)[0] == description:
+            return False
+        update_image_description(file_path, description)
+        return True
+
+# ---------------- Geoetiquetado con tracks GPX/KML ----------------
+def iso_a_epoch(texto):
+    """Convierte una marca de tiempo ISO 8601 de un track ("2024-05-01T10:00:00Z") en segundos UTC."""
+    texto = texto.strip()
+    if texto.endswith(("Z", "z")):
+        texto = texto[:-1] + "+00:00"
+    instante = datetime.datetime.fromisoformat(texto)
+    if instante.tzinfo is None:
+        instante = instante.replace(tzinfo=datetime.timezone.utc)  # Los tracks se guardan en UTC
+    return instante.timestamp()
+
+def leer_track(file_path):
+    """
+    Devuelve la lista de puntos (segundos UTC, lat, lon) de un archivo GPX (trkpt, rtept o wpt con <time>)
+    o KML (gx:Track con <when>/<gx:coord>, o Placemark con TimeStamp y un Point; las demás geometrías,
+    como LineString, no tienen hora por punto y se descartan).
+    Se lee con iterparse liberando cada elemento, así que los tracks largos no se cargan enteros como árbol.
+    """
+    from xml.etree import ElementTree
+    puntos = []
+    cuando, coords = [], []   # Pares <when>/<gx:coord> del gx:Track en curso
+    marca = None              # TimeStamp del Placemark en curso
+    posiciones = []           # Posición de cada Point del Placemark en curso
+    coordenadas = None        # Tuplas lon,lat[,alt] del último <coordinates>
+    try:
+        for _, elem in ElementTree.iterparse(file_path):
+            tag = elem.tag.rsplit("}", 1)[-1]
+            if tag in ("trkpt", "rtept", "wpt"):
+                hora = next((hijo.text for hijo in elem if hijo.tag.rsplit("}", 1)[-1] == "time"), None)
+                if hora and elem.get("lat") and elem.get("lon"):
+                    puntos.append((iso_a_epoch(hora), float(elem.get("lat")), float(elem.get("lon"))))
+                elem.clear()
+            elif tag == "when" and elem.text:
+                cuando.append(elem.text)
+                marca = elem.text
+            elif tag == "coord" and elem.text:
+                coords.append(elem.text.split())
+            elif tag == "coordinates" and elem.text:
+                # Tuplas separadas por espacios, con las componentes separadas por comas
+                coordenadas = [tupla.split(",") for tupla in elem.text.split()]
+            elif tag == "Point":
+                if coordenadas is not None and len(coordenadas) == 1 and len(coordenadas[0]) >= 2:
+                    posiciones.append(coordenadas[0])
+                coordenadas = None
+            elif tag == "Track":
+                for hora, coord in zip(cuando, coords):
+                    puntos.append((iso_a_epoch(hora), float(coord[1]), float(coord[0])))
+                cuando, coords = [], []
+                marca = None
+                elem.clear()
+            elif tag == "Placemark":
+                if marca and len(posiciones) == 1:
+                    puntos.append((iso_a_epoch(marca), float(posiciones[0][1]), float(posiciones[0][0])))
+                cuando, coords = [], []
+                marca, posiciones, coordenadas = None, [], None
+                elem.clear()
+    except ElementTree.ParseError as e:
+        raise ValueError(f"{os.path.basename(file_path)} no es un GPX/KML válido: {e}")
+    return puntos
+
+class TrackIndex:
+    """
+    Puntos de uno o varios tracks ordenados por tiempo, en tres array('d') paralelos (tiempos, latitudes
+    y longitudes). localizar() busca por bisección cada instante, con NumPy para toda la lista de una vez
+    si está instalado, e interpola entre los dos puntos que lo rodean.
+    """
+    def __init__(self, puntos=()):
+        puntos = sorted(puntos)
+        self.times = array("d", (p[0] for p in puntos))
+        self.lats = array("d", (p[1] for p in puntos))
+        self.lons = array("d", (p[2] for p in puntos))
+
+    @classmethod
+    def from_files(cls, file_paths):
+        puntos = []
+        for file_path in file_paths:
+            puntos.extend(leer_track(file_path))
+        return cls(puntos)
+
+    def __len__(self):
+        return len(self.times)
+
+    def localizar(self, instantes, max_gap=600, tolerancia=120):
+        """
+        Devuelve una posición (lat, lon) o None por cada instante (segundos UTC o None).
+        Entre dos puntos separados como mucho max_gap segundos se interpola; si no, se usa el punto más
+        cercano cuando está a menos de tolerancia segundos (al principio y al final del track, o en los cortes).
+        """
+        n = len(self.times)
+        if not n:
+            return [None] * len(instantes)
+        np = numpy_module()
+        if np is not None:
+            return self._localizar_numpy(np, instantes, max_gap, tolerancia)
+        resultado = []
+        for t in instantes:
+            if t is None:
+                resultado.append(None)
+                continue
+            i = bisect.bisect_left(self.times, t)
+            if 0 < i < n and self.times[i] - self.times[i - 1] <= max_gap:
+                resultado.append(self._interpolar(i - 1, i, t))
+                continue
+            cercano = min((j for j in (i - 1, i) if 0 <= j < n), key=lambda j: abs(self.times[j] - t))
+            if abs(self.times[cercano] - t) <= tolerancia:
+                resultado.append((self.lats[cercano], self.lons[cercano]))
+            else:
+                resultado.append(None)
+        return resultado
+
+    def _interpolar(self, a, b, t):
+        dt = self.times[b] - self.times[a]
+        f = (t - self.times[a]) / dt if dt else 0.0
+        dlon = self.lons[b] - self.lons[a]
+        if abs(dlon) > 180:  # El tramo cruza el antimeridiano
+            dlon -= math.copysign(360, dlon)
+        lon = self.lons[a] + f * dlon
+        lon = (lon + 180) % 360 - 180
+        return (self.lats[a] + f * (self.lats[b] - self.lats[a]), lon)
+
+    def _localizar_numpy(self, np, instantes, max_gap, tolerancia):
+        times = np.frombuffer(self.times, dtype=np.float64)
+        lats = np.frombuffer(self.lats, dtype=np.float64)
+        lons = np.frombuffer(self.lons, dtype=np.float64)
+        n = len(times)
+        validos = np.array([t is not None for t in instantes], dtype=bool)
+        t = np.array([0.0 if x is None else x for x in instantes], dtype=np.float64)
+        i = np.searchsorted(times, t, side="left")
+        a = np.clip(i - 1, 0, n - 1)
+        b = np.clip(i, 0, n - 1)
+        dt = times[b] - times[a]
+        f = np.divide(t - times[a], dt, out=np.zeros_like(t), where=dt > 0)
+        dlon = lons[b] - lons[a]
+        dlon = np.where(np.abs(dlon) > 180, dlon - np.copysign(360, dlon), dlon)
+        lat = lats[a] + f * (lats[b] - lats[a])
+        lon = (lons[a] + f * dlon + 180) % 360 - 180
+        interpolar = (i > 0) & (i < n) & (dt <= max_gap)
+        # Sin interpolación: el punto más cercano de los dos vecinos, si está dentro de la tolerancia
+        cercano = np.where(np.abs(times[a] - t) <= np.abs(times[b] - t), a, b)
+        lat = np.where(interpolar, lat, lats[cercano])
+        lon = np.where(interpolar, lon, lons[cercano])
+        ok = validos & (interpolar | (np.abs(times[cercano] - t) <= tolerancia))
+        return [(float(y), float(x)) if v else None for y, x, v in zip(lat, lon, ok)]
+
+def hora_a_epoch(fecha, hora, zona=None, desfase=None):
+    """
+    Convierte la fecha y hora de la cámara (DD/MM/AAAA, HH:MM:SS) en segundos UTC, o None si no son válidas.
+    zona es la diferencia con UTC del reloj de la cámara (timedelta; None: la zona horaria de este equipo)
+    y desfase lo que hay que sumar a la hora de la cámara para que sea la correcta.
+    """
+    try:
+        d, m, a = (int(x) for x in fecha.split("/"))
+        h, mi, s = (int(x) for x in (hora or "00:00:00").split(":"))
+        instante = datetime.datetime(a, m, d, h, mi, s)
+    except (ValueError, AttributeError):
+        return None
+    if desfase is not None:
+        instante += desfase
+    if zona is None:
+        return instante.timestamp()
+    return instante.replace(tzinfo=datetime.timezone(zona)).timestamp()
+
+def emparejar_track(file_paths, track, zona=None, desfase=None, sobrescribir=False, max_gap=600, tolerancia=120):
+    """
+    Busca en el track la posición de cada imagen según su DateTimeOriginal (de get_metadata, con la caché).
+    Devuelve (posiciones, resumen): posiciones es {ruta: (lat, lon)} y resumen cuenta las imágenes
+    sin fecha, fuera del track y con coordenadas (que no se tocan salvo con sobrescribir=True).
+    """
+    candidatas, instantes = [], []
+    resumen = {"total": len(file_paths), "matched": 0, "no_date": 0, "no_match": 0, "has_gps": 0}
+    for file_path in file_paths:
+        desc, gps, fecha, hora = get_metadata(file_path)
+        if gps and not sobrescribir:
+            resumen["has_gps"] += 1
+            continue
+        instante = hora_a_epoch(fecha, hora, zona, desfase)
+        if instante is None:
+            resumen["no_date"] += 1
+            continue
+        candidatas.append(file_path)
+        instantes.append(instante)
+    posiciones = {}
+    for file_path, posicion in zip(candidatas, track.localizar(instantes, max_gap, tolerancia)):
+        if posicion is None:
+            resumen["no_match"] += 1
+        else:
+            posiciones[file_path] = posicion
+    resumen["matched"] = len(posiciones)
+    return posiciones, resumen
+
+class GeotagWriter(BulkEditor):
+    """Guarda con el pool de BulkEditor una posición distinta en cada imagen ({ruta: (lat, lon)})."""
+    def __init__(self, positions, on_done, on_progress=None, workers=0):
+        self.positions = dict(positions)
+        super(GeotagWriter, self).__init__(list(self.positions), on_done, on_progress, workers=workers)
+        self.changes_gps = True
+
+    def apply(self, numero, file_path):
+        editar_metadatos(file_path, gps=self.positions[file_path])
+        return True
+
+# ---------------- Índice de búsqueda ----------------
+def fecha_a_iso(fecha, hora=""):
+    """
+    Convierte una fecha "DD/MM/AAAA" (y, si se indica, una hora "HH:MM:SS") en "AAAA-MM-DD HH:MM:SS",
+    que se puede comparar como texto. Devuelve None si la fecha no tiene ese formato.
+    """
+    partes = fecha.strip().split("/")
+    if len(partes) != 3 or not all(p.isdigit() for p in partes):
+        return None
+    d, m, y = partes
+    iso = f"{y.zfill(4)}-{m.zfill(2)}-{d.zfill(2)}"
+    return f"{iso} {hora}" if hora else iso
+
+def condicion_longitud(lon_min, lon_max):
+    """Condición SQL para un intervalo de longitudes, que puede cruzar el antimeridiano (lon_min > lon_max)."""
+    if lon_min <= lon_max:
+        return "lon BETWEEN ? AND ?", [lon_min, lon_max]
+    return "(lon >= ? OR lon <= ?)", [lon_min, lon_max]
+
+class SearchIndex:
+    """
+    Índice en memoria (SQLite) para filtrar el listado sin volver a leer los archivos: texto completo sobre
+    la descripción y la dirección (FTS5, sin distinguir mayúsculas ni tildes), intervalo de fechas de
+    DateTimeOriginal y coordenadas dentro de un rectángulo o de un radio.
+    Se actualiza imagen a imagen con update_many() o index_paths() a medida que se leen o editan los metadatos.
+    Si SQLite no incluye FTS5, el texto se busca con LIKE.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        # Las imágenes sin coordenadas tienen lat y lon NULL: la distancia también es NULL
+        self.conn.create_function("haversine_m", 4, lambda lat1, lon1, lat2, lon2: None if lat1 is None or lon1 is None
+                                  else haversine_m(lat1, lon1, lat2, lon2), deterministic=True)
+        self.conn.execute("CREATE TABLE images (id INTEGER PRIMARY KEY, path TEXT UNIQUE, taken TEXT, lat REAL, lon REAL)")
+        self.conn.execute("CREATE INDEX images_taken ON images (taken)")
+        self.conn.execute("CREATE INDEX images_lat ON images (lat)")
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE images_text USING fts5("
+                              "description, address, tokenize='unicode61 remove_diacritics 2')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.conn.execute("CREATE TABLE images_text (description TEXT, address TEXT)")
+            self.fts = False
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+
+    def update_many(self, entries, cancel_event=None):
+        """
+        Añade o actualiza imágenes; entries son tuplas (ruta, metadatos de get_metadata, dirección).
+        Si cancel_event está activado no se añade nada: se comprueba con el cerrojo tomado, así que lo que
+        indexa un hilo cancelado antes de un clear() nunca queda en el índice después.
+        """
+        with self.lock, self.conn:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            for file_path, (desc, gps, fecha, hora), address in entries:
+                lat, lon = gps if gps else (None, None)
+                taken = fecha_a_iso(fecha, hora) if fecha else None
+                row = self.conn.execute("SELECT id FROM images WHERE path = ?", (file_path,)).fetchone()
+                if row is None:
+                    rowid = self.conn.execute("INSERT INTO images (path, taken, lat, lon) VALUES (?, ?, ?, ?)",
+                                              (file_path, taken, lat, lon)).lastrowid
+                else:
+                    rowid = row[0]
+                    self.conn.execute("UPDATE images SET taken = ?, lat = ?, lon = ? WHERE id = ?",
+                                      (taken, lat, lon, rowid))
+                    self.conn.execute("DELETE FROM images_text WHERE rowid = ?", (rowid,))
+                self.conn.execute("INSERT INTO images_text (rowid, description, address) VALUES (?, ?, ?)",
+                                  (rowid, desc or "", address or ""))
+
+    def index_paths(self, file_paths, addresses=None, cancel_event=None):
+        """
+        Indexa las rutas con sus metadatos (desde la caché) y, si se pasa un ImageAddresses, su dirección.
+        cancel_event es el del hilo que indexa, como en update_many.
+        """
+        entries = []
+        for file_path in file_paths:
+            metadata = get_metadata(file_path)
+            address = addresses.get_for(file_path, metadata[1]) if addresses is not None else ""
+            entries.append((file_path, metadata, address))
+        self.update_many(entries, cancel_event)
+
+    def remove(self, file_path):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT id FROM images WHERE path = ?", (file_path,)).fetchone()
+            if row is not None:
+                self.conn.execute("DELETE FROM images_text WHERE rowid = ?", row)
+                self.conn.execute("DELETE FROM images WHERE id = ?", row)
+
+    def rename(self, old_path, new_path):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM images_text WHERE rowid IN (SELECT id FROM images WHERE path = ?)",
+                              (new_path,))
+            self.conn.execute("DELETE FROM images WHERE path = ?", (new_path,))
+            self.conn.execute("UPDATE images SET path = ? WHERE path = ?", (new_path, old_path))
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM images_text")
+            self.conn.execute("DELETE FROM images")
+
+    def search(self, text="", date_from=None, date_to=None, bbox=None, near=None):
+        """
+        Devuelve el conjunto de rutas que cumplen todos los criterios indicados:
+        text (palabras que deben aparecer, también como inicio de palabra, en la descripción o la dirección),
+        date_from y date_to ("DD/MM/AAAA", ambas incluidas), bbox (lat_min, lon_min, lat_max, lon_max)
+        y near (lat, lon, radio en metros). Lanza ValueError si una fecha no es válida.
+        """
+        where, params = [], []
+        words = text.split()
+        if words and self.fts:
+            where.append("id IN (SELECT rowid FROM images_text WHERE images_text MATCH ?)")
+            params.append(" ".join('"' + w.replace('"', '""') + '"*' for w in words))
+        for word in ([] if self.fts else words):
+            where.append("id IN (SELECT rowid FROM images_text WHERE description LIKE ? OR address LIKE ?)")
+            params += ["%" + word + "%"] * 2
+        for fecha, op, suffix in ((date_from, ">=", ""), (date_to, "<=", " 23:59:59")):
+            if fecha:
+                iso = fecha_a_iso(fecha)
+                if iso is None:
+                    raise ValueError("Fecha no válida: " + fecha)
+                where.append("taken " + op + " ?")
+                params.append(iso + suffix)
+        if bbox is not None:
+            lat_min, lon_min, lat_max, lon_max = bbox
+            lon_sql, lon_params = condicion_longitud(lon_min, lon_max)
+            where.append("lat BETWEEN ? AND ? AND " + lon_sql)
+            params += [lat_min, lat_max] + lon_params
+        if near is not None:
+            lat, lon, radius_m = near
+            # Rectángulo que contiene el círculo (usa el índice de latitud) y después la distancia exacta
+            dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+            where.append("lat BETWEEN ? AND ?")
+            params += [lat - dlat, lat + dlat]
+            cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+            if cos_lat > 1e-6 and dlat / cos_lat < 180:
+                dlon = dlat / cos_lat
+                lon_sql, lon_params = condicion_longitud((lon - dlon + 180) % 360 - 180, (lon + dlon + 180) % 360 - 180)
+                where.append(lon_sql)
+                params += lon_params
+            where.append("haversine_m(lat, lon, ?, ?) <= ?")
+            params += [lat, lon, radius_m]
+        sql = "SELECT path FROM images"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self.lock:
+            return {row[0] for row in self.conn.execute(sql, params)}
+
+# ---------------- Miniaturas para la vista previa ----------------
+class LRUCache:
+    """Caché de tamaño fijo que descarta primero los elementos usados hace más tiempo."""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()
+
+    def get(self, key):
+        value = self.items.get(key)
+        if value is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def discard(self, key):
+        self.items.pop(key, None)
+
+# Giro o volteo que deja derecha una imagen según su etiqueta EXIF Orientation (como ImageOps.exif_transpose)
+ORIENTACION_EXIF = {2: "FLIP_LEFT_RIGHT", 3: "ROTATE_180", 4: "FLIP_TOP_BOTTOM", 5: "TRANSPOSE", 6: "ROTATE_270",
+                    7: "TRANSVERSE", 8: "ROTATE_90"}
+
+def make_thumbnail(file_path, max_size):
+    """
+    Genera una miniatura RGB que cabe en max_size x max_size sin decodificar la imagen completa:
+    usa la miniatura EXIF incrustada si llega a max_size y, si no, la decodificación reducida
+    de JPEG (draft) o la reducción por factores enteros de PIL. En ambos casos se aplica la
+    orientación EXIF de la imagen.
+    """
+    Image = pil_image()
+    from PIL import ImageOps
+    try:
+        exif_bytes = read_jpeg_exif_bytes(file_path)
+    except ValueError:
+        exif_bytes = None
+    if exif_bytes:
+        try:
+            exif = piexif.load(exif_bytes)
+            embedded = exif.get("thumbnail")
+            if embedded:
+                thumb = Image.open(io.BytesIO(embedded))
+                # thumbnail() no amplía: una miniatura incrustada más pequeña saldría más pequeña que max_size
+                if max(thumb.size) >= max_size:
+                    thumb = thumb.convert("RGB")
+                    thumb.thumbnail((max_size, max_size))
+                    # La miniatura incrustada no lleva orientación propia: vale la de la imagen
+                    orientacion = ORIENTACION_EXIF.get(exif["0th"].get(piexif.ImageIFD.Orientation))
+                    if orientacion:
+                        thumb = thumb.transpose(getattr(Image.Transpose, orientacion))
+                    return thumb
+        except Exception:
+            pass
+    img = Image.open(file_path)
+    if img.format == "JPEG":
+        img.draft("RGB", (max_size, max_size))
+    img.thumbnail((max_size, max_size), reducing_gap=2.0)
+    return ImageOps.exif_transpose(img).convert("RGB")
+
+class ThumbnailCache:
+    """
+    Caché persistente de miniaturas en disco (JPEG en la carpeta de configuración).
+    El nombre de cada archivo depende de la ruta, el tamaño, la fecha de modificación y el tamaño pedido,
+    así que una imagen modificada genera una miniatura nueva.
+    """
+    VERSION = 2  # Forma parte del nombre: al cambiar cómo se generan, no se sirven las miniaturas anteriores
+
+    def __init__(self, cache_dir=None, max_files=20000):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+
+    def _dir(self):
+        if self.cache_dir is None:
+            self.cache_dir = os.path.join(get_config_dir(), "miniaturas")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return self.cache_dir
+
+    def _cache_path(self, file_path, max_size):
+        st = os.stat(file_path)
+        key = f"{file_path}|{st.st_size}|{st.st_mtime_ns}|{max_size}|{self.VERSION}".encode("utf-8")
+        return os.path.join(self._dir(), hashlib.sha1(key).hexdigest() + ".jpg")
+
+    def get(self, file_path, max_size):
+        """Devuelve la miniatura como (ancho, alto, bytes RGB), generándola y guardándola si hace falta."""
+        cache_path = self._cache_path(file_path, max_size)
+        if os.path.exists(cache_path):
+            try:
+                with instrumentacion.medir("vista_previa.cache"):
+                    thumb = pil_image().open(cache_path).convert("RGB")
+                    return thumb.width, thumb.height, thumb.tobytes()
+            except Exception:
+                pass
+        with instrumentacion.medir("vista_previa.decodificacion"):
+            thumb = make_thumbnail(file_path, max_size)
+        try:
+            buffer = io.BytesIO()
+            thumb.save(buffer, "JPEG", quality=85)
+            tmp_path = cache_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(buffer.getbuffer())
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+        return thumb.width, thumb.height, thumb.tobytes()
+
+    def prune(self):
+        """Si hay demasiadas miniaturas guardadas, borra las más antiguas."""
+        try:
+            with os.scandir(self._dir()) as it:
+                entries = [(e.stat().st_mtime, e.path) for e in it if e.name.endswith(".jpg")]
+        except OSError:
+            return
+        if len(entries) <= self.max_files:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class ThumbnailLoader(threading.Thread):
+    """
+    Genera miniaturas en segundo plano. Cada llamada a request() sustituye la lista de pendientes,
+    de modo que las peticiones antiguas (de una selección anterior) se descartan sin procesarse.
+    El resultado se entrega con on_ready(ruta, tamaño, ancho, alto, bytes RGB), o con datos None si falla,
+    desde el hilo de carga.
+    """
+    def __init__(self, on_ready, cache=None):
+        super(ThumbnailLoader, self).__init__(daemon=True)
+        self.on_ready = on_ready
+        self.cache = cache or ThumbnailCache()
+        self.condition = threading.Condition()
+        self.pending = []
+        self.stopped = False
+
+    def request(self, file_paths, max_size):
+        """Pide las miniaturas en orden de prioridad (la imagen seleccionada primero, luego las vecinas)."""
+        with self.condition:
+            self.pending = [(file_path, max_size) for file_path in file_paths]
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.pending = []
+            self.condition.notify()
+
+    def run(self):
+        self.cache.prune()
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                file_path, max_size = self.pending.pop(0)
+            instrumentacion.punto_de_control()
+            try:
+                width, height, data = self.cache.get(file_path, max_size)
+            except Exception:
+                width, height, data = 0, 0, None
+            self.on_ready(file_path, max_size, width, height, data)
+
+# ---------------- Búsqueda de imágenes en segundo plano ----------------
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.heif', '.heic')
+
+class FolderScanner(threading.Thread):
+    """
+    Recorre una carpeta (y opcionalmente sus subcarpetas) con os.scandir en un hilo aparte.
+    Las imágenes encontradas se entregan por lotes mediante on_batch(lote, total_encontradas);
+    al terminar se llama a on_done(total_encontradas, cancelada). Ambas funciones se llaman
+    desde el hilo de búsqueda, así que la interfaz debe envolverlas con wx.CallAfter.
+    """
+    def __init__(self, folder, recursive, on_batch, on_done, batch_size=500, batch_interval=0.1):
+        super(FolderScanner, self).__init__(daemon=True)
+        self.folder = folder
+        self.recursive = recursive
+        self.on_batch = on_batch
+        self.on_done = on_done
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.cancel_event = threading.Event()
+        self.found = 0
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def run(self):
+        batch = []
+        last_flush = time.monotonic()
+        pending = [self.folder]
+        try:
+            while pending and not self.is_cancelled():
+                directory = pending.pop()
+                try:
+                    with os.scandir(directory) as it:
+                        entries = sorted(it, key=lambda e: e.name.lower())
+                except OSError:
+                    continue
+                subdirs = []
+                for entry in entries:
+                    if self.is_cancelled():
+                        break
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive:
+                                subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            batch.append(entry.path)
+                            self.found += 1
+                    except OSError:
+                        continue
+                    # El primer lote se entrega en cuanto aparece la primera imagen
+                    now = time.monotonic()
+                    if batch and (self.found == len(batch) or len(batch) >= self.batch_size
+                                  or now - last_flush >= self.batch_interval):
+                        self.on_batch(batch, self.found)
+                        batch = []
+                        last_flush = now
+                # Se apilan al revés para recorrer las subcarpetas en orden alfabético
+                pending.extend(reversed(subdirs))
+            if batch and not self.is_cancelled():
+                self.on_batch(batch, self.found)
+        finally:
+            self.on_done(self.found, self.is_cancelled())
+
+# ---------------- Vigilancia de carpetas ----------------
+def snapshot_folder(folder, recursive=False):
+    """Devuelve {ruta: (tamaño, mtime_ns)} de las imágenes de la carpeta (y sus subcarpetas si recursive)."""
+    snapshot = {}
+    pending = [folder]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                pending.append(entry.path)
+                        elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                            st = entry.stat()
+                            snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return snapshot
+
+class FolderWatcher(threading.Thread):
+    """
+    Vigila las carpetas cargadas y avisa de las imágenes creadas o modificadas, borradas y renombradas,
+    para actualizar solo esas filas. Usa watchdog (inotify, FSEvents o ReadDirectoryChangesW) si está
+    instalado y, si no, compara cada poll_interval segundos el tamaño y la fecha de modificación.
+    Los eventos se agrupan hasta que pasan debounce segundos sin cambios (o max_delay desde el primero)
+    y entonces se llama a on_changes(cambiadas, borradas, renombradas) desde el hilo de vigilancia;
+    renombradas es una lista de (ruta_anterior, ruta_nueva).
+    """
+    def __init__(self, on_changes, debounce=1.0, max_delay=5.0, poll_interval=5.0, use_watchdog=True):
+        super(FolderWatcher, self).__init__(daemon=True)
+        self.on_changes = on_changes
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog
+        self.folders = {}      # carpeta -> recursiva
+        self.snapshots = {}    # carpeta -> {ruta: (tamaño, mtime_ns)}, solo sin watchdog
+        self.observer = None
+        self.pending = {}      # ruta -> "changed" o "deleted" (gana el último evento)
+        self.moves = {}        # ruta nueva -> ruta anterior
+        self.first_event = None
+        self.last_event = None
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def _observer(self):
+        """Arranca el observador de watchdog la primera vez; devuelve None si no está instalado."""
+        if self.observer is None and self.use_watchdog:
+            try:
+                from watchdog.observers import Observer
+            except ImportError:
+                self.use_watchdog = False
+                return None
+            self.observer = Observer()
+            self.observer.start()
+        return self.observer
+
+    def watch(self, folder, recursive=False):
+        with self.lock:
+            if folder in self.folders and (self.folders[folder] or not recursive):
+                return
+            self.folders[folder] = recursive
+            self.snapshots.pop(folder, None)
+            observer = self._observer()
+            if observer is not None:
+                # El propio vigilante hace de manejador: watchdog solo necesita un método dispatch()
+                observer.schedule(self, folder, recursive=recursive)
+
+    def unwatch_all(self):
+        with self.lock:
+            self.folders = {}
+            self.snapshots = {}
+            self.pending = {}
+            self.moves = {}
+            self.first_event = self.last_event = None
+            if self.observer is not None:
+                self.observer.unschedule_all()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def dispatch(self, event):
+        """Recibe los eventos de watchdog, desde su hilo."""
+        # Los eventos de carpetas se ignoran: el sistema avisa también de cada archivo afectado
+        if event.is_directory:
+            return
+        src_path = os.fsdecode(event.src_path)
+        if event.event_type == "moved":
+            self.record_move(src_path, os.fsdecode(event.dest_path))
+        elif event.event_type == "deleted":
+            self.record(src_path, "deleted")
+        elif event.event_type in ("created", "modified", "closed"):
+            self.record(src_path, "changed")
+
+    def _touch(self):
+        now = time.monotonic()
+        if self.first_event is None:
+            self.first_event = now
+        self.last_event = now
+
+    def record(self, file_path, kind):
+        if not file_path.lower().endswith(IMAGE_EXTENSIONS):
+            return
+        with self.lock:
+            if kind == "deleted" and file_path in self.moves:
+                # Se renombró y después se borró: para el listado, se ha borrado la ruta anterior
+                file_path = self.moves.pop(file_path)
+            self.pending[file_path] = kind
+            self._touch()
+
+    def record_move(self, src_path, dest_path):
+        if not dest_path.lower().endswith(IMAGE_EXTENSIONS):
+            self.record(src_path, "deleted")
+        elif not src_path.lower().endswith(IMAGE_EXTENSIONS):
+            # Guardado mediante un archivo temporal que se renombra sobre la imagen (como atomic_write)
+            self.record(dest_path, "changed")
+        else:
+            with self.lock:
+                self.pending.pop(src_path, None)
+                self.pending.pop(dest_path, None)
+                self.moves[dest_path] = self.moves.pop(src_path, src_path)
+                self._touch()
+
+    def poll(self):
+        """Sin watchdog: compara cada carpeta con su foto anterior del disco."""
+        with self.lock:
+            folders = list(self.folders.items())
+        for folder, recursive in folders:
+            if self.stop_event.is_set():
+                return
+            current = snapshot_folder(folder, recursive)
+            with self.lock:
+                if self.folders.get(folder) != recursive:
+                    continue
+                previous = self.snapshots.get(folder)
+                self.snapshots[folder] = current
+            if previous is None:
+                continue
+            created = [p for p in current if p not in previous]
+            # Un archivo que desaparece y otro que aparece con el mismo tamaño y fecha es un renombrado
+            deleted = {previous[p]: p for p in previous if p not in current}
+            for file_path in created:
+                src_path = deleted.pop(current[file_path], None)
+                if src_path is not None:
+                    self.record_move(src_path, file_path)
+                else:
+                    self.record(file_path, "changed")
+            for file_path in deleted.values():
+                self.record(file_path, "deleted")
+            for file_path, stat in current.items():
+                if file_path in previous and previous[file_path] != stat:
+                    self.record(file_path, "changed")
+
+    def flush(self, force=False):
+        with self.lock:
+            if self.last_event is None:
+                return
+            now = time.monotonic()
+            if not force and now - self.last_event < self.debounce and now - self.first_event < self.max_delay:
+                return
+            pending, moves = self.pending, self.moves
+            self.pending, self.moves = {}, {}
+            self.first_event = self.last_event = None
+        changed = [p for p, kind in pending.items() if kind == "changed"]
+        deleted = [p for p, kind in pending.items() if kind == "deleted"]
+        self.on_changes(changed, deleted, [(old, new) for new, old in moves.items()])
+
+    def run(self):
+        next_poll = time.monotonic()
+        try:
+            while not self.stop_event.wait(min(0.2, self.debounce)):
+                instrumentacion.punto_de_control()
+                if self.observer is None:
+                    with self.lock:
+                        unseen = any(folder not in self.snapshots for folder in self.folders)
+                    if unseen or time.monotonic() >= next_poll:
+                        self.poll()
+                        next_poll = time.monotonic() + self.poll_interval
+                self.flush()
+        finally:
+            if self.observer is not None:
+                self.observer.stop()
@@ -0,0 +1,1993 @@
+"""Interfaz gráfica de FotoDesc (wxPython). Se arranca con main() o con el lanzador fotodesc_1.0.py."""
+import time
+
+ARRANQUE = time.perf_counter()  # Momento en que empieza a cargarse la interfaz, para medir el arranque
+
+import wx
+import os
+import sys
+import piexif
+import threading
+import datetime
+
+from fotodesc.core import (
+    LOTE_MAX_IMAGENES, PERFIL_POR_HILO, PROMPT_DESCRIPCION, BatchDescriber, BatchGeocoder, BulkEditor,
+    DescriptionImporter, FolderScanner, FolderWatcher, GeocodingError, GeotagWriter, ImageAddresses, LRUCache,
+    MetadataLoader, RateLimiter, SearchIndex, ThumbnailLoader, TrackIndex, aplicar_plantilla, construir_indice_offline,
+    descripciones_de_catalogo, direccion_en_cache, emparejar_track, establecer_gps, exportar_catalogo, fecha_a_iso,
+    geocode_cache, get_config_dir, get_metadata, instrumentacion, iter_catalogo, leer_catalogo, load_exif_dict,
+    metadata_cache, parse_desplazamiento, reverse_geocoder, write_exif,
+)
+
+# ---------------- Clase para panel no accesible para tabulación ----------------
+class NonFocusablePanel(wx.Panel):
+    def AcceptsFocus(self):
+        return False
+
+# ---------------- Controles comunes de los diálogos ----------------
+def create_spin(panel, sizer, label_text, value, min_value, max_value):
+    """Añade al sizer una fila con una etiqueta y un SpinCtrl (que toma la etiqueta como nombre) y lo devuelve."""
+    hsizer = wx.BoxSizer(wx.HORIZONTAL)
+    label = wx.StaticText(panel, label=label_text)
+    hsizer.Add(label, 0, wx.ALL | wx.CENTER, 5)
+    spin = wx.SpinCtrl(panel, min=min_value, max=max_value, initial=value)
+    spin.SetName(label_text)
+    hsizer.Add(spin, 1, wx.EXPAND | wx.ALL, 5)
+    sizer.Add(hsizer, 0, wx.EXPAND)
+    return spin
+
+def create_field(panel, sizer, label_text, default_value, style=wx.TE_LEFT):
+    """Añade al sizer una fila con una etiqueta y un cuadro de texto, y devuelve el cuadro."""
+    hsizer = wx.BoxSizer(wx.HORIZONTAL)
+    label = wx.StaticText(panel, label=label_text)
+    hsizer.Add(label, 0, wx.ALL | wx.CENTER, 5)
+    txt = wx.TextCtrl(panel, value=default_value, style=style)
+    hsizer.Add(txt, 1, wx.EXPAND | wx.ALL, 5)
+    sizer.Add(hsizer, 0, wx.EXPAND)
+    return txt
+
+# ---------------- Diálogo "Acerca de" ----------------
+class AboutDialog(wx.Dialog):
+    def __init__(self, parent):
+        super(AboutDialog, self).__init__(parent, title="Acerca de", size=(500,400))
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+        about_text = (
+            "Versión: 1.0\n\n"
+            "Soy una persona, que a pesar de a penas tener resto visual, le gusta la fotografía y guardar recuerdos de los viajes.\n\n"
+            "De esto surgió una conversación con mi amigo Ramón Corominas que gracias a sus muchos conocimientos, entre otras cosas en Python, me preparó una mini app para que desde el menú de aplicaciones, al estar situado encima de un archivo JPG, pudiera añadirle una descripción que se guarda directamente en la imagen.\n\n"
+            "Si esta imagen se comparte mediante correo electrónico o de cualquier otra forma que no sea Whatsapp (Telegram no lo se porque no es accesible para ciegos al menos en iOS y no lo he probado), esta descripción se mantiene, con lo que es posible tener tus fotos en tu dispositivo móvil descritas.\n\n"
+            "Se que en iOS existe una manera para añadirle descripción a las imágenes, pero es bastante engorrosa y está muy escondida.\n\n"
+            "Basándome en esta idea de mi amigo Ramón y con la ayuda de Chat GPT y alguna otra persona por ahí, he conseguido realizar esta aplicación que permite ya no solo la edición de la descripción, si no la edición de la geolocalización mediante los datos de latitud y longitud, además de obtener una descripción automática utilizando la API de Open AI.\n\n"
+            "Gracias, Ramón y al resto de personas que han contribuido en que esto sea funcional y sirva."
+        )
+        self.about_ctrl = wx.TextCtrl(panel, value=about_text, style=wx.TE_MULTILINE | wx.TE_READONLY)
+        vbox.Add(self.about_ctrl, 1, wx.EXPAND | wx.ALL, 10)
+        btn = wx.Button(panel, label="Aceptar")
+        vbox.Add(btn, 0, wx.ALIGN_CENTER | wx.ALL, 10)
+        panel.SetSizer(vbox)
+        btn.Bind(wx.EVT_BUTTON, self.on_ok)
+        self.Centre()
+    
+    def on_ok(self, event):
+        self.EndModal(wx.ID_OK)
+
+# ---------------- Diálogo para introducir la API Key ----------------
+class APIKeyDialog(wx.Dialog):
+    """
+    Diálogo para introducir la API Key de OpenAI.
+    """
+    def __init__(self, parent, current_api_key):
+        super(APIKeyDialog, self).__init__(parent, title="Configurar API Key", size=(400,200))
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+        
+        label = wx.StaticText(panel, label="Ingrese su API Key de OpenAI:")
+        vbox.Add(label, 0, wx.ALL | wx.CENTER, 10)
+        
+        self.txt_api_key = wx.TextCtrl(panel, value=current_api_key)
+        vbox.Add(self.txt_api_key, 0, wx.EXPAND | wx.ALL, 10)
+        
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        btn_guardar = wx.Button(panel, label="Guardar")
+        btn_cancelar = wx.Button(panel, label="Cancelar")
+        hbox.Add(btn_guardar, 0, wx.ALL, 5)
+        hbox.Add(btn_cancelar, 0, wx.ALL, 5)
+        vbox.Add(hbox, 0, wx.ALIGN_CENTER)
+        
+        panel.SetSizer(vbox)
+        
+        btn_guardar.Bind(wx.EVT_BUTTON, self.on_guardar)
+        btn_cancelar.Bind(wx.EVT_BUTTON, self.on_cancelar)
+        
+    def on_guardar(self, event):
+        wx.MessageBox("API Key guardada correctamente", "Confirmación", wx.OK | wx.ICON_INFORMATION)
+        self.EndModal(wx.ID_OK)
+        
+    def on_cancelar(self, event):
+        self.EndModal(wx.ID_CANCEL)
+        
+    def GetAPIKey(self):
+        return self.txt_api_key.GetValue()
+
+# ---------------- Diálogo de límites de la API ----------------
+class APILimitsDialog(wx.Dialog):
+    """
+    Diálogo para configurar cuántas descripciones se piden a la vez, cuántas imágenes van en cada petición
+    y los límites por minuto de la API.
+    """
+    def __init__(self, parent, concurrency, requests_per_minute, tokens_per_minute, batch_size):
+        super(APILimitsDialog, self).__init__(parent, title="Límites de la API", size=(450,320))
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        self.spin_concurrency = create_spin(panel, vbox, "Peticiones simultáneas:", concurrency, 1, 32)
+        self.spin_rpm = create_spin(panel, vbox, "Peticiones por minuto (0 = sin límite):",
+                                    requests_per_minute, 0, 10000)
+        self.spin_tpm = create_spin(panel, vbox, "Tokens por minuto (0 = sin límite):",
+                                    tokens_per_minute, 0, 10000000)
+        self.spin_batch = create_spin(panel, vbox, "Imágenes por petición (1 = una a una):",
+                                      batch_size, 1, LOTE_MAX_IMAGENES)
+
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        btn_guardar = wx.Button(panel, label="Guardar")
+        btn_cancelar = wx.Button(panel, label="Cancelar")
+        hbox.Add(btn_guardar, 0, wx.ALL, 5)
+        hbox.Add(btn_cancelar, 0, wx.ALL, 5)
+        vbox.Add(hbox, 0, wx.ALIGN_CENTER)
+
+        panel.SetSizer(vbox)
+
+        btn_guardar.Bind(wx.EVT_BUTTON, self.on_guardar)
+        btn_cancelar.Bind(wx.EVT_BUTTON, self.on_cancelar)
+
+    def on_guardar(self, event):
+        self.EndModal(wx.ID_OK)
+
+    def on_cancelar(self, event):
+        self.EndModal(wx.ID_CANCEL)
+
+    def GetValues(self):
+        return (self.spin_concurrency.GetValue(), self.spin_rpm.GetValue(), self.spin_tpm.GetValue(),
+                self.spin_batch.GetValue())
+
+# ---------------- Diálogo de la caché de direcciones ----------------
+class GeocodeSettingsDialog(wx.Dialog):
+    """
+    Diálogo para configurar la precisión de la rejilla y el radio dentro del cual
+    se reutiliza una dirección ya obtenida.
+    """
+    def __init__(self, parent, precision, radius_m):
+        super(GeocodeSettingsDialog, self).__init__(parent, title="Caché de direcciones", size=(450,220))
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        self.spin_precision = create_spin(panel, vbox, "Decimales de la rejilla (3 = unos 100 metros):",
+                                          precision, 1, 6)
+        self.spin_radius = create_spin(panel, vbox, "Radio para reutilizar una dirección (metros):",
+                                       radius_m, 0, 5000)
+
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        btn_guardar = wx.Button(panel, label="Guardar")
+        btn_cancelar = wx.Button(panel, label="Cancelar")
+        hbox.Add(btn_guardar, 0, wx.ALL, 5)
+        hbox.Add(btn_cancelar, 0, wx.ALL, 5)
+        vbox.Add(hbox, 0, wx.ALIGN_CENTER)
+
+        panel.SetSizer(vbox)
+
+        btn_guardar.Bind(wx.EVT_BUTTON, self.on_guardar)
+        btn_cancelar.Bind(wx.EVT_BUTTON, self.on_cancelar)
+
+    def on_guardar(self, event):
+        self.EndModal(wx.ID_OK)
+
+    def on_cancelar(self, event):
+        self.EndModal(wx.ID_CANCEL)
+
+    def GetValues(self):
+        return self.spin_precision.GetValue(), self.spin_radius.GetValue()
+
+# ---------------- Diálogo de búsqueda ----------------
+class SearchDialog(wx.Dialog):
+    """
+    Criterios para filtrar el listado: texto, intervalo de fechas y cercanía a unas coordenadas.
+    Los campos vacíos no se tienen en cuenta y "Mostrar todas" quita el filtro (devuelve wx.ID_CLEAR).
+    """
+    def __init__(self, parent, criteria=None, gps=None):
+        super(SearchDialog, self).__init__(parent, title="Buscar imágenes", size=(450,380))
+        criteria = criteria or {}
+        self.criteria = None
+        # Si no hay búsqueda por cercanía, se proponen las coordenadas de la imagen seleccionada
+        lat, lon, radius_m = criteria.get("near") or ((gps[0], gps[1], None) if gps else (None, None, None))
+        panel = wx.Panel(self)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+
+        self.txt_text = create_field(panel, sizer, "Texto en la descripción o la dirección:",
+                                     criteria.get("text", ""))
+        self.txt_from = create_field(panel, sizer, "Desde la fecha (DD/MM/AAAA):", criteria.get("date_from", ""))
+        self.txt_to = create_field(panel, sizer, "Hasta la fecha (DD/MM/AAAA):", criteria.get("date_to", ""))
+        self.txt_lat = create_field(panel, sizer, "Cerca de la latitud:", "" if lat is None else str(lat))
+        self.txt_lon = create_field(panel, sizer, "Cerca de la longitud:", "" if lon is None else str(lon))
+        self.txt_radius = create_field(panel, sizer, "Radio en kilómetros:",
+                                       "" if radius_m is None else f"{radius_m / 1000:g}")
+
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        btn_buscar = wx.Button(panel, label="Buscar")
+        btn_todas = wx.Button(panel, label="Mostrar todas")
+        btn_cancelar = wx.Button(panel, label="Cancelar")
+        hbox.Add(btn_buscar, 0, wx.ALL, 5)
+        hbox.Add(btn_todas, 0, wx.ALL, 5)
+        hbox.Add(btn_cancelar, 0, wx.ALL, 5)
+        sizer.Add(hbox, 0, wx.ALIGN_CENTER)
+
+        panel.SetSizer(sizer)
+        btn_buscar.SetDefault()
+        btn_buscar.Bind(wx.EVT_BUTTON, self.on_buscar)
+        btn_todas.Bind(wx.EVT_BUTTON, self.on_todas)
+        btn_cancelar.Bind(wx.EVT_BUTTON, self.on_cancelar)
+
+    def read_criteria(self):
+        """Devuelve los criterios con los nombres de SearchIndex.search; lanza ValueError si hay datos no válidos."""
+        criteria = {"text": self.txt_text.GetValue().strip()}
+        for key, ctrl in (("date_from", self.txt_from), ("date_to", self.txt_to)):
+            value = ctrl.GetValue().strip()
+            if value:
+                if fecha_a_iso(value) is None:
+                    raise ValueError("La fecha debe tener el formato DD/MM/AAAA: " + value)
+                criteria[key] = value
+        radius = self.txt_radius.GetValue().strip()
+        if radius:
+            try:
+                lat = float(self.txt_lat.GetValue().strip().replace(',', '.'))
+                lon = float(self.txt_lon.GetValue().strip().replace(',', '.'))
+                radius_km = float(radius.replace(',', '.'))
+            except ValueError:
+                raise ValueError("Para buscar por cercanía indique la latitud, la longitud y el radio con números.")
+            criteria["near"] = (lat, lon, radius_km * 1000)
+        return criteria
+
+    def on_buscar(self, event):
+        try:
+            self.criteria = self.read_criteria()
+        except ValueError as e:
+            wx.MessageBox(str(e), "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.EndModal(wx.ID_OK)
+
+    def on_todas(self, event):
+        self.EndModal(wx.ID_CLEAR)
+
+    def on_cancelar(self, event):
+        self.EndModal(wx.ID_CANCEL)
+
+# ---------------- Ventana de Ayuda (con casilla de verificación) ----------------
+class HelpDialog(wx.Dialog):
+    def __init__(self, parent):
+        super(HelpDialog, self).__init__(parent, title="Ayuda", size=(500,450))
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+        help_text = (
+            "Bienvenido a FotoDesc.\n\n"
+            "Esta aplicación permite administrar imágenes y editar sus metadatos.\n\n"
+            "Pantalla de inicio:\n"
+            "  • Añadir imagen (Alt+I): Selecciona una imagen individual.\n"
+            "  • Añadir carpeta (Alt+C): Selecciona una carpeta con imágenes.\n"
+            "  • Configuración (Alt+F): Accede al menú de configuración.\n\n"
+            "Pantalla de listado:\n"
+            "  • Atrás (Alt+A): Vuelve a la pantalla de inicio.\n"
+            "  • Editar (Alt+E): Abre la ventana para editar la imagen seleccionada.\n"
+            "    Si hay varias imágenes seleccionadas, se editan en bloque: descripción a partir de una plantilla\n"
+            "    (con el nombre, la fecha o un número), fecha fija o desplazada y coordenadas.\n"
+            "  • Obtener dirección (Alt+D): Obtiene la dirección basada en la geolocalización.\n"
+            "  • Obtener descripción (Alt+O): Obtiene la descripción automática mediante la API.\n"
+            "    Si hay varias imágenes seleccionadas, se describen todas en segundo plano.\n"
+            "  • Obtener descripción de todas (Alt+T): Describe todas las imágenes del listado.\n"
+            "    En Configuración > Límites de la API se puede indicar cuántas imágenes van en cada petición.\n"
+            "    Con una imagen por petición, la descripción se muestra junto a la vista previa mientras se genera.\n"
+            "  • Volver a obtener descripción (Alt+R): Pide una descripción nueva a la API aunque ya exista una guardada.\n"
+            "  • Obtener direcciones de todas (Alt+G): Obtiene en segundo plano la dirección de todas las imágenes\n"
+            "    con geolocalización, consultando una sola vez cada lugar.\n"
+            "  • Buscar (Alt+B): Muestra solo las imágenes cuya descripción o dirección contiene un texto,\n"
+            "    tomadas entre dos fechas o cerca de unas coordenadas. \"Mostrar todas\" quita el filtro.\n"
+            "    Las acciones sobre todas las imágenes se aplican a las que se están mostrando.\n"
+            "  • Al pulsar Enter sobre una imagen se despliega un menú contextual con estas opciones.\n"
+            "  • Escape: Cancela la búsqueda de imágenes, las descripciones, las direcciones o la edición en bloque en curso.\n\n"
+            "Cuando se añade una carpeta y ya hay imágenes cargadas, se le preguntará:\n"
+            "  ¿Desea añadir las nuevas imágenes a la lista actual o reemplazarla?\n"
+            "Las imágenes aparecen en el listado a medida que se encuentran; el progreso se muestra en la barra de estado.\n"
+            "Desde Configuración puede activar la búsqueda en subcarpetas.\n"
+            "Las carpetas cargadas se vigilan: las fotos nuevas, modificadas, renombradas o borradas\n"
+            "desde otros programas se actualizan solas en el listado (se puede desactivar en Configuración).\n"
+            "En Configuración > Direcciones sin conexión puede cargar un nomenclátor de GeoNames\n"
+            "para obtener direcciones sin acceso a Internet.\n"
+            "Con Configuración > Exportar listado se guardan los datos de las imágenes mostradas en CSV,\n"
+            "JSON Lines o GeoJSON; Importar descripciones guarda en las fotos las descripciones de un archivo así.\n"
+            "Configuración > Geoetiquetar pone coordenadas a las fotos sin GPS (o a las seleccionadas) según la hora\n"
+            "en que se tomaron y un track GPX o KML; indique la zona horaria y el desfase del reloj de la cámara.\n"
+            "Configuración > Diagnóstico de rendimiento muestra cuánto tardan la lectura de metadatos, las vistas\n"
+            "previas, la escritura y las peticiones a la API, y permite guardarlo en JSON para adjuntarlo a un aviso.\n"
+            "\nGracias por usar FotoDesc."
+        )
+        self.help_ctrl = wx.TextCtrl(panel, value=help_text, style=wx.TE_MULTILINE | wx.TE_READONLY)
+        vbox.Add(self.help_ctrl, 1, wx.EXPAND | wx.ALL, 10)
+        
+        self.chk_show = wx.CheckBox(panel, label="Mostrar esta ayuda al iniciar")
+        self.chk_show.SetValue(True)
+        vbox.Add(self.chk_show, 0, wx.ALL, 10)
+        
+        btn = wx.Button(panel, label="Aceptar")
+        vbox.Add(btn, 0, wx.ALIGN_CENTER | wx.ALL, 10)
+        panel.SetSizer(vbox)
+        btn.Bind(wx.EVT_BUTTON, self.on_ok)
+        self.Centre()
+    
+    def on_ok(self, event):
+        config = wx.Config("FotodescApp")
+        config.WriteBool("ShowHelpOnStartup", self.chk_show.GetValue())
+        self.EndModal(wx.ID_OK)
+
+# ---------------- Diálogo de diagnóstico de rendimiento ----------------
+def formato_bytes(cantidad):
+    for unidad in ("B", "KiB", "MiB"):
+        if cantidad < 1024:
+            return f"{cantidad:.0f} {unidad}"
+        cantidad /= 1024
+    return f"{cantidad:.1f} GiB"
+
+# Hilos que entran en el perfil de CPU (ver Instrumentacion.iniciar_perfil)
+ALCANCE_PERFIL = ("El perfil incluye el hilo principal, los hilos creados durante la captura y los hilos de fondo "
+                  "(vistas previas, metadatos y vigilancia de carpetas) a partir de su siguiente tarea; "
+                  "lo que otros hilos ya tenían en curso al empezar no se mide."
+                  if PERFIL_POR_HILO else "El perfil incluye todos los hilos de la aplicación.")
+
+class DiagnosticsDialog(wx.Dialog):
+    """
+    Muestra las mediciones de rendimiento por operación (llamadas, latencias y bytes transferidos)
+    en una lista que se recorre con el teclado; permite activarlas, ponerlas a cero y guardarlas en JSON.
+    """
+    COLUMNS = [("Operación", 200), ("Llamadas", 80), ("Errores", 70), ("Media (ms)", 90), ("p50 (ms)", 80),
+               ("p95 (ms)", 80), ("Máximo (ms)", 90), ("Enviado", 90), ("Recibido", 90)]
+
+    def __init__(self, parent):
+        super(DiagnosticsDialog, self).__init__(parent, title="Diagnóstico de rendimiento", size=(900,450))
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        self.chk_activa = wx.CheckBox(panel, label="Registrar mediciones de rendimiento")
+        self.chk_activa.SetValue(instrumentacion.activa)
+        vbox.Add(self.chk_activa, 0, wx.ALL, 10)
+
+        self.list_ctrl = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.BORDER_SUNKEN)
+        self.list_ctrl.SetName("Mediciones por operación")
+        for column, (label, width) in enumerate(self.COLUMNS):
+            self.list_ctrl.InsertColumn(column, label, width=width)
+        vbox.Add(self.list_ctrl, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 10)
+
+        self.label_estado = wx.StaticText(panel, label="")
+        vbox.Add(self.label_estado, 0, wx.ALL, 10)
+
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+        btn_actualizar = wx.Button(panel, label="Actualizar")
+        btn_reiniciar = wx.Button(panel, label="Poner a cero")
+        btn_guardar = wx.Button(panel, label="Guardar JSON...")
+        btn_cerrar = wx.Button(panel, wx.ID_CANCEL, label="Cerrar")
+        for btn in (btn_actualizar, btn_reiniciar, btn_guardar, btn_cerrar):
+            hbox.Add(btn, 0, wx.ALL, 5)
+        vbox.Add(hbox, 0, wx.ALIGN_CENTER)
+
+        panel.SetSizer(vbox)
+
+        self.chk_activa.Bind(wx.EVT_CHECKBOX, self.on_activar)
+        btn_actualizar.Bind(wx.EVT_BUTTON, lambda event: self.cargar())
+        btn_reiniciar.Bind(wx.EVT_BUTTON, self.on_reiniciar)
+        btn_guardar.Bind(wx.EVT_BUTTON, self.on_guardar)
+        self.cargar()
+        self.Centre()
+
+    def cargar(self):
+        self.list_ctrl.DeleteAllItems()
+        resumen = instrumentacion.resumen()
+        for nombre, datos in resumen.items():
+            fila = [nombre, str(datos["count"]), str(datos["errors"])]
+            fila += [f"{datos[k]:.1f}" if k in datos else "" for k in ("mean_ms", "p50_ms", "p95_ms", "max_ms")]
+            fila += [formato_bytes(datos["bytes_sent"]), formato_bytes(datos["bytes_received"])]
+            index = self.list_ctrl.InsertItem(self.list_ctrl.GetItemCount(), fila[0])
+            for column, texto in enumerate(fila[1:], 1):
+                self.list_ctrl.SetItem(index, column, texto)
+        if not instrumentacion.activa:
+            estado = "Las mediciones están desactivadas."
+        else:
+            desde = datetime.datetime.fromtimestamp(instrumentacion.desde).strftime("%H:%M:%S")
+            estado = f"Operaciones medidas desde las {desde}: {len(resumen)}."
+        if instrumentacion.perfilando():
+            estado += " Se está capturando un perfil de CPU y memoria. " + ALCANCE_PERFIL
+        self.label_estado.SetLabel(estado)
+        if self.list_ctrl.GetItemCount() > 0:
+            self.list_ctrl.SetItemState(0, wx.LIST_STATE_FOCUSED, wx.LIST_STATE_FOCUSED)
+
+    def on_activar(self, event):
+        instrumentacion.activar(self.chk_activa.GetValue())
+        wx.Config("FotodescApp").WriteBool("Diagnostics", self.chk_activa.GetValue())
+        self.cargar()
+
+    def on_reiniciar(self, event):
+        instrumentacion.reiniciar()
+        self.cargar()
+
+    def on_guardar(self, event):
+        dlg = wx.FileDialog(self, "Guardar diagnóstico", defaultFile="diagnostico.json",
+                            wildcard="JSON (*.json)|*.json", style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+        if dlg.ShowModal() == wx.ID_OK:
+            try:
+                instrumentacion.volcar(dlg.GetPath())
+            except OSError as e:
+                wx.MessageBox("Error al guardar el diagnóstico: " + str(e), "Error", wx.OK | wx.ICON_ERROR)
+        dlg.Destroy()
+
+# ---------------- Ventana de Edición ----------------
+class EditDialog(wx.Dialog):
+    def __init__(self, parent, file_path):
+        super(EditDialog, self).__init__(parent, title="Editar Imagen", size=(500,600))
+        self.parent = parent
+        self.file_path = file_path
+        panel = wx.Panel(self)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        
+        # Vista previa (no enfocada para el lector)
+        self.preview_bitmap = wx.StaticBitmap(panel, wx.ID_ANY, wx.NullBitmap)
+        sizer.Add(self.preview_bitmap, 0, wx.ALL | wx.CENTER, 10)
+        self.update_preview()
+        
+        # Obtener metadatos
+        desc, gps, fecha, hora = get_metadata(file_path)
+        direccion = parent.addresses.get_for(file_path, gps)
+        nombre = os.path.basename(file_path)
+        latitud = str(gps[0]) if gps else ""
+        longitud = str(gps[1]) if gps else ""
+        
+        self.txt_nombre = create_field(panel, sizer, "Nombre:", nombre)
+        self.txt_fecha = create_field(panel, sizer, "Fecha (DD/MM/AAAA):", fecha)
+        self.txt_hora = create_field(panel, sizer, "Hora (HH:MM:SS):", hora)
+        self.txt_desc = create_field(panel, sizer, "Descripción:", desc, style=wx.TE_MULTILINE)
+        self.txt_lat = create_field(panel, sizer, "Latitud:", latitud)
+        self.txt_lon = create_field(panel, sizer, "Longitud:", longitud)
+        self.txt_dir = create_field(panel, sizer, "Dirección:", direccion)
+        
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        btn_guardar = wx.Button(panel, label="Guardar")
+        btn_cancelar = wx.Button(panel, label="Cancelar")
+        btn_sizer.Add(btn_guardar, 0, wx.ALL, 5)
+        btn_sizer.Add(btn_cancelar, 0, wx.ALL, 5)
+        sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER)
+        
+        panel.SetSizer(sizer)
+        btn_guardar.Bind(wx.EVT_BUTTON, self.on_guardar)
+        btn_cancelar.Bind(wx.EVT_BUTTON, self.on_cancelar)
+        
+    def update_preview(self):
+        try:
+            # La miniatura sale de la caché de disco o se genera con decodificación reducida
+            width, height, data = self.parent.thumbnail_loader.cache.get(self.file_path, 200)
+            bmp = wx.Bitmap.FromBuffer(width, height, data)
+            self.preview_bitmap.SetBitmap(bmp)
+        except Exception as e:
+            wx.MessageBox("Error al cargar la vista previa: " + str(e), "Error", wx.OK | wx.ICON_ERROR)
+        
+    def on_guardar(self, event):
+        new_nombre = self.txt_nombre.GetValue().strip()
+        new_fecha = self.txt_fecha.GetValue().strip()
+        new_hora = self.txt_hora.GetValue().strip()
+        new_desc = self.txt_desc.GetValue().strip()
+        new_lat = self.txt_lat.GetValue().strip()
+        new_lon = self.txt_lon.GetValue().strip()
+        new_dir = self.txt_dir.GetValue().strip()
+        
+        try:
+            directorio = os.path.dirname(self.file_path)
+            nombre_actual = os.path.basename(self.file_path)
+            new_path = self.file_path
+            if new_nombre and new_nombre != nombre_actual:
+                new_path = os.path.join(directorio, new_nombre)
+                os.rename(self.file_path, new_path)
+                metadata_cache.invalidate(self.file_path)
+                self.parent.model.replace_path(self.file_path, new_path)
+                self.parent.addresses.rename(self.file_path, new_path)
+                self.parent.search_index.rename(self.file_path, new_path)
+                self.file_path = new_path
+            exif_dict = load_exif_dict(self.file_path)
+            exif_dict["0th"][piexif.ImageIFD.ImageDescription] = new_desc.encode("utf-8")
+            if new_fecha and new_hora:
+                parts = new_fecha.split("/")
+                if len(parts) == 3:
+                    dt_str = f"{parts[2]}:{parts[1]}:{parts[0]} {new_hora}"
+                    exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal] = dt_str.encode("utf-8")
+            if new_lat and new_lon:
+                try:
+                    establecer_gps(exif_dict, float(new_lat.replace(',', '.')), float(new_lon.replace(',', '.')))
+                except:
+                    pass
+            write_exif(self.file_path, exif_dict)
+            metadata_cache.invalidate(self.file_path)
+            self.parent.addresses[self.file_path] = new_dir
+            wx.MessageBox("Datos de la foto editados correctamente", "Confirmación", wx.OK | wx.ICON_INFORMATION)
+            self.EndModal(wx.ID_OK)
+        except Exception as e:
+            wx.MessageBox("Error al guardar los cambios: " + str(e), "Error", wx.OK | wx.ICON_ERROR)
+        
+    def on_cancelar(self, event):
+        self.EndModal(wx.ID_CANCEL)
+
+class BulkEditDialog(wx.Dialog):
+    """
+    Edición en bloque de varias imágenes: descripción a partir de una plantilla, fecha fija o desplazada
+    y coordenadas. Solo se aplican los grupos marcados; el resultado queda en self.changes.
+    """
+    def __init__(self, parent, count):
+        super(BulkEditDialog, self).__init__(parent, title=f"Editar {count} imágenes", size=(520, 560))
+        self.changes = None
+        panel = wx.Panel(self)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+
+        self.chk_desc = wx.CheckBox(panel, label="Cambiar la descripción")
+        sizer.Add(self.chk_desc, 0, wx.ALL, 5)
+        self.txt_desc = create_field(panel, sizer, "Plantilla de descripción:", "{descripcion}",
+                                     style=wx.TE_MULTILINE)
+        ayuda = wx.StaticText(panel, label="Campos: {nombre}, {archivo}, {carpeta}, {fecha}, {hora}, "
+                                           "{descripcion} (la actual) y {n} (número; {n:03d} con ceros).")
+        sizer.Add(ayuda, 0, wx.ALL, 5)
+
+        self.choice_fecha = wx.RadioBox(panel, label="Fecha y hora",
+                                        choices=["No cambiar", "Fijar", "Desplazar"], style=wx.RA_SPECIFY_COLS)
+        sizer.Add(self.choice_fecha, 0, wx.ALL | wx.EXPAND, 5)
+        self.txt_fecha = create_field(panel, sizer, "Fecha (DD/MM/AAAA):", "")
+        self.txt_hora = create_field(panel, sizer, "Hora (HH:MM:SS):", "")
+        self.txt_shift = create_field(panel, sizer, "Desplazamiento (+H:MM, -H:MM:SS o +D H:MM:SS):", "")
+
+        self.chk_gps = wx.CheckBox(panel, label="Cambiar las coordenadas")
+        sizer.Add(self.chk_gps, 0, wx.ALL, 5)
+        self.txt_lat = create_field(panel, sizer, "Latitud:", "")
+        self.txt_lon = create_field(panel, sizer, "Longitud:", "")
+
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        btn_guardar = wx.Button(panel, label="Guardar")
+        btn_cancelar = wx.Button(panel, label="Cancelar")
+        btn_sizer.Add(btn_guardar, 0, wx.ALL, 5)
+        btn_sizer.Add(btn_cancelar, 0, wx.ALL, 5)
+        sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER)
+
+        panel.SetSizer(sizer)
+        btn_guardar.Bind(wx.EVT_BUTTON, self.on_guardar)
+        btn_cancelar.Bind(wx.EVT_BUTTON, self.on_cancelar)
+
+    def read_changes(self):
+        """Devuelve los argumentos de BulkEditor según los campos; lanza ValueError si alguno no es válido."""
+        changes = {}
+        if self.chk_desc.GetValue():
+            plantilla = self.txt_desc.GetValue().strip()
+            # Se prueba la plantilla con valores ficticios antes de tocar ningún archivo
+            aplicar_plantilla(plantilla, "imagen.jpg", ("", None, "", ""))
+            changes["description"] = plantilla
+        modo = self.choice_fecha.GetSelection()
+        if modo == 1:
+            if fecha_a_iso(self.txt_fecha.GetValue().strip()) is None:
+                raise ValueError("Fecha no válida: " + self.txt_fecha.GetValue().strip())
+            texto = self.txt_fecha.GetValue().strip() + " " + (self.txt_hora.GetValue().strip() or "00:00:00")
+            try:
+                changes["date_time"] = datetime.datetime.strptime(texto, "%d/%m/%Y %H:%M:%S")
+            except ValueError:
+                raise ValueError("Hora no válida: " + self.txt_hora.GetValue().strip())
+        elif modo == 2:
+            changes["shift"] = parse_desplazamiento(self.txt_shift.GetValue())
+        if self.chk_gps.GetValue():
+            try:
+                lat = float(self.txt_lat.GetValue().strip().replace(',', '.'))
+                lon = float(self.txt_lon.GetValue().strip().replace(',', '.'))
+            except ValueError:
+                raise ValueError("Las coordenadas deben ser números.")
+            if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+                raise ValueError("Coordenadas fuera de rango.")
+            changes["gps"] = (lat, lon)
+        return changes
+
+    def on_guardar(self, event):
+        try:
+            changes = self.read_changes()
+        except ValueError as e:
+            wx.MessageBox(str(e), "Error", wx.OK | wx.ICON_ERROR)
+            return
+        if not changes:
+            wx.MessageBox("Marca al menos un cambio para aplicar.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.changes = changes
+        self.EndModal(wx.ID_OK)
+
+    def on_cancelar(self, event):
+        self.EndModal(wx.ID_CANCEL)
+
+class GeotagDialog(wx.Dialog):
+    """
+    Geoetiquetado con tracks GPX/KML: archivos del track, zona horaria y desfase del reloj de la cámara.
+    La zona y el desfase se recuerdan para la próxima vez; el resultado queda en self.options.
+    """
+    def __init__(self, parent, count):
+        super(GeotagDialog, self).__init__(parent, title=f"Geoetiquetar {count} imágenes", size=(520, 330))
+        self.options = None
+        config = wx.Config("FotodescApp")
+        panel = wx.Panel(self)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+
+        self.txt_tracks = create_field(panel, sizer, "Tracks GPX o KML (separados por ;):", "")
+        btn_examinar = wx.Button(panel, label="Examinar...")
+        sizer.Add(btn_examinar, 0, wx.ALL, 5)
+        self.txt_zona = create_field(panel, sizer, "Zona horaria de la cámara (+H:MM; vacío: la de este equipo):",
+                                     config.Read("GeotagZone", ""))
+        self.txt_desfase = create_field(panel, sizer, "Desfase del reloj de la cámara (+H:MM:SS):",
+                                        config.Read("GeotagOffset", ""))
+        self.chk_sobrescribir = wx.CheckBox(panel, label="Cambiar también las imágenes que ya tienen coordenadas")
+        sizer.Add(self.chk_sobrescribir, 0, wx.ALL, 5)
+
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        btn_guardar = wx.Button(panel, label="Buscar posiciones")
+        btn_cancelar = wx.Button(panel, label="Cancelar")
+        btn_sizer.Add(btn_guardar, 0, wx.ALL, 5)
+        btn_sizer.Add(btn_cancelar, 0, wx.ALL, 5)
+        sizer.Add(btn_sizer, 0, wx.ALIGN_CENTER)
+
+        panel.SetSizer(sizer)
+        btn_examinar.Bind(wx.EVT_BUTTON, self.on_examinar)
+        btn_guardar.Bind(wx.EVT_BUTTON, self.on_guardar)
+        btn_cancelar.Bind(wx.EVT_BUTTON, self.on_cancelar)
+
+    def on_examinar(self, event):
+        dlg = wx.FileDialog(self, "Selecciona los tracks",
+                            wildcard="Tracks GPX o KML (*.gpx;*.kml)|*.gpx;*.kml",
+                            style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST | wx.FD_MULTIPLE)
+        if dlg.ShowModal() == wx.ID_OK:
+            self.txt_tracks.SetValue(";".join(dlg.GetPaths()))
+        dlg.Destroy()
+        self.txt_tracks.SetFocus()
+
+    def on_guardar(self, event):
+        tracks = [t.strip() for t in self.txt_tracks.GetValue().split(";") if t.strip()]
+        zona = self.txt_zona.GetValue().strip()
+        desfase = self.txt_desfase.GetValue().strip()
+        if not tracks:
+            wx.MessageBox("Selecciona al menos un track GPX o KML.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        try:
+            self.options = {
+                "tracks": tracks,
+                "zona": parse_desplazamiento(zona) if zona else None,
+                "desfase": parse_desplazamiento(desfase) if desfase else None,
+                "sobrescribir": self.chk_sobrescribir.GetValue(),
+            }
+        except ValueError as e:
+            wx.MessageBox(str(e), "Error", wx.OK | wx.ICON_ERROR)
+            return
+        config = wx.Config("FotodescApp")
+        config.Write("GeotagZone", zona)
+        config.Write("GeotagOffset", desfase)
+        self.EndModal(wx.ID_OK)
+
+    def on_cancelar(self, event):
+        self.EndModal(wx.ID_CANCEL)
+
+# ---------------- Modelo y listado virtual de imágenes ----------------
+class ImageRecord:
+    """
+    Una imagen del listado. Con __slots__ cada registro ocupa unas decenas de bytes además de la ruta;
+    los metadatos son la misma tupla que guarda la caché de metadatos, no una copia.
+    """
+    __slots__ = ("path", "metadata", "address", "row")
+
+    def __init__(self, path):
+        self.path = path
+        self.metadata = None   # Tupla de get_metadata, leída la primera vez que se muestra la fila
+        self.address = None    # Dirección mostrada (la propia o la de la caché de geocodificación)
+        self.row = -1          # Fila en el listado, o -1 si la búsqueda la oculta
+
+class ImageListModel:
+    """
+    Modelo del listado: un ImageRecord por imagen, con índices por ruta (by_path) y por fila (rows),
+    de modo que seleccionar, renombrar o actualizar una imagen no recorre la lista.
+    Los metadatos solo se leen cuando el control pide una fila visible.
+    Con set_filter() las filas pasan a ser solo las imágenes que cumplen una búsqueda.
+    """
+    def __init__(self, addresses):
+        self.records = []      # Todas las imágenes, en el orden en que se añadieron
+        self.rows = self.records  # Filas del listado: todas las imágenes o solo las filtradas
+        self.by_path = {}      # ruta -> ImageRecord
+        self.filter = None     # Conjunto de rutas visibles, o None si no hay filtro
+        self.addresses = addresses
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, file_path):
+        return file_path in self.by_path
+
+    def total(self):
+        """Número de imágenes cargadas, incluidas las que oculta la búsqueda."""
+        return len(self.records)
+
+    @property
+    def paths(self):
+        """Rutas de las filas del listado, en orden (la lista se construye en cada llamada)."""
+        return [record.path for record in self.rows]
+
+    def path_at(self, row):
+        return self.rows[row].path
+
+    def add_paths(self, file_paths):
+        """Añade varias rutas de una vez. Devuelve cuántas eran nuevas."""
+        added = 0
+        for file_path in file_paths:
+            if file_path not in self.by_path:
+                record = ImageRecord(file_path)
+                self.by_path[file_path] = record
+                self.records.append(record)
+                if self.rows is self.records:
+                    record.row = len(self.records) - 1
+                elif file_path in self.filter:
+                    record.row = len(self.rows)
+                    self.rows.append(record)
+                added += 1
+        return added
+
+    def remove_paths(self, file_paths):
+        """Quita varias rutas del listado y renumera las filas en una sola pasada. Devuelve cuántas se quitaron."""
+        removed = {p for p in file_paths if self.by_path.pop(p, None) is not None}
+        if removed:
+            self.records = [record for record in self.records if record.path not in removed]
+            if self.filter is None:
+                self.rows = self.records
+            else:
+                self.filter -= removed
+                self.rows = [record for record in self.rows if record.path not in removed]
+            for row, record in enumerate(self.rows):
+                record.row = row
+        return len(removed)
+
+    def clear(self):
+        self.records = []
+        self.rows = self.records
+        self.by_path = {}
+        self.filter = None
+
+    def set_filter(self, visible):
+        """Deja como filas solo las rutas del conjunto visible, en su orden; con None se muestran todas."""
+        self.filter = visible
+        if visible is None:
+            self.rows = self.records
+        else:
+            for record in self.records:
+                record.row = -1
+            self.rows = [record for record in self.records if record.path in visible]
+        for row, record in enumerate(self.rows):
+            record.row = row
+
+    def get_columns(self, row):
+        record = self.rows[row]
+        if record.metadata is None:
+            with instrumentacion.medir("lista.fila"):
+                record.metadata = get_metadata(record.path)
+                record.address = self.addresses.get_for(record.path, record.metadata[1])
+        desc, gps, fecha, hora = record.metadata
+        localizacion = f"{gps[0]:.6f}, {gps[1]:.6f}" if gps else ""
+        return (os.path.basename(record.path), desc, localizacion, record.address, fecha, hora)
+
+    def refresh_path(self, file_path):
+        """Descarta los datos guardados de una ruta para volver a leerlos. Devuelve su fila o -1."""
+        record = self.by_path.get(file_path)
+        if record is None:
+            return -1
+        record.metadata = None
+        record.address = None
+        return record.row
+
+    def refresh_all(self):
+        for record in self.records:
+            record.metadata = None
+            record.address = None
+
+    def replace_path(self, old_path, new_path):
+        """Sustituye una ruta por otra (por ejemplo, tras renombrar). Devuelve la fila o -1."""
+        if new_path in self.by_path or old_path not in self.by_path:
+            return self.refresh_path(new_path)
+        record = self.by_path.pop(old_path)
+        record.path = new_path
+        record.metadata = None
+        record.address = None
+        self.by_path[new_path] = record
+        if self.filter is not None:
+            self.filter.discard(old_path)
+            self.filter.add(new_path)
+        return record.row
+
+class ImageListCtrl(wx.ListCtrl):
+    """ListCtrl virtual: no guarda filas propias, pide el texto de cada celda al modelo."""
+    def __init__(self, parent, model):
+        super(ImageListCtrl, self).__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.BORDER_SUNKEN)
+        self.model = model
+
+    def OnGetItemText(self, item, column):
+        try:
+            return self.model.get_columns(item)[column]
+        except IndexError:
+            return ""
+
+# ---------------- Ventana Principal ----------------
+class MainFrame(wx.Frame):
+    PREVIEW_SIZE = 300  # Lado máximo de la vista previa, en píxeles
+
+    def __init__(self, parent):
+        # Asignamos IDs para los aceleradores
+        self.id_add_image = wx.NewIdRef()
+        self.id_add_folder = wx.NewIdRef()
+        self.id_config = wx.NewIdRef()
+        self.id_about = wx.NewIdRef()  # Acerca de en el menú
+        self.id_edit = wx.NewIdRef()
+        self.id_address = wx.NewIdRef()
+        self.id_auto_desc = wx.NewIdRef()
+        self.id_back = wx.NewIdRef()  # Atrás
+        self.id_auto_desc_all = wx.NewIdRef()
+        self.id_auto_desc_refresh = wx.NewIdRef()
+        self.id_address_all = wx.NewIdRef()
+        self.id_cancel = wx.NewIdRef()  # Cancelar búsqueda o descripciones
+        self.id_search = wx.NewIdRef()  # Buscar y filtrar el listado
+        super(MainFrame, self).__init__(parent, title="FotoDesc", size=(1000,700))
+        self.addresses = ImageAddresses()  # Dirección de cada imagen (persistente)
+        config = wx.Config("FotodescApp")
+        instrumentacion.activar(config.ReadBool("Diagnostics", False))
+        geocode_cache.set_precision(config.ReadInt("GeocodePrecision", 3), config.ReadInt("GeocodeRadius", 50))
+        self.offline_index_path = os.path.join(get_config_dir(), "geonames.idx")
+        try:
+            reverse_geocoder.configure(config.Read("GeocodeProvider", "nominatim"), self.offline_index_path)
+        except (OSError, ValueError):
+            reverse_geocoder.configure("nominatim")
+        self.model = ImageListModel(self.addresses)  # Rutas de imágenes y filas del listado
+        self.search_index = SearchIndex()  # Descripciones, direcciones, fechas y coordenadas para buscar
+        self.search = None     # Criterios de la búsqueda que filtra el listado, o None
+        self.api_key = ""      # Se carga desde wx.Config o se pide al usuario
+        self.scanner = None    # Búsqueda de imágenes en curso
+        self.metadata_loader = None  # Precarga de metadatos en segundo plano
+        self.describer = None  # Descripciones automáticas en curso
+        self.described = 0     # Imágenes ya procesadas por el lote en curso
+        self.geocoder = None   # Direcciones por lotes en curso
+        self.bulk_editor = None  # Edición en bloque en curso
+        self.bitmaps = LRUCache(128)  # (ruta, tamaño) -> wx.Bitmap de las últimas vistas previas
+        self.preview_path = None      # Imagen que debe mostrarse en la vista previa
+        self.stream_path = None       # Imagen cuya descripción se está mostrando mientras llega
+        self.stream_shown = ""        # Texto ya mostrado de esa descripción
+        self.stream_time = 0.0        # Última actualización del campo de la descripción en curso
+        self.thumbnail_loader = ThumbnailLoader(
+            lambda *args: wx.CallAfter(self.on_thumbnail_ready, *args))
+        self.thumbnail_loader.start()
+        # Cambios hechos desde otros programas en las carpetas cargadas
+        self.watcher = FolderWatcher(
+            lambda changed, deleted, moved: wx.CallAfter(self.on_folder_changes, changed, deleted, moved))
+        self.watcher.start()
+        self.InitUI()
+        # Establecemos atajos usando exclusivamente Alt:
+        self.SetAcceleratorTable(wx.AcceleratorTable([
+            (wx.ACCEL_ALT, ord('I'), self.id_add_image),  # Alt+I: Añadir imagen
+            (wx.ACCEL_ALT, ord('C'), self.id_add_folder),   # Alt+C: Añadir carpeta
+            (wx.ACCEL_ALT, ord('F'), self.id_config),       # Alt+F: Configuración
+            (wx.ACCEL_ALT, ord('U'), self.id_about),         # Alt+U: Acerca de
+            (wx.ACCEL_ALT, ord('A'), self.id_back),          # Alt+A: Atrás
+            (wx.ACCEL_ALT, ord('E'), self.id_edit),          # Alt+E: Editar
+            (wx.ACCEL_ALT, ord('D'), self.id_address),       # Alt+D: Obtener dirección
+            (wx.ACCEL_ALT, ord('O'), self.id_auto_desc),     # Alt+O: Obtener descripción
+            (wx.ACCEL_ALT, ord('T'), self.id_auto_desc_all),  # Alt+T: Obtener descripción de todas
+            (wx.ACCEL_ALT, ord('R'), self.id_auto_desc_refresh),  # Alt+R: Volver a obtener descripción
+            (wx.ACCEL_ALT, ord('G'), self.id_address_all),   # Alt+G: Obtener direcciones de todas
+            (wx.ACCEL_ALT, ord('B'), self.id_search),        # Alt+B: Buscar
+            (wx.ACCEL_NORMAL, wx.WXK_ESCAPE, self.id_cancel),  # Escape: Cancelar búsqueda o descripciones
+        ]))
+        # Bind global para los aceleradores
+        self.Bind(wx.EVT_MENU, self.on_add_image, id=self.id_add_image)
+        self.Bind(wx.EVT_MENU, self.on_add_folder, id=self.id_add_folder)
+        self.Bind(wx.EVT_MENU, self.on_config, id=self.id_config)
+        self.Bind(wx.EVT_MENU, self.on_about, id=self.id_about)
+        self.Bind(wx.EVT_MENU, self.on_back, id=self.id_back)
+        self.Bind(wx.EVT_MENU, self.on_edit, id=self.id_edit)
+        self.Bind(wx.EVT_MENU, self.on_address, id=self.id_address)
+        self.Bind(wx.EVT_MENU, self.on_auto_desc, id=self.id_auto_desc)
+        self.Bind(wx.EVT_MENU, self.on_auto_desc_all, id=self.id_auto_desc_all)
+        self.Bind(wx.EVT_MENU, self.on_auto_desc_refresh, id=self.id_auto_desc_refresh)
+        self.Bind(wx.EVT_MENU, self.on_address_all, id=self.id_address_all)
+        self.Bind(wx.EVT_MENU, self.on_cancel, id=self.id_cancel)
+        self.Bind(wx.EVT_MENU, self.on_search, id=self.id_search)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        
+    @property
+    def images(self):
+        """Lista nueva con las rutas de las imágenes del listado, en su orden."""
+        return self.model.paths
+
+    def InitUI(self):
+        self.main_panel = wx.Panel(self)
+        self.sizer = wx.BoxSizer(wx.VERTICAL)
+        
+        # Pantalla de inicio
+        self.start_panel = wx.Panel(self.main_panel)
+        start_sizer = wx.BoxSizer(wx.VERTICAL)
+        btn_add_image = wx.Button(self.start_panel, label="Añadir imagen")
+        btn_add_image.SetToolTip("Atajo: Alt+I")
+        btn_add_folder = wx.Button(self.start_panel, label="Añadir carpeta")
+        btn_add_folder.SetToolTip("Atajo: Alt+C")
+        btn_config = wx.Button(self.start_panel, label="Configuración")
+        btn_config.SetToolTip("Atajo: Alt+F")
+        start_sizer.Add(btn_add_image, 0, wx.ALL | wx.CENTER, 10)
+        start_sizer.Add(btn_add_folder, 0, wx.ALL | wx.CENTER, 10)
+        start_sizer.Add(btn_config, 0, wx.ALL | wx.CENTER, 10)
+        self.start_panel.SetSizer(start_sizer)
+        
+        btn_add_image.Bind(wx.EVT_BUTTON, self.on_add_image)
+        btn_add_folder.Bind(wx.EVT_BUTTON, self.on_add_folder)
+        btn_config.Bind(wx.EVT_BUTTON, self.on_config)
+        
+        # Pantalla de listado de imágenes
+        self.list_panel = wx.Panel(self.main_panel)
+        list_panel_sizer = wx.BoxSizer(wx.VERTICAL)
+        
+        # Botón Atrás
+        btn_back = wx.Button(self.list_panel, label="Atrás")
+        btn_back.SetToolTip("Atajo: Alt+A")
+        btn_back.Bind(wx.EVT_BUTTON, self.on_back)
+        list_panel_sizer.Add(btn_back, 0, wx.ALL | wx.CENTER, 5)
+        
+        # Etiqueta para el listado
+        self.label_listado = wx.StaticText(self.list_panel, label="Listado de Imágenes:")
+        list_panel_sizer.Add(self.label_listado, 0, wx.ALL, 5)
+        
+        # Contenedor para el splitter
+        splitter_holder = wx.Panel(self.list_panel)
+        splitter_holder_sizer = wx.BoxSizer(wx.VERTICAL)
+        self.splitter_list = wx.SplitterWindow(splitter_holder, style=wx.SP_LIVE_UPDATE)
+        
+        # Panel izquierdo: listado
+        panel_list = wx.Panel(self.splitter_list)
+        list_sizer = wx.BoxSizer(wx.VERTICAL)
+        self.list_ctrl = ImageListCtrl(panel_list, self.model)
+        self.list_ctrl.SetToolTip("Listado de imágenes")
+        self.list_ctrl.InsertColumn(0, "Archivo", width=200)
+        self.list_ctrl.InsertColumn(1, "Descripción", width=200)
+        self.list_ctrl.InsertColumn(2, "Localización", width=150)
+        self.list_ctrl.InsertColumn(3, "Dirección", width=200)
+        self.list_ctrl.InsertColumn(4, "Fecha", width=100)
+        self.list_ctrl.InsertColumn(5, "Hora", width=100)
+        list_sizer.Add(self.list_ctrl, 1, wx.EXPAND | wx.ALL, 5)
+        
+        btn_panel = wx.Panel(panel_list)
+        btn_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.btn_edit = wx.Button(btn_panel, label="Editar")
+        self.btn_edit.SetToolTip("Atajo: Alt+E")
+        self.btn_auto_desc = wx.Button(btn_panel, label="Obtener descripción")
+        self.btn_auto_desc.SetToolTip("Atajo: Alt+O")
+        self.btn_address = wx.Button(btn_panel, label="Obtener dirección")
+        self.btn_address.SetToolTip("Atajo: Alt+D")
+        self.btn_search = wx.Button(btn_panel, label="Buscar")
+        self.btn_search.SetToolTip("Atajo: Alt+B")
+        self.btn_config = wx.Button(btn_panel, label="Configuración")
+        self.btn_config.SetToolTip("Atajo: Alt+F")
+        btn_sizer.Add(self.btn_edit, 0, wx.ALL, 5)
+        btn_sizer.Add(self.btn_auto_desc, 0, wx.ALL, 5)
+        btn_sizer.Add(self.btn_address, 0, wx.ALL, 5)
+        btn_sizer.Add(self.btn_search, 0, wx.ALL, 5)
+        btn_sizer.Add(self.btn_config, 0, wx.ALL, 5)
+        btn_panel.SetSizer(btn_sizer)
+        list_sizer.Add(btn_panel, 0, wx.ALIGN_CENTER)
+        panel_list.SetSizer(list_sizer)
+        
+        # Panel derecho: vista previa
+        self.panel_preview = NonFocusablePanel(self.splitter_list)
+        preview_sizer = wx.BoxSizer(wx.VERTICAL)
+        self.preview_bitmap = wx.StaticBitmap(self.panel_preview, wx.ID_ANY, wx.NullBitmap)
+        preview_sizer.Add(self.preview_bitmap, 1, wx.EXPAND | wx.ALL, 10)
+        # Descripción que la API está generando, visible solo mientras llega (y hasta la siguiente)
+        self.stream_label = wx.StaticText(self.panel_preview, label="Descripción en curso:")
+        self.stream_ctrl = wx.TextCtrl(self.panel_preview, style=wx.TE_MULTILINE | wx.TE_READONLY, size=(-1, 120))
+        self.stream_ctrl.SetName("Descripción en curso")
+        preview_sizer.Add(self.stream_label, 0, wx.LEFT | wx.RIGHT, 10)
+        preview_sizer.Add(self.stream_ctrl, 0, wx.EXPAND | wx.ALL, 10)
+        self.stream_label.Hide()
+        self.stream_ctrl.Hide()
+        self.panel_preview.SetSizer(preview_sizer)
+        
+        self.splitter_list.SplitVertically(panel_list, self.panel_preview, sashPosition=600)
+        splitter_holder_sizer.Add(self.splitter_list, 1, wx.EXPAND)
+        splitter_holder.SetSizer(splitter_holder_sizer)
+        
+        list_panel_sizer.Add(splitter_holder, 1, wx.EXPAND)
+        self.list_panel.SetSizer(list_panel_sizer)
+        
+        self.sizer.Add(self.start_panel, 1, wx.EXPAND | wx.ALL, 10)
+        self.sizer.Add(self.list_panel, 1, wx.EXPAND | wx.ALL, 10)
+        self.list_panel.Hide()  # Se muestra inicialmente la pantalla de inicio
+        
+        self.main_panel.SetSizer(self.sizer)
+        self.CreateStatusBar()
+        self.SetMinSize((800,600))
+        self.Centre()
+        
+        # Bindear eventos
+        self.list_ctrl.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_list_item_selected)
+        self.list_ctrl.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.on_list_item_activated)
+        self.list_ctrl.Bind(wx.EVT_KEY_DOWN, self.on_list_key_down)
+        self.btn_edit.Bind(wx.EVT_BUTTON, self.on_edit)
+        self.btn_auto_desc.Bind(wx.EVT_BUTTON, self.on_auto_desc)
+        self.btn_address.Bind(wx.EVT_BUTTON, self.on_address)
+        self.btn_search.Bind(wx.EVT_BUTTON, self.on_search)
+        self.btn_config.Bind(wx.EVT_BUTTON, self.on_config)
+        
+    def on_add_image(self, event):
+        dlg = wx.FileDialog(self, "Selecciona una imagen",
+                            wildcard="Archivos de imagen (*.jpg;*.jpeg;*.png;*.bmp;*.gif;*.heif;*.heic)|*.jpg;*.jpeg;*.png;*.bmp;*.gif;*.heif;*.heic",
+                            style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+        if dlg.ShowModal() == wx.ID_OK:
+            file_path = dlg.GetPath()
+            if self.search is not None:
+                self.apply_search(None)
+            self.add_image(file_path)
+            self.show_list_panel()
+        dlg.Destroy()
+        
+    def on_add_folder(self, event):
+        dlg = wx.DirDialog(self, "Selecciona una carpeta", defaultPath=os.path.expanduser("~"), style=wx.DD_DEFAULT_STYLE)
+        if dlg.ShowModal() == wx.ID_OK:
+            folder = dlg.GetPath()
+            if self.model.total():
+                msg = ("Ya hay imágenes cargadas.\n\n"
+                       "¿Desea añadir las nuevas imágenes a la lista actual o reemplazarla?")
+                confirm_dlg = wx.MessageDialog(self, msg, "Agregar o Reemplazar", wx.YES_NO | wx.ICON_QUESTION)
+                try:
+                    confirm_dlg.SetYesNoLabels("Añadir", "Reemplazar")
+                except AttributeError:
+                    pass
+                result = confirm_dlg.ShowModal()
+                confirm_dlg.Destroy()
+                if result == wx.ID_NO:
+                    self.cancel_metadata_loader()
+                    self.watcher.unwatch_all()
+                    self.model.clear()
+                    self.search_index.clear()
+                    self.refresh_list()
+            # Las imágenes nuevas se ven siempre: se quita el filtro de búsqueda
+            if self.search is not None:
+                self.apply_search(None)
+            self.show_list_panel()
+            self.start_scan(folder)
+        dlg.Destroy()
+
+    def start_scan(self, folder):
+        """Lanza la búsqueda de imágenes en segundo plano; los resultados llegan por lotes."""
+        self.cancel_scan()
+        config = wx.Config("FotodescApp")
+        recursive = config.ReadBool("RecursiveScan", False)
+        if config.ReadBool("WatchFolders", True):
+            self.watcher.watch(folder, recursive)
+        scanner = FolderScanner(
+            folder, recursive,
+            on_batch=lambda batch, found: wx.CallAfter(self.on_scan_batch, scanner, batch, found),
+            on_done=lambda found, cancelled: wx.CallAfter(self.on_scan_done, scanner, found, cancelled))
+        self.scanner = scanner
+        self.SetStatusText("Buscando imágenes en " + folder + "... (Escape para cancelar)")
+        scanner.start()
+
+    def cancel_scan(self):
+        if self.scanner is not None:
+            self.scanner.cancel()
+            self.scanner = None
+
+    def on_cancel(self, event):
+        if self.scanner is None and self.describer is None and self.geocoder is None and self.bulk_editor is None:
+            event.Skip()
+            return
+        if self.bulk_editor is not None:
+            self.bulk_editor.cancel()
+            self.SetStatusText("Cancelando la edición en bloque...")
+        if self.geocoder is not None:
+            self.geocoder.cancel()
+        if self.scanner is not None:
+            self.scanner.cancel()
+        if self.describer is not None:
+            self.describer.cancel()
+            self.SetStatusText("Cancelando descripciones...")
+
+    def on_scan_batch(self, scanner, batch, found):
+        # Se ignoran los lotes de búsquedas ya canceladas o sustituidas
+        if scanner is not self.scanner:
+            return
+        was_empty = len(self.model) == 0
+        self.model.add_paths(batch)
+        self.load_metadata_background(batch)
+        self.list_ctrl.SetItemCount(len(self.model))
+        if was_empty and len(self.model) > 0:
+            self.set_focus_selected(0)
+        self.SetStatusText(f"Buscando imágenes: {found} encontradas... (Escape para cancelar)")
+
+    def on_scan_done(self, scanner, found, cancelled):
+        if scanner is self.scanner:
+            self.scanner = None
+        if cancelled:
+            self.SetStatusText(f"Búsqueda cancelada: {found} imágenes encontradas.")
+        else:
+            self.SetStatusText(f"Búsqueda terminada: {found} imágenes encontradas.")
+
+    def load_metadata_background(self, file_paths):
+        """Precarga en paralelo los metadatos de las rutas para que el listado no tenga que leerlos."""
+        if self.metadata_loader is None or not self.metadata_loader.is_alive():
+            workers = wx.Config("FotodescApp").ReadInt("MetadataWorkers", 0)
+            loader = MetadataLoader(lambda paths, done, total: self.on_metadata_loaded(loader, paths, done, total),
+                                    workers=workers)
+            self.metadata_loader = loader
+            loader.start()
+        self.metadata_loader.add(file_paths)
+
+    def cancel_metadata_loader(self):
+        if self.metadata_loader is not None:
+            self.metadata_loader.cancel()
+            self.metadata_loader = None
+
+    def on_folder_changes(self, changed, deleted, moved):
+        """Aplica los cambios que ha visto el vigilante de carpetas tocando solo las filas afectadas."""
+        changed = list(changed)
+        for old_path, new_path in moved:
+            if old_path in self.model and new_path not in self.model:
+                self.model.replace_path(old_path, new_path)
+                self.addresses.rename(old_path, new_path)
+                self.search_index.rename(old_path, new_path)
+                metadata_cache.invalidate(old_path)
+            changed.append(new_path)
+        added = []
+        updated = 0
+        for file_path in changed:
+            self.bitmaps.discard((file_path, self.PREVIEW_SIZE))
+            if file_path in self.model:
+                self.refresh_row(file_path)
+                updated += 1
+            elif os.path.exists(file_path):
+                added.append(file_path)
+        removed = [file_path for file_path in deleted if file_path in self.model]
+        if removed:
+            self.model.remove_paths(removed)
+            for file_path in removed:
+                self.search_index.remove(file_path)
+                metadata_cache.invalidate(file_path)
+        if added:
+            self.model.add_paths(added)
+            self.load_metadata_background(added)
+        if added or removed:
+            self.list_ctrl.SetItemCount(len(self.model))
+            self.list_ctrl.Refresh()
+        if self.preview_path in changed and self.preview_path in self.model:
+            self.update_preview(self.preview_path, self.model.by_path[self.preview_path].row)
+        if added or removed or updated:
+            self.SetStatusText(f"Cambios en las carpetas: {len(added)} imágenes nuevas, {updated} actualizadas "
+                               f"y {len(removed)} eliminadas.")
+
+    def on_metadata_loaded(self, loader, paths, done, total):
+        """
+        Se llama desde el hilo de carga: indexa para la búsqueda los metadatos recién leídos. Los bloques
+        que llegan de una carga ya cancelada (al reemplazar el listado) se descartan.
+        """
+        if loader.cancel_event.is_set():
+            return
+        self.search_index.index_paths(paths, self.addresses, loader.cancel_event)
+        wx.CallAfter(self.on_metadata_progress, loader, done, total)
+
+    def on_metadata_progress(self, loader, done, total):
+        # Mientras dura la búsqueda, la barra de estado muestra el progreso de la búsqueda
+        if loader is self.metadata_loader and self.scanner is None:
+            if done >= total:
+                self.SetStatusText(f"Metadatos leídos: {total} imágenes.")
+            else:
+                self.SetStatusText(f"Leyendo metadatos: {done} de {total}...")
+
+    def on_close(self, event):
+        self.cancel_scan()
+        if self.describer is not None:
+            self.describer.cancel()
+        if self.geocoder is not None:
+            self.geocoder.cancel()
+        if self.bulk_editor is not None:
+            self.bulk_editor.cancel()
+        self.cancel_metadata_loader()
+        self.thumbnail_loader.stop()
+        self.watcher.stop()
+        if instrumentacion.perfilando():
+            try:
+                instrumentacion.detener_perfil(os.path.join(get_config_dir(), "diagnostico"))
+            except OSError:
+                pass
+        event.Skip()
+        
+    def on_config(self, event):
+        menu = wx.Menu()
+        id_help = wx.NewIdRef()
+        id_api = wx.NewIdRef()
+        id_about = wx.NewIdRef()
+        id_recursive = wx.NewIdRef()
+        id_watch = wx.NewIdRef()
+        id_workers = wx.NewIdRef()
+        id_limits = wx.NewIdRef()
+        id_geocode = wx.NewIdRef()
+        id_offline = wx.NewIdRef()
+        id_export = wx.NewIdRef()
+        id_import = wx.NewIdRef()
+        id_geotag = wx.NewIdRef()
+        id_diagnostics = wx.NewIdRef()
+        id_profile = wx.NewIdRef()
+        menu.Append(id_help, "Ayuda\tF1")
+        menu.Append(id_api, "Configurar API Key\tCtrl+K")
+        item_recursive = menu.AppendCheckItem(id_recursive, "Incluir subcarpetas al añadir carpeta")
+        item_recursive.Check(wx.Config("FotodescApp").ReadBool("RecursiveScan", False))
+        item_watch = menu.AppendCheckItem(id_watch, "Vigilar cambios en las carpetas cargadas")
+        item_watch.Check(wx.Config("FotodescApp").ReadBool("WatchFolders", True))
+        menu.Append(id_workers, "Hilos de lectura de metadatos...")
+        menu.Append(id_limits, "Límites de la API...")
+        menu.Append(id_geocode, "Caché de direcciones...")
+        menu.Append(id_offline, "Direcciones sin conexión...")
+        menu.Append(id_export, "Exportar listado...")
+        menu.Append(id_import, "Importar descripciones...")
+        menu.Append(id_geotag, "Geoetiquetar con tracks GPX o KML...")
+        menu.Append(id_diagnostics, "Diagnóstico de rendimiento...")
+        item_profile = menu.AppendCheckItem(id_profile, "Capturar perfil de CPU y memoria")
+        item_profile.Check(instrumentacion.perfilando())
+        menu.Append(id_about, "Acerca de\tAlt+U")
+        self.Bind(wx.EVT_MENU, self.show_help, id=id_help)
+        self.Bind(wx.EVT_MENU, self.show_api_key_dialog, id=id_api)
+        self.Bind(wx.EVT_MENU, self.on_toggle_recursive, id=id_recursive)
+        self.Bind(wx.EVT_MENU, self.on_toggle_watch, id=id_watch)
+        self.Bind(wx.EVT_MENU, self.on_metadata_workers, id=id_workers)
+        self.Bind(wx.EVT_MENU, self.on_api_limits, id=id_limits)
+        self.Bind(wx.EVT_MENU, self.on_geocode_settings, id=id_geocode)
+        self.Bind(wx.EVT_MENU, self.on_offline_geocoding, id=id_offline)
+        self.Bind(wx.EVT_MENU, self.on_export, id=id_export)
+        self.Bind(wx.EVT_MENU, self.on_import, id=id_import)
+        self.Bind(wx.EVT_MENU, self.on_geotag, id=id_geotag)
+        self.Bind(wx.EVT_MENU, self.on_diagnostics, id=id_diagnostics)
+        self.Bind(wx.EVT_MENU, self.on_toggle_profile, id=id_profile)
+        self.Bind(wx.EVT_MENU, self.on_about, id=id_about)
+        btn = event.GetEventObject()
+        pos = btn.ClientToScreen((0, btn.GetSize().y))
+        pos = self.ScreenToClient(pos)
+        self.PopupMenu(menu, pos)
+        menu.Destroy()
+        
+    def on_toggle_recursive(self, event):
+        config = wx.Config("FotodescApp")
+        config.WriteBool("RecursiveScan", event.IsChecked())
+
+    def on_toggle_watch(self, event):
+        config = wx.Config("FotodescApp")
+        config.WriteBool("WatchFolders", event.IsChecked())
+        # Al activarla, se vigilan las carpetas que se añadan a partir de ahora
+        if not event.IsChecked():
+            self.watcher.unwatch_all()
+
+    def on_metadata_workers(self, event):
+        config = wx.Config("FotodescApp")
+        dlg = wx.NumberEntryDialog(self, "Número de hilos para leer metadatos en paralelo (0 = automático):",
+                                   "Hilos:", "Lectura de metadatos",
+                                   config.ReadInt("MetadataWorkers", 0), 0, 64)
+        if dlg.ShowModal() == wx.ID_OK:
+            workers = dlg.GetValue()
+            config.WriteInt("MetadataWorkers", workers)
+            if self.metadata_loader is not None:
+                self.metadata_loader.workers = workers
+        dlg.Destroy()
+
+    def on_api_limits(self, event):
+        config = wx.Config("FotodescApp")
+        dlg = APILimitsDialog(self, config.ReadInt("APIConcurrency", 4),
+                              config.ReadInt("APIRequestsPerMinute", 60),
+                              config.ReadInt("APITokensPerMinute", 0),
+                              config.ReadInt("APIBatchSize", 1))
+        if dlg.ShowModal() == wx.ID_OK:
+            concurrency, rpm, tpm, batch_size = dlg.GetValues()
+            config.WriteInt("APIConcurrency", concurrency)
+            config.WriteInt("APIRequestsPerMinute", rpm)
+            config.WriteInt("APITokensPerMinute", tpm)
+            config.WriteInt("APIBatchSize", batch_size)
+        dlg.Destroy()
+
+    def on_geocode_settings(self, event):
+        config = wx.Config("FotodescApp")
+        dlg = GeocodeSettingsDialog(self, config.ReadInt("GeocodePrecision", 3), config.ReadInt("GeocodeRadius", 50))
+        if dlg.ShowModal() == wx.ID_OK:
+            precision, radius_m = dlg.GetValues()
+            config.WriteInt("GeocodePrecision", precision)
+            config.WriteInt("GeocodeRadius", radius_m)
+            geocode_cache.set_precision(precision, radius_m)
+            self.model.refresh_all()
+            self.list_ctrl.Refresh()
+        dlg.Destroy()
+
+    def on_offline_geocoding(self, event):
+        providers = ["nominatim", "fallback", "offline"]
+        choices = ["Solo Nominatim (requiere conexión)",
+                   "Nominatim y, sin conexión, el nomenclátor local",
+                   "Solo el nomenclátor local"]
+        config = wx.Config("FotodescApp")
+        dlg = wx.SingleChoiceDialog(self, "Origen de las direcciones:", "Direcciones sin conexión", choices)
+        current = config.Read("GeocodeProvider", "nominatim")
+        dlg.SetSelection(providers.index(current) if current in providers else 0)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        provider = providers[dlg.GetSelection()]
+        dlg.Destroy()
+        config.Write("GeocodeProvider", provider)
+        if provider == "nominatim":
+            reverse_geocoder.configure(provider)
+            return
+        if os.path.exists(self.offline_index_path):
+            msg = "Ya hay un nomenclátor local cargado.\n\n¿Desea sustituirlo por otro archivo de GeoNames?"
+            if wx.MessageBox(msg, "Direcciones sin conexión", wx.YES_NO | wx.ICON_QUESTION) != wx.YES:
+                reverse_geocoder.configure(provider, self.offline_index_path)
+                return
+        file_dlg = wx.FileDialog(self, "Selecciona el nomenclátor de GeoNames (por ejemplo cities500.txt)",
+                                 wildcard="Archivos de GeoNames (*.txt)|*.txt",
+                                 style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+        if file_dlg.ShowModal() == wx.ID_OK:
+            gazetteer = file_dlg.GetPath()
+            self.SetStatusText("Construyendo el índice de direcciones sin conexión...")
+            threading.Thread(target=self.build_offline_index, args=(gazetteer, provider), daemon=True).start()
+        file_dlg.Destroy()
+
+    def build_offline_index(self, gazetteer, provider):
+        # Se ejecuta en un hilo aparte: construir el índice de un nomenclátor grande lleva unos segundos
+        try:
+            count = construir_indice_offline(gazetteer, self.offline_index_path)
+            wx.CallAfter(self.on_offline_index_built, provider, count, None)
+        except Exception as e:
+            wx.CallAfter(self.on_offline_index_built, provider, 0, str(e))
+
+    def on_offline_index_built(self, provider, count, error):
+        if error:
+            self.SetStatusText("No se pudo construir el índice de direcciones sin conexión.")
+            wx.MessageBox("Error al construir el índice: " + error, "Error", wx.OK | wx.ICON_ERROR)
+            return
+        reverse_geocoder.configure(provider, self.offline_index_path)
+        self.SetStatusText(f"Índice de direcciones sin conexión listo: {count} lugares.")
+        wx.MessageBox(f"Índice de direcciones sin conexión listo: {count} lugares.",
+                      "Confirmación", wx.OK | wx.ICON_INFORMATION)
+
+    def on_export(self, event):
+        paths = self.images
+        if not paths:
+            wx.MessageBox("No hay imágenes en el listado para exportar.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        formatos = ["csv", "jsonl", "geojson"]
+        dlg = wx.FileDialog(self, "Exportar listado",
+                            wildcard="CSV (*.csv)|*.csv|JSON Lines (*.jsonl)|*.jsonl|GeoJSON (*.geojson)|*.geojson",
+                            style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT)
+        if dlg.ShowModal() == wx.ID_OK:
+            formato = formatos[dlg.GetFilterIndex()]
+            destino = dlg.GetPath()
+            if not destino.lower().endswith("." + formato):
+                destino += "." + formato
+            self.SetStatusText(f"Exportando {len(paths)} imágenes...")
+            threading.Thread(target=self.export_catalog, args=(paths, destino, formato), daemon=True).start()
+        dlg.Destroy()
+
+    def export_catalog(self, paths, destino, formato):
+        # Se ejecuta en un hilo aparte; los registros se generan y escriben de uno en uno
+        try:
+            count = exportar_catalogo(iter_catalogo(paths, self.addresses), destino, formato)
+            wx.CallAfter(self.on_export_done, destino, count, None)
+        except Exception as e:
+            wx.CallAfter(self.on_export_done, destino, 0, str(e))
+
+    def on_export_done(self, destino, count, error):
+        if error:
+            self.SetStatusText("No se pudo exportar el listado.")
+            wx.MessageBox("Error al exportar el listado: " + error, "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.SetStatusText(f"Imágenes exportadas: {count}.")
+        wx.MessageBox(f"Se han exportado {count} imágenes a {os.path.basename(destino)}.",
+                      "Confirmación", wx.OK | wx.ICON_INFORMATION)
+
+    def on_import(self, event):
+        paths = self.images
+        if not paths:
+            wx.MessageBox("Carga antes las imágenes a las que aplicar las descripciones.", "Error",
+                          wx.OK | wx.ICON_ERROR)
+            return
+        if self.bulk_editor is not None:
+            wx.MessageBox("Ya hay una edición en bloque en curso. Pulse Escape para cancelarla.",
+                          "Información", wx.OK | wx.ICON_INFORMATION)
+            return
+        dlg = wx.FileDialog(self, "Importar descripciones",
+                            wildcard="Listados exportados (*.csv;*.jsonl;*.geojson)|*.csv;*.jsonl;*.ndjson;*.geojson;*.json",
+                            style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST)
+        catalogo = dlg.GetPath() if dlg.ShowModal() == wx.ID_OK else None
+        dlg.Destroy()
+        if not catalogo:
+            return
+        try:
+            pairs, unmatched = descripciones_de_catalogo(leer_catalogo(catalogo), paths)
+        except Exception as e:
+            wx.MessageBox("Error al leer el archivo: " + str(e), "Error", wx.OK | wx.ICON_ERROR)
+            return
+        if not pairs:
+            wx.MessageBox("El archivo no tiene descripciones para las imágenes del listado.",
+                          "Información", wx.OK | wx.ICON_INFORMATION)
+            return
+        msg = f"Se van a guardar {len(pairs)} descripciones en las imágenes del listado."
+        if unmatched:
+            msg += f"\n{unmatched} registros del archivo no corresponden a ninguna imagen del listado."
+        if wx.MessageBox(msg + "\n\n¿Desea continuar?", "Importar descripciones",
+                         wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
+            self.run_bulk_editor(DescriptionImporter(pairs, on_done=None), "Importar descripciones")
+
+    def on_geotag(self, event):
+        # Con varias imágenes seleccionadas se geoetiquetan esas; si no, todas las del listado
+        paths = self.get_selected_paths()
+        if len(paths) < 2:
+            paths = self.images
+        if not paths:
+            wx.MessageBox("No hay imágenes en el listado para geoetiquetar.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        if self.bulk_editor is not None:
+            wx.MessageBox("Ya hay una edición en bloque en curso. Pulse Escape para cancelarla.",
+                          "Información", wx.OK | wx.ICON_INFORMATION)
+            return
+        dlg = GeotagDialog(self, len(paths))
+        options = dlg.options if dlg.ShowModal() == wx.ID_OK else None
+        dlg.Destroy()
+        if options:
+            self.SetStatusText("Buscando la posición de las imágenes en el track...")
+            threading.Thread(target=self.match_track, args=(paths, options), daemon=True).start()
+
+    def match_track(self, paths, options):
+        # Se ejecuta en un hilo aparte: lee los tracks y empareja las fechas de todas las imágenes de una vez
+        try:
+            track = TrackIndex.from_files(options["tracks"])
+            if not len(track):
+                raise ValueError("Los tracks no tienen puntos con hora.")
+            positions, summary = emparejar_track(paths, track, options["zona"], options["desfase"],
+                                                 options["sobrescribir"])
+            wx.CallAfter(self.on_track_matched, positions, summary, None)
+        except Exception as e:
+            wx.CallAfter(self.on_track_matched, {}, None, str(e))
+
+    def on_track_matched(self, positions, summary, error):
+        if error:
+            self.SetStatusText("No se pudo geoetiquetar.")
+            wx.MessageBox("Error al leer el track: " + error, "Error", wx.OK | wx.ICON_ERROR)
+            return
+        msg = (f"Con posición en el track: {summary['matched']} de {summary['total']} imágenes.\n"
+               f"Sin fecha: {summary['no_date']}. Fuera del track: {summary['no_match']}. "
+               f"Ya tenían coordenadas: {summary['has_gps']}.")
+        self.SetStatusText(f"Con posición en el track: {summary['matched']} de {summary['total']} imágenes.")
+        if not positions:
+            wx.MessageBox(msg + "\n\nRevise la zona horaria y el desfase de la cámara.",
+                          "Geoetiquetar", wx.OK | wx.ICON_INFORMATION)
+            return
+        if wx.MessageBox(msg + "\n\n¿Desea guardar las coordenadas?", "Geoetiquetar",
+                         wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
+            self.run_bulk_editor(GeotagWriter(positions, on_done=None), "Geoetiquetar")
+
+    def on_diagnostics(self, event):
+        dlg = DiagnosticsDialog(self)
+        dlg.ShowModal()
+        dlg.Destroy()
+
+    def on_toggle_profile(self, event):
+        """Empieza o termina la captura del perfil; al terminar se guarda en la carpeta de configuración."""
+        if event.IsChecked():
+            instrumentacion.iniciar_perfil()
+            self.SetStatusText("Capturando perfil de CPU y memoria. Vuelva a pulsar la opción para guardarlo.")
+            return
+        try:
+            rutas = instrumentacion.detener_perfil(os.path.join(get_config_dir(), "diagnostico"))
+        except OSError as e:
+            wx.MessageBox("Error al guardar el perfil: " + str(e), "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.SetStatusText("Perfil guardado.")
+        wx.MessageBox("Perfil guardado en:\n" + "\n".join(rutas) + "\n\n" + ALCANCE_PERFIL,
+                      "Confirmación", wx.OK | wx.ICON_INFORMATION)
+
+    def on_about(self, event):
+        dlg = AboutDialog(self)
+        dlg.ShowModal()
+        dlg.Destroy()
+        
+    def show_help(self, event):
+        dlg = HelpDialog(self)
+        dlg.ShowModal()
+        dlg.Destroy()
+        
+    def show_api_key_dialog(self, event):
+        dlg = APIKeyDialog(self, self.api_key)
+        if dlg.ShowModal() == wx.ID_OK:
+            self.api_key = dlg.GetAPIKey()
+            config = wx.Config("FotodescApp")
+            config.Write("OpenAI_API_Key", self.api_key)
+        dlg.Destroy()
+        
+    def add_image(self, file_path):
+        self.model.add_paths([file_path])
+        self.search_index.index_paths([file_path], self.addresses)
+        self.refresh_list()
+        
+    def refresh_list(self):
+        # El control es virtual: basta con fijar el número de filas y repintar
+        sel_index = self.list_ctrl.GetFirstSelected()
+        with instrumentacion.medir("lista.refresco"):
+            self.list_ctrl.SetItemCount(len(self.model))
+            self.list_ctrl.Refresh()
+        if self.list_ctrl.GetItemCount() > 0 and sel_index == -1:
+            self.list_ctrl.SetItemState(0, wx.LIST_STATE_SELECTED | wx.LIST_STATE_FOCUSED,
+                                          wx.LIST_STATE_SELECTED | wx.LIST_STATE_FOCUSED)
+            self.list_ctrl.EnsureVisible(0)
+            self.list_ctrl.SetFocus()
+        elif sel_index != -1:
+            self.list_ctrl.SetItemState(sel_index, wx.LIST_STATE_SELECTED | wx.LIST_STATE_FOCUSED,
+                                          wx.LIST_STATE_SELECTED | wx.LIST_STATE_FOCUSED)
+            self.list_ctrl.EnsureVisible(sel_index)
+            self.list_ctrl.SetFocus()
+
+    def refresh_row(self, file_path):
+        """Vuelve a calcular y repinta solo la fila de la imagen indicada, y la actualiza en el índice de búsqueda."""
+        if file_path in self.model:
+            self.search_index.index_paths([file_path], self.addresses)
+        row = self.model.refresh_path(file_path)
+        if row != -1:
+            self.list_ctrl.RefreshItem(row)
+        
+    def show_list_panel(self):
+        self.start_panel.Hide()
+        self.list_panel.Show()
+        self.Layout()
+        if self.list_ctrl.GetItemCount() > 0:
+            self.list_ctrl.SetFocus()
+        
+    def on_back(self, event):
+        self.list_panel.Hide()
+        self.start_panel.Show()
+        self.Layout()
+        self.start_panel.SetFocus()
+        
+    def on_search(self, event):
+        if not self.model.total():
+            return
+        selected = self.get_selected_image()
+        gps = get_metadata(selected[0])[1] if selected else None
+        dlg = SearchDialog(self, self.search, gps)
+        result = dlg.ShowModal()
+        if result == wx.ID_OK:
+            self.apply_search(dlg.criteria)
+        elif result == wx.ID_CLEAR:
+            self.apply_search(None)
+        dlg.Destroy()
+
+    def apply_search(self, criteria):
+        """Filtra el listado con los criterios de SearchDialog; con None (o criterios vacíos) se muestran todas."""
+        if criteria is not None and not any(criteria.values()):
+            criteria = None
+        self.search = criteria
+        # Las filas pasan a ser otras imágenes: se quita la selección anterior
+        index = self.list_ctrl.GetFirstSelected()
+        while index != -1:
+            self.list_ctrl.Select(index, False)
+            index = self.list_ctrl.GetNextSelected(index)
+        self.model.set_filter(None if criteria is None else self.search_index.search(**criteria))
+        self.list_ctrl.SetItemCount(len(self.model))
+        self.list_ctrl.Refresh()
+        total = self.model.total()
+        if criteria is None:
+            self.label_listado.SetLabel("Listado de Imágenes:")
+            self.SetStatusText(f"Mostrando todas las imágenes: {total}.")
+        else:
+            self.label_listado.SetLabel(f"Listado de Imágenes (búsqueda: {len(self.model)} de {total}):")
+            self.SetStatusText(f"Búsqueda: {len(self.model)} de {total} imágenes. Alt+B para cambiarla.")
+        if len(self.model) > 0:
+            self.set_focus_selected(0)
+
+    def on_list_item_selected(self, event):
+        index = event.GetIndex()
+        if index == -1:
+            return
+        if index < len(self.model):
+            self.update_preview(self.model.path_at(index), index)
+        
+    def update_preview(self, file_path, index=-1):
+        """
+        Muestra la vista previa desde la caché de mapas de bits o la pide al hilo de miniaturas,
+        junto con las de las filas anterior y siguiente. Las peticiones anteriores se descartan.
+        """
+        self.preview_path = file_path
+        bmp = self.bitmaps.get((file_path, self.PREVIEW_SIZE))
+        self.preview_bitmap.SetBitmap(bmp if bmp is not None else wx.NullBitmap)
+        self.panel_preview.Layout()
+        wanted = [] if bmp is not None else [file_path]
+        for neighbor in (index + 1, index - 1):
+            if index != -1 and 0 <= neighbor < len(self.model):
+                neighbor_path = self.model.path_at(neighbor)
+                if (neighbor_path, self.PREVIEW_SIZE) not in self.bitmaps:
+                    wanted.append(neighbor_path)
+        self.thumbnail_loader.request(wanted, self.PREVIEW_SIZE)
+
+    def on_thumbnail_ready(self, file_path, max_size, width, height, data):
+        if data is None:
+            if file_path == self.preview_path:
+                self.SetStatusText("No se pudo cargar la vista previa de " + os.path.basename(file_path))
+            return
+        bmp = wx.Bitmap.FromBuffer(width, height, data)
+        self.bitmaps.put((file_path, max_size), bmp)
+        if file_path == self.preview_path and max_size == self.PREVIEW_SIZE:
+            self.preview_bitmap.SetBitmap(bmp)
+            self.panel_preview.Layout()
+        
+    def get_selected_image(self):
+        index = self.list_ctrl.GetFirstSelected()
+        if index == -1 or index >= len(self.model):
+            return None
+        return self.model.path_at(index), index
+        
+    def on_edit(self, event):
+        paths = self.get_selected_paths()
+        if len(paths) > 1:
+            self.on_bulk_edit(paths)
+            return
+        selected = self.get_selected_image()
+        if not selected:
+            wx.MessageBox("Selecciona una imagen para editar.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        file_path, index = selected
+        dlg = EditDialog(self, file_path)
+        if dlg.ShowModal() == wx.ID_OK:
+            self.refresh_row(dlg.file_path)
+        dlg.Destroy()
+
+    def on_bulk_edit(self, paths):
+        if self.bulk_editor is not None:
+            wx.MessageBox("Ya hay una edición en bloque en curso. Pulse Escape para cancelarla.",
+                          "Información", wx.OK | wx.ICON_INFORMATION)
+            return
+        dlg = BulkEditDialog(self, len(paths))
+        changes = dlg.changes if dlg.ShowModal() == wx.ID_OK else None
+        dlg.Destroy()
+        if changes:
+            self.start_bulk_edit(paths, changes)
+
+    def start_bulk_edit(self, paths, changes):
+        self.run_bulk_editor(BulkEditor(paths, on_done=None, **changes), "Edición en bloque")
+
+    def run_bulk_editor(self, editor, title):
+        """
+        Escribe en segundo plano los cambios de un BulkEditor (o DescriptionImporter);
+        las filas se refrescan todas juntas al terminar.
+        """
+        editor.on_done = lambda summary: wx.CallAfter(self.on_bulk_edit_done, editor, summary, title)
+        editor.on_progress = lambda done, total: wx.CallAfter(self.on_bulk_edit_progress, editor, done, total)
+        self.bulk_editor = editor
+        self.SetStatusText(f"Editando imágenes: 0 de {len(editor.file_paths)}... (Escape para cancelar)")
+        editor.start()
+
+    def on_bulk_edit_progress(self, editor, done, total):
+        # Las llamadas llegan en ráfagas: solo se muestra la más reciente de cada decena
+        if editor is self.bulk_editor and (done % 10 == 0 or done == total):
+            self.SetStatusText(f"Editando imágenes: {done} de {total}... (Escape para cancelar)")
+
+    def on_bulk_edit_done(self, editor, summary, title):
+        if editor is self.bulk_editor:
+            self.bulk_editor = None
+        paths = summary["paths"]
+        if editor.changes_gps:
+            # La dirección guardada correspondía a las coordenadas anteriores
+            for file_path in paths:
+                if file_path in self.addresses:
+                    self.addresses[file_path] = ""
+        paths = [file_path for file_path in paths if file_path in self.model]
+        self.search_index.index_paths(paths, self.addresses)
+        for file_path in paths:
+            self.model.refresh_path(file_path)
+        self.list_ctrl.Refresh()
+        self.SetStatusText(f"Imágenes modificadas: {len(summary['paths'])} de {summary['total']}.")
+        msg = f"Imágenes modificadas: {len(summary['paths'])} de {summary['total']}."
+        if summary["unchanged"]:
+            msg += f"\nSin cambios (ya tenían esos datos): {summary['unchanged']}."
+        if summary["cancelled"]:
+            msg += "\nEl proceso se canceló antes de terminar."
+        if summary["errors"]:
+            msg += f"\n\nErrores ({len(summary['errors'])}):\n"
+            msg += "\n".join(f"{os.path.basename(path)}: {error}" for path, error in summary["errors"][:20])
+            if len(summary["errors"]) > 20:
+                msg += f"\n... y {len(summary['errors']) - 20} más."
+        icon = wx.ICON_WARNING if summary["errors"] else wx.ICON_INFORMATION
+        wx.MessageBox(msg, title, wx.OK | icon)
+        index = self.list_ctrl.GetFirstSelected()
+        if index != -1:
+            self.set_focus_selected(index)
+        
+    def get_selected_paths(self):
+        """Rutas de todas las filas seleccionadas, en el orden del listado."""
+        paths = []
+        index = self.list_ctrl.GetFirstSelected()
+        while index != -1:
+            paths.append(self.model.path_at(index))
+            index = self.list_ctrl.GetNextSelected(index)
+        return paths
+
+    def on_auto_desc(self, event):
+        paths = self.get_selected_paths()
+        if not paths:
+            wx.MessageBox("Selecciona una imagen para obtener descripción.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.start_batch_description(paths)
+
+    def on_auto_desc_refresh(self, event):
+        paths = self.get_selected_paths()
+        if not paths:
+            wx.MessageBox("Selecciona una imagen para obtener descripción.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        self.start_batch_description(paths, force_refresh=True)
+
+    def on_auto_desc_all(self, event):
+        paths = self.images
+        if not paths:
+            return
+        msg = f"Se va a obtener la descripción automática de {len(paths)} imágenes.\n\n¿Desea continuar?"
+        if wx.MessageBox(msg, "Obtener descripción de todas", wx.YES_NO | wx.ICON_QUESTION) == wx.YES:
+            self.start_batch_description(paths)
+
+    def start_batch_description(self, paths, force_refresh=False):
+        """Lanza las descripciones en segundo plano; cada fila se actualiza en cuanto llega su descripción."""
+        if self.describer is not None:
+            wx.MessageBox("Ya se están obteniendo descripciones. Pulse Escape para cancelarlas.",
+                          "Información", wx.OK | wx.ICON_INFORMATION)
+            return
+        config = wx.Config("FotodescApp")
+        limiter = RateLimiter(config.ReadInt("APIRequestsPerMinute", 60), config.ReadInt("APITokensPerMinute", 0))
+        describer = BatchDescriber(
+            self.api_key, paths, PROMPT_DESCRIPCION,
+            on_result=lambda path, description, error: wx.CallAfter(
+                self.on_describe_result, describer, path, description, error),
+            on_done=lambda summary: wx.CallAfter(self.on_describe_done, describer, summary),
+            concurrency=config.ReadInt("APIConcurrency", 4), limiter=limiter, force_refresh=force_refresh,
+            batch_size=config.ReadInt("APIBatchSize", 1),
+            on_partial=lambda path, fragment, text: wx.CallAfter(self.on_describe_partial, describer, path, text))
+        self.describer = describer
+        self.described = 0
+        self.SetStatusText(f"Obteniendo descripciones: 0 de {len(paths)}... (Escape para cancelar)")
+        describer.start()
+
+    STREAM_INTERVAL = 0.3  # Segundos mínimos entre actualizaciones del campo, salvo al terminar una frase
+
+    def on_describe_partial(self, describer, file_path, text):
+        """
+        Muestra la descripción a medida que llega: la de la imagen de la vista previa o, si se pidió una sola,
+        esa. El texto se añade por frases (o cada STREAM_INTERVAL) para que el lector de pantalla no lo trocee.
+        """
+        if describer is not self.describer:
+            return
+        if file_path != self.stream_path:
+            single = len(describer.file_paths) == 1
+            if not single and file_path != self.preview_path:
+                return
+            self.stream_path = file_path
+            self.stream_shown = ""
+            self.stream_time = 0.0
+            self.stream_label.SetLabel(f"Descripción en curso de {os.path.basename(file_path)}:")
+            self.stream_ctrl.SetValue("")
+            self.stream_label.Show()
+            self.stream_ctrl.Show()
+            self.panel_preview.Layout()
+            if single:
+                self.stream_ctrl.SetFocus()
+        now = time.monotonic()
+        if text.rstrip()[-1:] in (".", ",", ";", ":") or "\n" in text[len(self.stream_shown):] \
+                or now - self.stream_time >= self.STREAM_INTERVAL:
+            self.show_stream_text(text)
+            self.stream_time = now
+
+    def show_stream_text(self, text):
+        # Solo se añade lo nuevo: reescribir todo el campo haría que el lector lo leyera desde el principio
+        if self.stream_shown.startswith(text):
+            return  # El texto final es el mismo sin los espacios del último fragmento
+        if text.startswith(self.stream_shown):
+            self.stream_ctrl.AppendText(text[len(self.stream_shown):])
+        else:
+            self.stream_ctrl.SetValue(text)
+        self.stream_shown = text
+
+    def on_describe_result(self, describer, file_path, description=None, error=None):
+        if describer is not self.describer:
+            return
+        if file_path == self.stream_path:
+            if description:
+                self.show_stream_text(description)
+            elif error:
+                self.stream_ctrl.AppendText(f"\n(Error: {error})")
+            self.stream_path = None
+        self.described += 1
+        self.refresh_row(file_path)
+        self.SetStatusText(f"Obteniendo descripciones: {self.described} de {len(describer.file_paths)}... "
+                           "(Escape para cancelar)")
+
+    def on_describe_done(self, describer, summary):
+        if describer is self.describer:
+            self.describer = None
+        if self.stream_path is not None:
+            self.stream_ctrl.AppendText(" (cancelada)")
+            self.stream_path = None
+        self.SetStatusText(f"Descripciones obtenidas: {summary['ok']} de {summary['total']}.")
+        # Un único aviso al final con el resumen de todo el lote
+        if summary["total"] == 1 and not summary["cancelled"]:
+            if summary["ok"]:
+                wx.MessageBox("Descripción automática obtenida correctamente", "Confirmación", wx.OK | wx.ICON_INFORMATION)
+            elif summary["errors"]:
+                wx.MessageBox("Error al obtener la descripción automática: " + summary["errors"][0][1],
+                              "Error", wx.OK | wx.ICON_ERROR)
+        else:
+            msg = f"Descripciones obtenidas: {summary['ok']} de {summary['total']}."
+            if summary["cancelled"]:
+                msg += "\nEl proceso se canceló antes de terminar."
+            if summary["errors"]:
+                msg += f"\n\nErrores ({len(summary['errors'])}):\n"
+                msg += "\n".join(f"{os.path.basename(path)}: {error}" for path, error in summary["errors"][:20])
+                if len(summary["errors"]) > 20:
+                    msg += f"\n... y {len(summary['errors']) - 20} más."
+            icon = wx.ICON_WARNING if summary["errors"] else wx.ICON_INFORMATION
+            wx.MessageBox(msg, "Descripción automática", wx.OK | icon)
+        index = self.list_ctrl.GetFirstSelected()
+        if index != -1:
+            self.set_focus_selected(index)
+        
+    def on_address(self, event):
+        selected = self.get_selected_image()
+        if not selected:
+            wx.MessageBox("Selecciona una imagen para obtener la dirección.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        file_path, index = selected
+        desc, gps, fecha, hora = get_metadata(file_path)
+        if not gps:
+            wx.MessageBox("No hay datos de latitud y longitud.", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        lat, lon = gps
+        try:
+            # Si hay un punto cercano en la caché no se consulta Nominatim
+            address = direccion_en_cache(lat, lon)
+            if address is None:
+                address, cacheable = reverse_geocoder.reverse(lat, lon)
+                if address and cacheable:
+                    geocode_cache.store(lat, lon, address)
+            if address:
+                self.addresses[file_path] = address
+                self.refresh_row(file_path)
+                wx.MessageBox("Dirección obtenida correctamente", "Confirmación", wx.OK | wx.ICON_INFORMATION)
+                self.set_focus_selected(index)
+            else:
+                wx.MessageBox("No se encontró dirección.", "Información", wx.OK | wx.ICON_INFORMATION)
+        except GeocodingError as e:
+            wx.MessageBox(str(e), "Error", wx.OK | wx.ICON_ERROR)
+        except Exception as e:
+            wx.MessageBox("Error en la conexión: " + str(e), "Error", wx.OK | wx.ICON_ERROR)
+            
+    def on_address_all(self, event):
+        if not len(self.model):
+            return
+        if self.geocoder is not None:
+            wx.MessageBox("Ya se están obteniendo direcciones. Pulse Escape para cancelarlas.",
+                          "Información", wx.OK | wx.ICON_INFORMATION)
+            return
+        cell_m = max(2 * geocode_cache.radius_m, 10)
+        geocoder = BatchGeocoder(
+            list(self.images),
+            on_result=lambda paths, address: wx.CallAfter(self.on_geocode_result, geocoder, paths, address),
+            on_done=lambda summary: wx.CallAfter(self.on_geocode_done, geocoder, summary),
+            on_progress=lambda done, total: wx.CallAfter(self.on_geocode_progress, geocoder, done, total),
+            cell_m=cell_m)
+        self.geocoder = geocoder
+        self.SetStatusText("Agrupando las imágenes por lugar... (Escape para cancelar)")
+        geocoder.start()
+
+    def on_geocode_result(self, geocoder, paths, address):
+        if geocoder is not self.geocoder:
+            return
+        for file_path in paths:
+            self.addresses[file_path] = address
+            self.refresh_row(file_path)
+
+    def on_geocode_progress(self, geocoder, done, total):
+        if geocoder is self.geocoder:
+            self.SetStatusText(f"Obteniendo direcciones: lugar {done} de {total}... (Escape para cancelar)")
+
+    def on_geocode_done(self, geocoder, summary):
+        if geocoder is self.geocoder:
+            self.geocoder = None
+        msg = (f"Direcciones asignadas: {summary['found']} de {summary['images']} imágenes con geolocalización.\n"
+               f"Lugares distintos: {summary['groups']}. Consultas a Nominatim: {summary['requests']}.")
+        if summary["cancelled"]:
+            msg += "\nEl proceso se canceló antes de terminar."
+        if summary["errors"]:
+            msg += f"\n\nErrores ({len(summary['errors'])}):\n"
+            msg += "\n".join(f"{os.path.basename(path)}: {error}" for path, error in summary["errors"][:20])
+            if len(summary["errors"]) > 20:
+                msg += f"\n... y {len(summary['errors']) - 20} más."
+        self.SetStatusText(f"Direcciones asignadas: {summary['found']} imágenes.")
+        icon = wx.ICON_WARNING if summary["errors"] else wx.ICON_INFORMATION
+        wx.MessageBox(msg, "Obtener direcciones", wx.OK | icon)
+
+    def set_focus_selected(self, index):
+        self.list_ctrl.SetItemState(index, wx.LIST_STATE_SELECTED | wx.LIST_STATE_FOCUSED,
+                                      wx.LIST_STATE_SELECTED | wx.LIST_STATE_FOCUSED)
+        self.list_ctrl.EnsureVisible(index)
+        self.list_ctrl.SetFocus()
+        
+    def on_list_item_activated(self, event):
+        self.show_popup_menu()
+        
+    def on_list_key_down(self, event):
+        if event.GetKeyCode() == wx.WXK_RETURN:
+            self.show_popup_menu()
+        else:
+            event.Skip()
+            
+    def show_popup_menu(self):
+        selected = self.get_selected_image()
+        if not selected:
+            return
+        file_path, index = selected
+        menu = wx.Menu()
+        id_edit = wx.NewIdRef()
+        id_address = wx.NewIdRef()
+        id_desc = wx.NewIdRef()
+        id_desc_all = wx.NewIdRef()
+        id_desc_refresh = wx.NewIdRef()
+        id_address_all = wx.NewIdRef()
+        id_search = wx.NewIdRef()
+        menu.Append(id_edit, "Editar\tAlt+E")
+        menu.Append(id_address, "Obtener Dirección\tAlt+D")
+        menu.Append(id_desc, "Obtener Descripción\tAlt+O")
+        menu.Append(id_desc_all, "Obtener Descripción de todas\tAlt+T")
+        menu.Append(id_desc_refresh, "Volver a obtener Descripción\tAlt+R")
+        menu.Append(id_address_all, "Obtener Direcciones de todas\tAlt+G")
+        menu.Append(id_search, "Buscar\tAlt+B")
+        self.Bind(wx.EVT_MENU, self.on_edit, id=id_edit)
+        self.Bind(wx.EVT_MENU, self.on_address, id=id_address)
+        self.Bind(wx.EVT_MENU, self.on_auto_desc, id=id_desc)
+        self.Bind(wx.EVT_MENU, self.on_auto_desc_all, id=id_desc_all)
+        self.Bind(wx.EVT_MENU, self.on_auto_desc_refresh, id=id_desc_refresh)
+        self.Bind(wx.EVT_MENU, self.on_address_all, id=id_address_all)
+        self.Bind(wx.EVT_MENU, self.on_search, id=id_search)
+        index_selected = self.list_ctrl.GetFirstSelected()
+        if index_selected != -1:
+            rect = self.list_ctrl.GetItemRect(index_selected, wx.LIST_RECT_BOUNDS)
+            self.list_ctrl.PopupMenu(menu, (rect.x, rect.y))
+        menu.Destroy()
+
+# ---------------- Main ----------------
+def informar_arranque(salir=False):
+    """
+    Escribe en stderr el tiempo transcurrido desde que empezó a cargarse la interfaz hasta que la ventana
+    principal atiende eventos. Con salir=True cierra después la aplicación (lo usa benchmarks/bench_startup.py).
+    """
+    ms = (time.perf_counter() - ARRANQUE) * 1000
+    sys.stderr.write(f"FotoDesc: ventana lista en {ms:.0f} ms\n")
+    sys.stderr.flush()
+    if salir:
+        wx.GetApp().ExitMainLoop()
+
+def main():
+    app = wx.App(False)
+    config = wx.Config("FotodescApp")
+    api_key = config.Read("OpenAI_API_Key", "")
+    frame = MainFrame(None)
+    frame.api_key = api_key
+    frame.Show()
+    # FOTODESC_MEDIR_ARRANQUE=1 informa del tiempo de arranque; con "salir" además cierra la aplicación
+    medir = os.environ.get("FOTODESC_MEDIR_ARRANQUE", "")
+    if medir:
+        wx.CallAfter(informar_arranque, medir == "salir")
+    if medir != "salir" and config.ReadBool("ShowHelpOnStartup", True):
+        dlg = HelpDialog(frame)
+        dlg.ShowModal()
+        dlg.Destroy()
+    app.MainLoop()
@@ -0,0 +1,55 @@
+"""
+Configuración común de las pruebas: la configuración de la aplicación va a una carpeta temporal (no se tocan
+las cachés del usuario) y la API de OpenAI se sustituye por el servidor local de benchmarks/servidores_stub.py.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+# fotodesc.core lee estas variables al importarse
+os.environ["XDG_CONFIG_HOME"] = os.environ["APPDATA"] = tempfile.mkdtemp(prefix="fotodesc_pruebas_")
+
+import servidores_stub  # noqa: E402
+from fotodesc import core  # noqa: E402
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """Servidor local que responde como la API, con una caché de descripciones vacía."""
+    servidor = servidores_stub.iniciar_openai()
+    monkeypatch.setattr(core, "OPENAI_API_URL", servidor.url + "/v1/chat/completions")
+    monkeypatch.setattr(core, "description_cache", core.DescriptionCache(str(tmp_path / "descripciones.db")))
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def nominatim(monkeypatch, tmp_path):
+    """Servidor local que responde como Nominatim, con una caché de direcciones vacía."""
+    servidor = servidores_stub.iniciar_nominatim()
+    monkeypatch.setattr(core, "NOMINATIM_URL", servidor.url + "/reverse")
+    monkeypatch.setattr(core, "geocode_cache", core.GeocodeCache(str(tmp_path / "direcciones.db")))
+    monkeypatch.setattr(core, "reverse_geocoder", core.ReverseGeocoder())
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def fotos(tmp_path):
+    """Crea n JPEG pequeños y distintos (cada uno con su propia clave en la caché) y devuelve sus rutas."""
+    def crear(n):
+        from PIL import Image
+        rutas = []
+        for i in range(n):
+            ruta = str(tmp_path / f"foto_{i}.jpg")
+            Image.new("RGB", (64, 48), (i * 40 % 256, 80, 160)).save(ruta, "JPEG")
+            rutas.append(ruta)
+        return rutas
+    return crear
@@ -0,0 +1,48 @@
+"""Índice de búsqueda (SearchIndex) alimentado por la precarga de metadatos (MetadataLoader)."""
+import threading
+
+from fotodesc import core
+
+
+def test_busca_por_descripcion(fotos):
+    rutas = fotos(2)
+    core.update_image_description(rutas[0], "Perro en la playa")
+    indice = core.SearchIndex()
+    indice.index_paths(rutas)
+    assert indice.search(text="playa") == {rutas[0]}
+
+
+def test_lo_que_indexa_una_carga_cancelada_no_vuelve_tras_clear(fotos):
+    rutas = fotos(3)
+    indice = core.SearchIndex()
+    cancelada = threading.Event()
+    indice.index_paths(rutas[:1], cancel_event=cancelada)
+    # Al reemplazar el listado se cancela la carga y después se vacía el índice
+    cancelada.set()
+    indice.clear()
+    indice.index_paths(rutas[1:], cancel_event=cancelada)
+    assert len(indice) == 0
+
+
+def test_la_precarga_cancelada_deja_de_avisar(fotos):
+    rutas = fotos(5)
+    indice = core.SearchIndex()
+    avisos = []
+    terminado = threading.Event()
+
+    def on_progress(paths, done, total):
+        avisos.append(paths)
+        indice.index_paths(paths, cancel_event=loader.cancel_event)
+        if done >= total:
+            terminado.set()
+
+    loader = core.MetadataLoader(on_progress, workers=1)
+    loader.start()
+    loader.add(rutas)
+    assert terminado.wait(10)
+    assert len(indice) == 5
+    loader.cancel()
+    indice.clear()
+    loader.add(rutas)  # Ya no se procesa
+    loader.join(5)
+    assert not loader.is_alive() and len(indice) == 0
@@ -0,0 +1,19 @@
+"""Comprobación de las opciones de la línea de órdenes (fotodesc.cli)."""
+import pytest
+
+from fotodesc import cli
+
+
+@pytest.mark.parametrize("opciones", [["--progresivo"], ["--progresivo", "--json", "--por-peticion", "3"]])
+def test_progresivo_requiere_json_y_una_imagen_por_peticion(opciones, capsys):
+    with pytest.raises(SystemExit) as salida:
+        cli.main(["describe", "foto.jpg", "--api-key", "clave"] + opciones)
+    assert salida.value.code == 2
+    assert "--progresivo requiere --json y --por-peticion 1" in capsys.readouterr().err
+
+
+def test_progresivo_emite_los_fragmentos(api, fotos, capsys):
+    ruta, = fotos(1)
+    assert cli.main(["describe", ruta, "--api-key", "clave", "--progresivo", "--json"]) == 0
+    salida = capsys.readouterr().out
+    assert '"event": "partial"' in salida and '"event": "done"' in salida
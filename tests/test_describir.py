@@ -0,0 +1,193 @@
+"""Descripciones por lotes (BatchDescriber) contra el servidor local que sustituye a la API."""
+import threading
+import time
+
+import pytest
+
+from fotodesc import core
+
+
+def describir(rutas, **opciones):
+    """Ejecuta un BatchDescriber en este hilo y devuelve (resultados por ruta, resumen)."""
+    resultados = {}
+    resumen = {}
+    opciones.setdefault("limiter", core.RateLimiter())
+    describer = core.BatchDescriber("clave", rutas, "Describe la imagen.",
+                                    on_result=lambda ruta, d, e: resultados.__setitem__(ruta, (d, e)),
+                                    on_done=resumen.update, **opciones)
+    describer.run()
+    return resultados, resumen
+
+
+def descripcion_exif(ruta):
+    return core.read_metadata(ruta)[0]
+
+
+def test_describe_y_guarda_en_exif(api, fotos):
+    rutas = fotos(3)
+    resultados, resumen = describir(rutas)
+    assert resumen["ok"] == 3 and not resumen["errors"]
+    for ruta in rutas:
+        assert resultados[ruta] == ("Descripción de prueba generada localmente.", None)
+        assert descripcion_exif(ruta) == "Descripción de prueba generada localmente."
+
+
+@pytest.mark.parametrize("codigo", [429, 503])
+def test_reintenta_respetando_retry_after(api, fotos, codigo):
+    api.errores = [(codigo, 0.3), (codigo, 0.3)]
+    inicio = time.monotonic()
+    resultados, resumen = describir(fotos(1))
+    assert resumen["ok"] == 1
+    assert api.peticiones == 3
+    assert time.monotonic() - inicio >= 0.6
+
+
+def test_reintentos_sin_retry_after_con_espera_exponencial(api, fotos):
+    ruta, = fotos(1)
+    api.errores = [(503, None)] * 3
+    esperas = []
+    inicio = time.monotonic()
+
+    def funcion():
+        esperas.append(time.monotonic() - inicio)
+        return core.describir_imagen("clave", ruta, "Describe la imagen.", force_refresh=True)
+
+    assert core.llamar_con_reintentos(funcion, base_delay=0.1) == "Descripción de prueba generada localmente."
+    intervalos = [b - a for a, b in zip(esperas, esperas[1:])]
+    # Cada espera está entre la mitad y el total de base_delay * 2 ** intento
+    assert len(intervalos) == 3 and min(intervalos) >= 0.05
+    assert intervalos[2] >= 0.2
+
+
+def test_agota_los_reintentos_y_lo_avisa_en_on_done(api, fotos):
+    ruta, = fotos(1)
+    api.errores = [(503, 0)] * 6
+    resultados, resumen = describir([ruta])
+    assert api.peticiones == 6  # Primer intento y cinco reintentos
+    assert resumen["ok"] == 0
+    assert [r for r, _ in resumen["errors"]] == [ruta]
+    assert "503" in resumen["errors"][0][1]
+    assert resultados[ruta][0] is None
+    assert descripcion_exif(ruta) == ""
+
+
+def test_error_no_reintentable_se_avisa_sin_reintentar(api, fotos):
+    rutas = fotos(2)
+    api.errores = [(401, None)]
+    resultados, resumen = describir(rutas, concurrency=1)
+    assert api.peticiones == 2
+    assert resumen["ok"] == 1
+    assert len(resumen["errors"]) == 1 and "401" in resumen["errors"][0][1]
+
+
+def test_respuesta_vacia_es_un_error_y_no_se_escribe(api, fotos):
+    rutas = fotos(2)
+    api.contenido = ""
+    resultados, resumen = describir(rutas)
+    assert resumen["ok"] == 0
+    assert {r for r, _ in resumen["errors"]} == set(rutas)
+    assert all(error == core.SIN_CONTENIDO for _, error in resumen["errors"])
+    assert all(descripcion_exif(ruta) == "" for ruta in rutas)
+
+
+def test_respuesta_vacia_en_lote_no_se_escribe(api, fotos):
+    rutas = fotos(2)
+    api.contenido = ""
+    resultados, resumen = describir(rutas, batch_size=2)
+    assert resumen["ok"] == 0 and len(resumen["errors"]) == 2
+    assert all(descripcion_exif(ruta) == "" for ruta in rutas)
+
+
+def test_el_limitador_espacia_las_peticiones(api, fotos):
+    # 600 por minuto sin ráfaga: una petición cada 0,1 s
+    inicio = time.monotonic()
+    resultados, resumen = describir(fotos(4), limiter=core.RateLimiter(600, burst=1))
+    assert resumen["ok"] == 4
+    assert time.monotonic() - inicio >= 0.3
+
+
+def test_cancelar_mientras_espera_al_limitador(api, fotos):
+    rutas = fotos(3)
+    resumen = {}
+    describer = core.BatchDescriber("clave", rutas, "Describe la imagen.", on_result=lambda *args: None,
+                                    on_done=resumen.update, concurrency=1, limiter=core.RateLimiter(1, burst=1))
+    describer.start()
+    time.sleep(0.5)
+    inicio = time.monotonic()
+    describer.cancel()
+    describer.join(5)
+    assert not describer.is_alive()
+    assert time.monotonic() - inicio < 2
+    assert resumen["cancelled"] and resumen["ok"] == 1
+    assert api.peticiones == 1
+    assert [descripcion_exif(ruta) for ruta in rutas[1:]] == ["", ""]
+
+
+def test_lote_rechazado_con_413_se_parte(api, fotos):
+    api.max_imagenes = 2
+    rutas = fotos(4)
+    resultados, resumen = describir(rutas, batch_size=4, concurrency=1)
+    assert resumen["ok"] == 4 and not resumen["errors"]
+    assert api.imagenes == [4, 2, 2]
+    assert all(descripcion_exif(ruta).startswith("Descripción de prueba de la imagen") for ruta in rutas)
+
+
+def test_lote_rechazado_con_400_se_parte(api, fotos):
+    api.errores = [(400, None)]
+    rutas = fotos(4)
+    resultados, resumen = describir(rutas, batch_size=4, concurrency=1)
+    assert resumen["ok"] == 4
+    assert api.imagenes == [4, 2, 2]
+
+
+def test_error_de_servidor_en_lote_falla_todo_el_lote(api, fotos):
+    api.errores = [(401, None)]
+    rutas = fotos(3)
+    resultados, resumen = describir(rutas, batch_size=3, concurrency=1)
+    assert api.imagenes == [3]
+    assert resumen["ok"] == 0 and {r for r, _ in resumen["errors"]} == set(rutas)
+
+
+def test_respuesta_incompleta_repite_solo_las_que_faltan(api, fotos):
+    api.omitir = 2  # Falta una de cada dos imágenes de cada respuesta
+    rutas = fotos(4)
+    resultados, resumen = describir(rutas, batch_size=4, concurrency=1)
+    assert resumen["ok"] == 4 and not resumen["errors"]
+    # 1 y 3 llegan en la primera; se piden 2 y 4, llega 2 (la primera del lote); la última va sola
+    assert api.imagenes == [4, 2, 1]
+
+
+def test_respuesta_fuera_de_esquema_se_vuelve_a_pedir_en_lotes_menores(api, fotos):
+    api.contenido = "Esto no es JSON"
+    rutas = fotos(4)
+    resultados, resumen = describir(rutas, batch_size=4, concurrency=1)
+    # Sin ninguna descripción válida el lote se parte por la mitad; una imagen sola se pide sin esquema
+    assert api.imagenes == [4, 2, 1, 1, 2, 1, 1]
+    assert resumen["ok"] == 4
+    assert all(descripcion_exif(ruta) == "Esto no es JSON" for ruta in rutas)
+
+
+def test_cancelar_con_lotes_en_curso(api, fotos):
+    api.latencia = 0.3
+    rutas = fotos(6)
+    resumen = {}
+    describer = core.BatchDescriber("clave", rutas, "Describe la imagen.", on_result=lambda *args: None,
+                                    on_done=resumen.update, concurrency=1, batch_size=2)
+    hilo = threading.Timer(0.1, describer.cancel)
+    hilo.start()
+    describer.run()
+    assert resumen["cancelled"]
+    assert api.peticiones == 1
+
+
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_cada_imagen_se_lee_una_vez_para_la_clave(api, fotos, monkeypatch, batch_size):
+    lecturas = []
+    original = core.hash_contenido_imagen
+    monkeypatch.setattr(core, "hash_contenido_imagen", lambda ruta: lecturas.append(ruta) or original(ruta))
+    rutas = fotos(3)
+    resultados, resumen = describir(rutas, batch_size=batch_size)
+    assert resumen["ok"] == 3
+    assert sorted(lecturas) == sorted(rutas)
+    # Y la descripción quedó en la caché con esa misma clave
+    assert all(core.descripcion_en_cache(ruta, "Describe la imagen.") for ruta in rutas)
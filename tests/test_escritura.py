@@ -0,0 +1,47 @@
+"""Escritura atómica de archivos (atomic_write) y de los metadatos de las imágenes."""
+import os
+import stat
+
+import piexif
+import pytest
+
+from fotodesc import core
+
+
+def test_reemplaza_el_archivo_con_sus_permisos(tmp_path):
+    ruta = tmp_path / "datos.txt"
+    ruta.write_bytes(b"antes")
+    os.chmod(ruta, 0o640)
+    core.atomic_write(str(ruta), [b"des", b"pues"])
+    assert ruta.read_bytes() == b"despues"
+    assert stat.S_IMODE(os.stat(ruta).st_mode) == 0o640
+    assert os.listdir(tmp_path) == ["datos.txt"]
+
+
+def test_si_falla_el_original_queda_intacto(tmp_path):
+    ruta = tmp_path / "datos.txt"
+    ruta.write_bytes(b"antes")
+
+    def fragmentos():
+        yield b"a medias"
+        raise RuntimeError("fallo")
+    with pytest.raises(RuntimeError):
+        core.atomic_write(str(ruta), fragmentos())
+    assert ruta.read_bytes() == b"antes"
+    assert os.listdir(tmp_path) == ["datos.txt"]
+
+
+def test_no_toca_archivos_con_enlaces_duros(tmp_path, fotos):
+    ruta, = fotos(1)
+    enlace = str(tmp_path / "enlace.jpg")
+    os.link(ruta, enlace)
+    with open(ruta, "rb") as f:
+        original = f.read()
+    exif = {"0th": {piexif.ImageIFD.ImageDescription: b"Nueva"}, "Exif": {}, "GPS": {}, "1st": {}}
+    with pytest.raises(core.HardLinkError, match="2 enlaces duros"):
+        core.write_exif(ruta, exif)
+    # Ni se separa de sus enlaces ni se reescribe a medias
+    assert os.path.samefile(ruta, enlace)
+    with open(enlace, "rb") as f:
+        assert f.read() == original
+    assert sorted(os.listdir(tmp_path)) == ["enlace.jpg", "foto_0.jpg"]
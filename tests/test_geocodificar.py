@@ -0,0 +1,118 @@
+"""Direcciones por lotes (BatchGeocoder) con Nominatim sustituido por el servidor local y con el índice sin conexión."""
+import sys
+import time
+
+import piexif
+import pytest
+from PIL import Image
+
+from fotodesc import core
+
+# Lugares de GeoNames con el formato de cities500.txt (solo se usan las columnas que lee leer_nomenclator)
+NOMENCLATOR = [
+    ("Madrid", 40.4168, -3.7038, "ES", "29"),
+    ("Sevilla", 37.3891, -5.9845, "ES", "51"),
+]
+
+
+def foto_con_gps(ruta, lat, lon):
+    def dms(valor):
+        valor = abs(valor)
+        grados = int(valor)
+        minutos = int((valor - grados) * 60)
+        return (grados, 1), (minutos, 1), (int((valor - grados - minutos / 60) * 360000), 100)
+    gps = {piexif.GPSIFD.GPSLatitudeRef: b"N" if lat >= 0 else b"S", piexif.GPSIFD.GPSLatitude: dms(lat),
+           piexif.GPSIFD.GPSLongitudeRef: b"E" if lon >= 0 else b"W", piexif.GPSIFD.GPSLongitude: dms(lon)}
+    Image.new("RGB", (32, 32)).save(ruta, "JPEG", exif=piexif.dump({"GPS": gps}))
+    return str(ruta)
+
+
+def geocodificar(rutas, **opciones):
+    direcciones = {}
+    resumen = {}
+
+    def on_result(rutas_grupo, direccion):
+        for ruta in rutas_grupo:
+            direcciones[ruta] = direccion
+
+    core.BatchGeocoder(rutas, on_result, resumen.update, **opciones).run()
+    return direcciones, resumen
+
+
+@pytest.fixture
+def indice(tmp_path):
+    ruta_nomenclator = tmp_path / "cities500.txt"
+    with open(ruta_nomenclator, "w", encoding="utf-8") as f:
+        for i, (nombre, lat, lon, pais, admin1) in enumerate(NOMENCLATOR):
+            campos = [str(i), nombre, nombre, "", str(lat), str(lon), "P", "PPL", pais, "", admin1]
+            f.write("\t".join(campos) + "\n")
+    ruta_indice = str(tmp_path / "geonames.idx")
+    core.construir_indice_offline(str(ruta_nomenclator), ruta_indice)
+    return ruta_indice
+
+
+def test_nominatim_agrupa_y_asigna_a_todas(nominatim, tmp_path):
+    rutas = [foto_con_gps(tmp_path / f"{i}.jpg", 40.4168, -3.7038) for i in range(3)]
+    direcciones, resumen = geocodificar(rutas, requests_per_second=100)
+    assert resumen["groups"] == 1 and resumen["requests"] == 1 and resumen["found"] == 3
+    assert set(direcciones) == set(rutas)
+    assert direcciones[rutas[0]].startswith("Calle de prueba")
+
+
+def test_los_reintentos_respetan_el_limite_de_peticiones(nominatim, tmp_path):
+    nominatim.errores = [(429, 0), (503, 0)]
+    ruta = foto_con_gps(tmp_path / "a.jpg", 40.4168, -3.7038)
+    inicio = time.monotonic()
+    direcciones, resumen = geocodificar([ruta], requests_per_second=5)
+    # Tres intentos con Retry-After: 0, pero como mucho una petición cada 0,2 s
+    assert nominatim.peticiones == 3 and resumen["requests"] == 3
+    assert time.monotonic() - inicio >= 0.4
+    assert direcciones[ruta].startswith("Calle de prueba")
+
+
+def test_sin_conexion_no_necesita_requests(nominatim, indice, tmp_path, monkeypatch):
+    monkeypatch.setitem(sys.modules, "requests", None)  # Cualquier import requests falla
+    core.reverse_geocoder.configure("offline", indice)
+    rutas = [foto_con_gps(tmp_path / "madrid.jpg", 40.42, -3.70), foto_con_gps(tmp_path / "sevilla.jpg", 37.39, -5.98)]
+    direcciones, resumen = geocodificar(rutas)
+    assert not resumen["errors"] and resumen["requests"] == 0
+    assert direcciones == {rutas[0]: "Madrid, ES", rutas[1]: "Sevilla, ES"}
+    assert nominatim.peticiones == 0
+
+
+def test_sin_conexion_y_sin_indice_no_consulta_nominatim(nominatim, tmp_path):
+    core.reverse_geocoder.configure("offline", str(tmp_path / "no_existe.idx"))
+    rutas = [foto_con_gps(tmp_path / f"{i}.jpg", 40.4168, -3.7038) for i in range(2)]
+    rutas.append(foto_con_gps(tmp_path / "sevilla.jpg", 37.39, -5.98))
+    direcciones, resumen = geocodificar(rutas)
+    assert nominatim.peticiones == 0 and resumen["requests"] == 0
+    assert not direcciones
+    # El error se anota en cada imagen, no solo en la que representa a su grupo
+    assert sorted(ruta for ruta, _ in resumen["errors"]) == sorted(rutas)
+    assert all("sin conexión" in error for _, error in resumen["errors"])
+    with pytest.raises(core.GeocodingError):
+        core.reverse_geocoder.reverse(40.4168, -3.7038)
+
+
+@pytest.mark.parametrize("lat", [89.9999, -89.9999])
+def test_cache_cerca_de_los_polos(tmp_path, lat):
+    cache = core.GeocodeCache(str(tmp_path / "direcciones.db"), precision=3, radius_m=50)
+    cache.store(lat, 100.0, "Polo")
+    inicio = time.monotonic()
+    # A 11 m del polo, 50 m abarcan todas las longitudes
+    assert cache.lookup(lat, -170.0) == "Polo"
+    assert cache.lookup(lat * 0.9999, 100.0) is None
+    assert time.monotonic() - inicio < 1
+    assert len(cache.cells) == 1 and len(cache.empty) <= cache.MAX_CELLS
+
+
+def test_cache_en_el_antimeridiano(tmp_path):
+    cache = core.GeocodeCache(str(tmp_path / "direcciones.db"), precision=3, radius_m=50)
+    cache.store(10.0, -179.9999, "Este")
+    assert cache.lookup(10.0, 179.9999) == "Este"
+    cache.store(-20.0, 179.9999, "Oeste")
+    # Desde otra instancia, leyendo las celdas de la base de datos
+    otra = core.GeocodeCache(cache.db_path, precision=3, radius_m=50)
+    assert otra.lookup(-20.0, -179.9999) == "Oeste"
+    assert otra.lookup(10.0, 179.9999) == "Este"
+    assert otra.lookup(10.0, 0.0) is None
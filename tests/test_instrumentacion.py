@@ -0,0 +1,87 @@
+"""Mediciones y captura de perfiles de Instrumentacion."""
+import sys
+import threading
+
+import pytest
+
+from fotodesc import core
+
+
+def test_mide_operaciones_con_percentiles():
+    instrumentacion = core.Instrumentacion()
+    assert instrumentacion.medir("op") is core.MEDIDA_NULA
+    instrumentacion.activar()
+    for _ in range(3):
+        with instrumentacion.medir("op") as medida:
+            medida.bytes(10, 20)
+    instrumentacion.contar("op.cache")
+    resumen = instrumentacion.resumen()
+    assert resumen["op"]["count"] == 3 and resumen["op"]["bytes_sent"] == 30 and resumen["op"]["bytes_received"] == 60
+    assert resumen["op"]["p50_ms"] <= resumen["op"]["max_ms"]
+    assert resumen["op.cache"] == {"count": 1, "errors": 0, "bytes_sent": 0, "bytes_received": 0}
+
+
+def trabajo_de_fondo_perfilado(n=2000):
+    return sum(i * i for i in range(n))
+
+
+class HiloDeFondo(threading.Thread):
+    """Como los hilos de fondo de la aplicación: espera tareas y llama a punto_de_control() antes de cada una."""
+    def __init__(self, instrumentacion):
+        super(HiloDeFondo, self).__init__(daemon=True)
+        self.instrumentacion = instrumentacion
+        self.tareas = []
+        self.condicion = threading.Condition()
+        self.perfil_activo = None
+
+    def encargar(self):
+        hecho = threading.Event()
+        with self.condicion:
+            self.tareas.append(hecho)
+            self.condicion.notify()
+        assert hecho.wait(5)
+        return self.perfil_activo
+
+    def run(self):
+        while True:
+            with self.condicion:
+                while not self.tareas:
+                    self.condicion.wait()
+                hecho = self.tareas.pop(0)
+            self.instrumentacion.punto_de_control()
+            trabajo_de_fondo_perfilado()
+            self.perfil_activo = sys.getprofile() is not None
+            hecho.set()
+
+
+@pytest.mark.skipif(not core.PERFIL_POR_HILO, reason="desde Python 3.12 cProfile mide todos los hilos a la vez")
+def test_perfil_incluye_hilos_previos_y_se_quita_al_terminar(tmp_path):
+    instrumentacion = core.Instrumentacion()
+    previo = HiloDeFondo(instrumentacion)
+    previo.start()
+    assert previo.encargar() is False
+    instrumentacion.iniciar_perfil()
+    nuevo = HiloDeFondo(instrumentacion)  # Creado durante la captura
+    nuevo.start()
+    assert previo.encargar() is True
+    assert nuevo.encargar() is True
+    rutas = instrumentacion.detener_perfil(str(tmp_path))
+    assert sys.getprofile() is None
+    # Los dos hilos dejan de pagar el coste del perfilador en su siguiente tarea
+    assert previo.encargar() is False
+    assert nuevo.encargar() is False
+    assert instrumentacion.hilos_perfilados == 0
+    with open(rutas[1], encoding="utf-8") as f:
+        texto = f.read()
+    assert "trabajo_de_fondo_perfilado" in texto
+    assert "Hilos medidos: 3" in texto
+
+
+def test_perfil_sin_trabajo_se_guarda(tmp_path):
+    instrumentacion = core.Instrumentacion()
+    instrumentacion.iniciar_perfil()
+    assert instrumentacion.perfilando()
+    rutas = instrumentacion.detener_perfil(str(tmp_path))
+    assert not instrumentacion.perfilando()
+    assert all(ruta.startswith(str(tmp_path)) for ruta in rutas)
+    assert instrumentacion.detener_perfil(str(tmp_path)) == []
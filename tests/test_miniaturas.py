@@ -0,0 +1,53 @@
+"""Miniaturas de la vista previa (make_thumbnail): miniatura EXIF incrustada, decodificación reducida y orientación."""
+import io
+
+import piexif
+import pytest
+from PIL import Image
+
+from fotodesc import core
+
+ROJO, AZUL = (220, 20, 20), (20, 20, 220)
+
+
+def foto(ruta, tamano_incrustada=None, orientacion=None):
+    """JPEG de 1200x800 azul, con una miniatura incrustada roja (para distinguir de dónde sale la vista previa)."""
+    exif = {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}}
+    if orientacion:
+        exif["0th"][piexif.ImageIFD.Orientation] = orientacion
+    if tamano_incrustada:
+        buffer = io.BytesIO()
+        Image.new("RGB", tamano_incrustada, ROJO).save(buffer, "JPEG")
+        exif["thumbnail"] = buffer.getvalue()
+        exif["1st"] = {piexif.ImageIFD.JPEGInterchangeFormat: 0, piexif.ImageIFD.JPEGInterchangeFormatLength: 0}
+    Image.new("RGB", (1200, 800), AZUL).save(ruta, "JPEG", exif=piexif.dump(exif))
+    return str(ruta)
+
+
+def color(img):
+    r, g, b = img.getpixel((img.width // 2, img.height // 2))
+    return ROJO if r > b else AZUL
+
+
+def test_miniatura_incrustada_pequena_no_se_usa(tmp_path):
+    # La miniatura EXIF habitual (160x120) se quedaría en la mitad de la vista previa de 300 px
+    thumb = core.make_thumbnail(foto(tmp_path / "a.jpg", (160, 120)), 300)
+    assert thumb.size == (300, 200) and color(thumb) == AZUL
+
+
+def test_miniatura_incrustada_suficiente(tmp_path):
+    thumb = core.make_thumbnail(foto(tmp_path / "a.jpg", (320, 240)), 300)
+    assert thumb.size == (300, 225) and color(thumb) == ROJO
+
+
+@pytest.mark.parametrize("tamano_incrustada", [None, (160, 120), (480, 320)])
+def test_se_aplica_la_orientacion(tmp_path, tamano_incrustada):
+    thumb = core.make_thumbnail(foto(tmp_path / "a.jpg", tamano_incrustada, orientacion=6), 300)
+    assert thumb.width < thumb.height and max(thumb.size) == 300
+
+
+def test_la_cache_guarda_la_miniatura_al_tamano_pedido(tmp_path):
+    ruta = foto(tmp_path / "a.jpg", (160, 120))
+    cache = core.ThumbnailCache(str(tmp_path / "miniaturas"))
+    assert cache.get(ruta, 300)[:2] == (300, 200)
+    assert cache.get(ruta, 300)[:2] == (300, 200)
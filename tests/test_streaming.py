@@ -0,0 +1,111 @@
+"""Descripciones en streaming (eventos SSE) contra el servidor local que sustituye a la API."""
+import threading
+import time
+
+import pytest
+
+import servidores_stub
+from fotodesc import core
+
+PROMPT = "Describe la imagen."
+TEXTO = servidores_stub.ManejadorOpenAI.TEXTO_STREAM
+
+
+def test_eventos_sse():
+    lineas = [b": comentario\n", b"event: mensaje\n", b"data: a\n", b"data: b\n", b"\n", b"data:[DONE]\r\n", b"\r\n"]
+    assert list(core.eventos_sse(lineas)) == ["a\nb", "[DONE]"]
+
+
+def test_entrega_el_texto_por_partes_y_lo_guarda_en_la_cache(api, fotos):
+    ruta, = fotos(1)
+    recibidos = []
+    descripcion = core.describir_imagen_stream("clave", ruta, PROMPT, lambda f, t: recibidos.append((f, t)))
+    assert descripcion == TEXTO.strip()
+    assert len(recibidos) > 10
+    # Cada aviso trae el texto acumulado hasta ese fragmento, en orden
+    acumulado = ""
+    for fragmento, texto in recibidos:
+        acumulado += fragmento
+        assert texto == acumulado
+    assert acumulado == TEXTO
+    assert core.descripcion_en_cache(ruta, PROMPT) == descripcion
+    # Desde la caché no se vuelve a pedir y se entrega el texto de una vez
+    recibidos.clear()
+    assert core.describir_imagen_stream("clave", ruta, PROMPT, lambda f, t: recibidos.append(t)) == descripcion
+    assert recibidos == [descripcion] and api.peticiones == 1
+
+
+def test_cuenta_los_bytes_recibidos(api, fotos):
+    ruta, = fotos(1)
+    instrumentacion = core.Instrumentacion()
+    instrumentacion.activar()
+    core.instrumentacion, anterior = instrumentacion, core.instrumentacion
+    try:
+        core.describir_imagen_stream("clave", ruta, PROMPT, lambda f, t: None)
+    finally:
+        core.instrumentacion = anterior
+    datos = instrumentacion.resumen()["api.descripcion_stream"]
+    # Más bytes que caracteres: el texto tiene tildes y los eventos llevan JSON y saltos de línea
+    assert datos["bytes_received"] > len(TEXTO.encode("utf-8"))
+    assert "api.primer_texto" in instrumentacion.resumen()
+
+
+@pytest.mark.parametrize("atasco", [0, 4])
+def test_cancelar_a_mitad_no_escribe_nada(api, fotos, atasco):
+    api.latencia_fragmento = 0.05
+    api.atasco = atasco  # Con atasco, el servidor deja de enviar texto y la cancelación no espera a otro evento
+    ruta, = fotos(1)
+    resultados = []
+    resumen = {}
+    describer = core.BatchDescriber("clave", [ruta], PROMPT, on_result=lambda *args: resultados.append(args),
+                                    on_done=resumen.update)
+    recibidos = []
+    describer.on_partial = lambda r, f, t: recibidos.append(t)
+    describer.start()
+    inicio = time.monotonic()
+    while len(recibidos) < 4:
+        assert time.monotonic() - inicio < 5
+        time.sleep(0.01)
+    describer.cancel()
+    cancelado = time.monotonic()
+    describer.join(5)
+    assert time.monotonic() - cancelado < 1
+    assert resumen["cancelled"] and resumen["ok"] == 0 and not resumen["errors"]
+    assert not resultados
+    assert core.read_metadata(ruta)[0] == ""
+    assert core.descripcion_en_cache(ruta, PROMPT) is None
+    deadline = time.monotonic() + 2
+    while not api.streams_cortados and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert api.streams_cortados == 1
+
+
+def test_la_funcion_devuelve_none_al_cancelar(api, fotos):
+    api.atasco = 3
+    ruta, = fotos(1)
+    cancelar = threading.Event()
+    threading.Timer(0.3, cancelar.set).start()
+    inicio = time.monotonic()
+    assert core.describir_imagen_stream("clave", ruta, PROMPT, lambda f, t: None, cancel_event=cancelar) is None
+    assert time.monotonic() - inicio < 1
+
+
+def test_evento_de_error(api, fotos):
+    api.error_stream = "El modelo está saturado"
+    ruta, = fotos(1)
+    with pytest.raises(core.APIStreamError, match="El modelo está saturado"):
+        core.describir_imagen_stream("clave", ruta, PROMPT, lambda f, t: None)
+    assert core.descripcion_en_cache(ruta, PROMPT) is None
+
+
+def test_describer_en_streaming_escribe_al_terminar(api, fotos):
+    rutas = fotos(2)
+    parciales = {}
+    resumen = {}
+    describer = core.BatchDescriber("clave", rutas, PROMPT, on_result=lambda *args: None, on_done=resumen.update,
+                                    on_partial=lambda r, f, t: parciales.setdefault(r, []).append(t))
+    describer.run()
+    assert resumen["ok"] == 2
+    for ruta in rutas:
+        assert parciales[ruta][-1] == TEXTO
+        assert core.read_metadata(ruta)[0] == TEXTO.strip()
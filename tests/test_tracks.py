@@ -0,0 +1,52 @@
+"""Lectura de tracks GPX y KML (leer_track) para el geoetiquetado."""
+from fotodesc import core
+
+KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2"><Document>
+  <Placemark><TimeStamp><when>2024-05-01T10:00:00Z</when></TimeStamp>
+    <Point><coordinates>-3.7038,40.4168,650</coordinates></Point></Placemark>
+  <Placemark><TimeStamp><when>2024-05-01T11:00:00Z</when></TimeStamp>
+    <LineString><coordinates>
+      -5.9845,37.3891,10 -5.9900,37.3900,12
+      -6.0000,37.4000,15
+    </coordinates></LineString></Placemark>
+  <Placemark><TimeStamp><when>2024-05-01T12:00:00Z</when></TimeStamp>
+    <MultiGeometry><Point><coordinates>1,2</coordinates></Point><Point><coordinates>3,4</coordinates></Point>
+    </MultiGeometry></Placemark>
+  <Placemark><TimeStamp><when>2024-05-01T13:00:00Z</when></TimeStamp>
+    <Point><coordinates>
+      2.1734,41.3851
+    </coordinates></Point></Placemark>
+  <Placemark><gx:Track>
+    <when>2024-05-01T14:00:00Z</when><when>2024-05-01T14:01:00Z</when>
+    <gx:coord>-0.3763 39.4699 5</gx:coord><gx:coord>-0.3770 39.4710 6</gx:coord>
+  </gx:Track></Placemark>
+</Document></kml>
+"""
+
+GPX = """<?xml version="1.0"?>
+<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1"><trk><trkseg>
+  <trkpt lat="40.4168" lon="-3.7038"><ele>650</ele><time>2024-05-01T10:00:00Z</time></trkpt>
+  <trkpt lat="40.4200" lon="-3.7000"><ele>651</ele></trkpt>
+</trkseg></trk></gpx>
+"""
+
+HORA = core.iso_a_epoch("2024-05-01T10:00:00Z")
+
+
+def test_kml_solo_lee_placemarks_con_un_punto(tmp_path):
+    ruta = tmp_path / "track.kml"
+    ruta.write_text(KML, encoding="utf-8")
+    # La LineString y el MultiGeometry con dos Point no tienen una posición para su hora y se descartan
+    assert core.leer_track(str(ruta)) == [
+        (HORA, 40.4168, -3.7038),
+        (HORA + 3 * 3600, 41.3851, 2.1734),
+        (HORA + 4 * 3600, 39.4699, -0.3763),
+        (HORA + 4 * 3600 + 60, 39.4710, -0.3770),
+    ]
+
+
+def test_gpx_descarta_puntos_sin_hora(tmp_path):
+    ruta = tmp_path / "track.gpx"
+    ruta.write_text(GPX, encoding="utf-8")
+    assert core.leer_track(str(ruta)) == [(HORA, 40.4168, -3.7038)]